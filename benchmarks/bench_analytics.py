@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Benchmark of ohiovoter.analytics against the per-voter ORM loops it
+replaces, on whatever is imported in the configured database (nothing is
+written). Each question is answered both ways, the answers are checked
+against each other, and the wall time and peak Python memory of each are
+reported.
+
+    python benchmarks/bench_analytics.py
+    python benchmarks/bench_analytics.py --general 2016-11-08 --primaries 2012-03-06 2016-03-15
+
+The naive loops issue a query per voter, so on a full statewide import they
+take hours; import a synthetic file first (see bench_import.py) to keep them
+short.
+"""
+import argparse
+from collections import Counter
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ohiovoter.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from ohiovoter import analytics  # noqa: E402
+from ohiovoter.models import Election, Voter  # noqa: E402
+
+
+def naive_turnout(election):
+    registered = Counter()
+    voted = Counter()
+    for voter in Voter.objects.all():
+        registered[voter.county] += 1
+        if voter.elections.filter(pk=election.pk).exists():
+            voted[voter.county] += 1
+    return [(county, registered[county], voted[county], voted[county] / registered[county])
+            for county in sorted(registered)]
+
+
+def naive_crossover(earlier_date, later_date):
+    matrix = Counter()
+    for voter in Voter.objects.filter(elections__date=earlier_date, elections__category=Election.CATEGORY_PRIMARY):
+        earlier = voter.elections.get(date=earlier_date, category=Election.CATEGORY_PRIMARY)
+        for later in voter.elections.filter(date=later_date, category=Election.CATEGORY_PRIMARY):
+            matrix[(earlier.party, later.party)] += 1
+    return dict(matrix)
+
+
+def naive_retention(elections):
+    results = []
+    for election, next_election in zip(elections, elections[1:]):
+        voters = retained = 0
+        for voter in election.voters.all():
+            voters += 1
+            if voter.elections.filter(pk=next_election.pk).exists():
+                retained += 1
+        results.append((election.pk, next_election.pk, voters, retained, retained / voters if voters else None))
+    return results
+
+
+def naive_columns(fields):
+    columns = {field: [] for field in fields}
+    for voter in Voter.objects.all():
+        for field in fields:
+            columns[field].append(getattr(voter, field))
+    return columns
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--general', help='Date of the general election for turnout (default: the latest)')
+    parser.add_argument('--primaries', nargs=2, metavar='DATE',
+                        help='Dates of the primaries for crossover (default: the latest two)')
+    parser.add_argument('--retention', type=int, default=3, help='Latest general elections to measure retention over')
+    args = parser.parse_args()
+
+    generals = Election.objects.filter(category=Election.CATEGORY_GENERAL).order_by('date')
+    general = generals.get(date=args.general) if args.general else generals.last()
+    retention_elections = list(generals)[-args.retention:]
+    if args.primaries:
+        earlier_date, later_date = args.primaries
+    else:
+        primary_dates = Election.objects.filter(category=Election.CATEGORY_PRIMARY).order_by('-date')
+        later_date, earlier_date = list(primary_dates.values_list('date', flat=True).distinct()[:2])
+    fields = ['county', 'date_of_birth', 'congressional_district', 'party_affiliation']
+
+    comparisons = [
+        ('turnout by county', naive_turnout, (general,), analytics.turnout, (general,)),
+        ('crossover', naive_crossover, (earlier_date, later_date), analytics.crossover, (earlier_date, later_date)),
+        ('retention', naive_retention, (retention_elections,), analytics.retention, (retention_elections,)),
+        ('voter columns', naive_columns, (fields,), analytics.fetch_columns, (Voter.objects.all(), fields)),
+    ]
+
+    print('{:<20} {:>11} {:>11} {:>9} {:>11} {:>11}'.format(
+        '', 'ORM loop', 'analytics', 'speedup', 'ORM peak', 'peak'))
+    for name, naive, naive_args, fast, fast_args in comparisons:
+        expected, naive_time, naive_peak = measure(naive, *naive_args)
+        result, fast_time, fast_peak = measure(fast, *fast_args)
+
+        if name == 'voter columns':
+            matches = all(len(result[field]) == len(expected[field]) for field in fields)
+        else:
+            matches = result == expected
+        if not matches:
+            print('{}: the results differ!'.format(name))
+
+        print('{:<20} {:>10.2f}s {:>10.2f}s {:>8.0f}x {:>9.1f}MB {:>9.1f}MB'.format(
+            name, naive_time, fast_time, naive_time / fast_time, naive_peak / 1e6, fast_peak / 1e6,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for the importer's row-parsing hot loop.
+
+Compares the original per-cell parser (reflecting on Voter and re-parsing the
+election header for every cell) against a precompiled ColumnPlan, on
+synthetic rows laid out like a Secretary of State county file. No database is
+needed.
+
+    python benchmarks/bench_column_plan.py --rows 100000 --elections 150
+"""
+import argparse
+from datetime import datetime
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ohiovoter.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from generate_voter_files import synthetic_header, synthetic_rows  # noqa: E402
+from ohiovoter.layout import ColumnPlan  # noqa: E402
+from ohiovoter.models import Election, Voter  # noqa: E402
+
+
+def parse_per_cell(header, rows):
+    participations = 0
+    processed_elections = set()
+    for row in rows:
+        this_voters_data = []
+        for index, column_value in enumerate(row):
+            field_name = header[index]
+            lower_field_name = field_name.lower()
+
+            if hasattr(Voter, lower_field_name):
+                this_voters_data.append(column_value)
+            elif column_value:
+                category_display, date_string = field_name.split('-')
+                election_category = Election.CATEGORY_CHOICES_REVERSE_MAP[category_display]
+                election_date = datetime.strptime(date_string, '%m/%d/%Y').strftime('%Y-%m-%d')
+                election_hashable_key = '{}.{}.{}'.format(election_category, election_date, column_value).encode('utf-8')
+                election_id = hashlib.sha256(election_hashable_key).hexdigest()
+                processed_elections.add(election_id)
+                participations += 1
+    return participations
+
+
+def parse_column_plan(header, rows):
+    participations = 0
+    processed_elections = set()
+    election_ids = {key: election_pk for election_pk, key in enumerate(ColumnPlan(header).election_keys(), 1)}
+    column_plan = ColumnPlan(header, election_ids)
+    for row in rows:
+        this_voters_data = column_plan.voter_values(row)
+        for election_pk in column_plan.elections(row):
+            processed_elections.add(election_pk)
+            participations += 1
+    return participations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--elections', type=int, default=150)
+    parser.add_argument('--turnout', type=float, default=0.06,
+                        help='Fraction of election cells that hold a vote (the statewide file is about 6%%)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    header = synthetic_header(args.elections)
+    rows = list(synthetic_rows(args.rows, args.elections, args.turnout))
+
+    results = {}
+    for name, parse in (('per-cell', parse_per_cell), ('column plan', parse_column_plan)):
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            participations = parse(header, rows)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+        print('{:<12} {:>12,.0f} rows/sec  ({:,} participations)'.format(name, args.rows / best, participations))
+
+    print('speedup      {:>12.1f}x'.format(results['per-cell'] / results['column plan']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+"""
+Benchmark of the importer's database writes, to tune --db-writers,
+--copy-batch-size, --unit-size and --db-setting for a PostgreSQL server.
+
+Formats synthetic voters for COPY once, the way the load workers do, then
+COPYs them into scratch copies of the voter and participation tables for
+every combination of the values given: concurrent writers, rows per COPY,
+rows per transaction, session settings (the server's own, or the importer's
+LOAD_SESSION_SETTINGS) and logged or unlogged tables. For each it reports
+voters and participations written per second. Only the scratch tables
+(bench_copy_*) are touched, and they're dropped afterwards.
+
+    python benchmarks/bench_copy.py --rows 200000 --writers 1,2,4,8
+    python benchmarks/bench_copy.py --copy-batch-sizes 10000,100000 --transaction-rows 50000,200000
+"""
+import argparse
+from contextlib import closing
+import csv
+from io import StringIO
+from multiprocessing import Pool
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ohiovoter.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django import db  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+
+from generate_voter_files import synthetic_header, synthetic_rows  # noqa: E402
+from ohiovoter.bulkload import LOAD_SESSION_SETTINGS, init_load_worker  # noqa: E402
+from ohiovoter.layout import TYPED_VOTER_FIELDS, ColumnPlan  # noqa: E402
+from ohiovoter.management.commands.import_data import (  # noqa: E402
+    PARTICIPATION_COLUMNS, VOTER_COLUMNS, Command,
+)
+
+
+VOTER_TABLE = 'bench_copy_voter'
+PARTICIPATION_TABLE = 'bench_copy_participation'
+
+SESSIONS = {
+    'server': {},
+    'load': LOAD_SESSION_SETTINGS,
+}
+
+# Each voter's COPY line and participation lines, formatted before the
+# workers fork so they share them
+voter_lines = []
+participation_lines = []
+
+
+def format_rows(num_rows, num_elections, turnout, seed):
+    """
+    Format synthetic voters into voter_lines and participation_lines, and
+    return the average size of a source row in bytes.
+    """
+    header = synthetic_header(num_elections)
+    election_ids = {}
+    column_plan = ColumnPlan(
+        header, missing_election=lambda *election: election_ids.setdefault(election, len(election_ids) + 1),
+    )
+
+    source_bytes = 0
+    source_line = StringIO()
+    source_writer = csv.writer(source_line, quoting=csv.QUOTE_ALL)
+    participation_stream = StringIO()
+    participation_writer = csv.writer(participation_stream, delimiter=',')
+
+    for row in synthetic_rows(num_rows, num_elections, turnout, seed):
+        source_line.seek(0)
+        source_line.truncate()
+        source_writer.writerow(row)
+        source_bytes += len(source_line.getvalue())
+
+        participation_stream.seek(0)
+        participation_stream.truncate()
+        voter_lines.extend(Command.voter_csv_lines([(1, row)], column_plan, 'ADAMS', participation_writer, []))
+        participation_lines.append(participation_stream.getvalue())
+
+    return source_bytes / num_rows
+
+
+def create_tables(unlogged, indexes):
+    with closing(connection.cursor()) as cursor:
+        cursor.execute('DROP TABLE IF EXISTS {}, {}'.format(VOTER_TABLE, PARTICIPATION_TABLE))
+        for table, like in [(VOTER_TABLE, 'ohiovoter_voter'), (PARTICIPATION_TABLE, 'ohiovoter_participation')]:
+            cursor.execute('CREATE {}TABLE {} (LIKE {} INCLUDING DEFAULTS{})'.format(
+                'UNLOGGED ' if unlogged else '', table, like, ' INCLUDING INDEXES' if indexes else '',
+            ))
+
+
+def drop_tables():
+    with closing(connection.cursor()) as cursor:
+        cursor.execute('DROP TABLE IF EXISTS {}, {}'.format(VOTER_TABLE, PARTICIPATION_TABLE))
+
+
+def load_share(share):
+    """
+    COPY voters start to end, committing every `transaction_rows` of them,
+    in COPYs of `copy_batch_size`, like Command.load_county_unit.
+    """
+    start, end, copy_batch_size, transaction_rows = share
+    db.close_old_connections()
+
+    for transaction_start in range(start, end, transaction_rows):
+        transaction_end = min(transaction_start + transaction_rows, end)
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            for batch_start in range(transaction_start, transaction_end, copy_batch_size):
+                batch_end = min(batch_start + copy_batch_size, transaction_end)
+                cursor.copy_expert(
+                    'COPY {} ({}) FROM STDIN WITH (FORMAT csv, FORCE_NULL ({}))'.format(
+                        VOTER_TABLE,
+                        ','.join(VOTER_COLUMNS),
+                        ','.join(column for column in VOTER_COLUMNS if column in TYPED_VOTER_FIELDS),
+                    ),
+                    StringIO(''.join(voter_lines[batch_start:batch_end])),
+                )
+                cursor.copy_from(
+                    StringIO(''.join(participation_lines[batch_start:batch_end])),
+                    PARTICIPATION_TABLE,
+                    sep=',',
+                    columns=PARTICIPATION_COLUMNS,
+                )
+
+
+def init_writer(session_settings):
+    init_load_worker(None, session_settings)
+    # Connect before the clock starts
+    connection.ensure_connection()
+
+
+def timed_load(writers, copy_batch_size, transaction_rows, session_settings):
+    """
+    Seconds `writers` worker processes take to load every voter, each its
+    share in turn.
+    """
+    with closing(connection.cursor()) as cursor:
+        cursor.execute('TRUNCATE {}, {}'.format(VOTER_TABLE, PARTICIPATION_TABLE))
+    db.connections.close_all()
+
+    # Units of a transaction's worth, handed out like the scheduler does
+    shares = [
+        (start, min(start + transaction_rows, len(voter_lines)), copy_batch_size, transaction_rows)
+        for start in range(0, len(voter_lines), transaction_rows)
+    ]
+    pool = Pool(writers, init_writer, (session_settings,))
+    try:
+        started = time.perf_counter()
+        pool.map(load_share, shares, chunksize=1)
+        return time.perf_counter() - started
+    finally:
+        pool.close()
+        pool.join()
+
+
+def integers(value):
+    return [int(part) for part in value.split(',')]
+
+
+def names(choices):
+    def parse(value):
+        parts = value.split(',')
+        for part in parts:
+            if part not in choices:
+                raise argparse.ArgumentTypeError('{} is not one of {}'.format(part, ', '.join(choices)))
+        return parts
+    return parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='Voters to load in each run')
+    parser.add_argument('--elections', type=int, default=150)
+    parser.add_argument('--turnout', type=float, default=0.06,
+                        help='Fraction of election cells that hold a vote (the statewide file is about 6%%)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--writers', type=integers, default=[1, 2, 4], help='Concurrent writers, comma separated')
+    parser.add_argument('--copy-batch-sizes', type=integers, default=[10000, 100000], help='Rows per COPY')
+    parser.add_argument('--transaction-rows', type=integers, default=[20000, 100000],
+                        help='Rows per transaction (a unit of --unit-size MB holds about MB * 1048576 / row size)')
+    parser.add_argument('--sessions', type=names(sorted(SESSIONS)), default=['server', 'load'],
+                        help='Session settings: the server\'s own and/or the importer\'s')
+    parser.add_argument('--tables', type=names(['logged', 'unlogged']), default=['logged'],
+                        help='Whether the scratch tables are logged, unlogged or both')
+    parser.add_argument('--indexes', action='store_true',
+                        help='Give the scratch tables the live tables\' indexes, as a default import '
+                             'has; --shadow and --defer-indexes load without them')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    row_size = format_rows(args.rows, args.elections, args.turnout, args.seed)
+    participations = sum(lines.count('\n') for lines in participation_lines)
+    print('Formatted {:,} voters and {:,} participations in {:.1f}s; source rows average {:.0f} bytes, '
+          'so --unit-size 32 is about {:,.0f} rows per transaction\n'.format(
+              len(voter_lines), participations, time.perf_counter() - started, row_size, 32 * 1024 * 1024 / row_size,
+          ))
+
+    print('{:>7} {:>10} {:>12} {:>7} {:>9} {:>9} {:>12} {:>16}'.format(
+        'writers', 'COPY rows', 'transaction', 'session', 'tables', 'seconds', 'voters/s', 'participations/s',
+    ))
+    try:
+        for tables in args.tables:
+            create_tables(tables == 'unlogged', args.indexes)
+            for writers in args.writers:
+                for copy_batch_size in args.copy_batch_sizes:
+                    for transaction_rows in args.transaction_rows:
+                        for session in args.sessions:
+                            elapsed = timed_load(writers, copy_batch_size, transaction_rows, SESSIONS[session])
+                            print('{:>7} {:>10,} {:>12,} {:>7} {:>9} {:>9.2f} {:>12,.0f} {:>16,.0f}'.format(
+                                writers, copy_batch_size, transaction_rows, session, tables, elapsed,
+                                len(voter_lines) / elapsed, participations / elapsed,
+                            ))
+    finally:
+        drop_tables()
+
+
+if __name__ == '__main__':
+    main()
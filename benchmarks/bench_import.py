@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+End-to-end benchmark of import_data against a local PostgreSQL.
+
+Generates synthetic county files (see generate_voter_files.py), imports them
+with `import_data --source-dir`, and reports throughput, peak memory and the
+time spent in each phase of the import. Any arguments after `--` are passed
+on to import_data, so import modes can be compared on the same data:
+
+    python benchmarks/bench_import.py --rows 500000
+    python benchmarks/bench_import.py --rows 500000 -- --defer-indexes
+    python benchmarks/bench_import.py --rows 500000 -- --shadow --parse-workers 4
+
+WARNING: this replaces whatever is in the configured database, exactly like
+running import_data would.
+"""
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ohiovoter.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.core import management  # noqa: E402
+
+from generate_voter_files import write_county_files  # noqa: E402
+from ohiovoter.management.commands import import_data  # noqa: E402
+from ohiovoter.models import Participation, Voter  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='Voters across all counties')
+    parser.add_argument('--elections', type=int, default=150)
+    parser.add_argument('--turnout', type=float, default=0.06,
+                        help='Fraction of election cells that hold a vote (the statewide file is about 6%%)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--source-dir',
+                        help='Import the county files already in this directory instead of generating them')
+    parser.add_argument('import_args', nargs=argparse.REMAINDER,
+                        help='Arguments for import_data, after --')
+    args = parser.parse_args()
+
+    import_args = args.import_args
+    if import_args and import_args[0] == '--':
+        import_args = import_args[1:]
+
+    source_dir = args.source_dir
+    generated_dir = None
+    if source_dir is None:
+        generated_dir = source_dir = tempfile.mkdtemp(prefix='ohiovoter-bench-')
+        started = time.perf_counter()
+        write_county_files(source_dir, args.rows, args.elections, args.turnout, args.seed)
+        print('Generated {:,} voters in {:.1f}s'.format(args.rows, time.perf_counter() - started))
+
+    try:
+        command = import_data.Command()
+        started = time.perf_counter()
+        management.call_command(command, '--source-dir', source_dir, '--noinput', *import_args)
+        elapsed = time.perf_counter() - started
+    finally:
+        if generated_dir is not None:
+            shutil.rmtree(generated_dir)
+
+    voters = Voter.objects.count()
+    participations = Participation.objects.count()
+    load_time = dict(command.phase_timings).get('download and load county data', elapsed)
+
+    # ru_maxrss is in kilobytes on Linux; RUSAGE_CHILDREN reports the
+    # largest of the import's worker processes
+    parent_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    worker_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+    print('\nBenchmark results ({}):'.format(' '.join(import_args) or 'default import'))
+    print('  {:<32} {:>14,}'.format('voters', voters))
+    print('  {:<32} {:>14,}'.format('participations', participations))
+    print('  {:<32} {:>13.1f}s'.format('wall time', elapsed))
+    print('  {:<32} {:>14,.0f}'.format('voters/sec (load phase)', voters / load_time))
+    print('  {:<32} {:>14,.0f}'.format('participations/sec (load phase)', participations / load_time))
+    print('  {:<32} {:>14,.0f}'.format('voters/sec (overall)', voters / elapsed))
+    print('  {:<32} {:>12,.0f}MB'.format('peak RSS, main process', parent_rss))
+    print('  {:<32} {:>12,.0f}MB'.format('peak RSS, largest worker', worker_rss))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Times the common lookups against the voter file with EXPLAIN ANALYZE, on
+whatever is imported in the configured database (nothing is written), and
+shows how PostgreSQL answered each: the scans it ran, and how many
+participation partitions they read.
+
+Run it before and after a schema change to see what it bought, e.g.:
+
+    python benchmarks/bench_queries.py
+    python manage.py partition_participation
+    python benchmarks/bench_queries.py
+
+Sample values (a county, a name, a precinct, a district, elections) are taken
+from the data, so the queries always find something.
+"""
+import argparse
+from contextlib import closing
+import json
+import os
+import re
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ohiovoter.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from ohiovoter.models import Election, Participation, Voter  # noqa: E402
+
+
+PARTITION = re.compile(r'^(ohiovoter_participation)_(e\d+|default)')
+
+
+def sample_queries():
+    """
+    (name, SQL, parameters) for each lookup, using values from the data.
+    """
+    voter = Voter.objects.exclude(precinct_code=None).exclude(congressional_district=None).order_by('?').first()
+    general = Election.objects.filter(category=Election.CATEGORY_GENERAL).order_by('-date').first()
+    primaries = list(
+        Election.objects.filter(category=Election.CATEGORY_PRIMARY, date=Election.objects.filter(
+            category=Election.CATEGORY_PRIMARY).order_by('-date').values('date')[:1]).values_list('id', flat=True)
+    )
+
+    querysets = [
+        ('voter by county and name',
+         Voter.objects.filter(county=voter.county, last_name=voter.last_name, first_name=voter.first_name)),
+        ('voter by name statewide',
+         Voter.objects.filter(last_name=voter.last_name, first_name=voter.first_name)),
+        ('voters in a precinct',
+         Voter.objects.filter(county=voter.county, precinct_code=voter.precinct_code)),
+        ('party members in a county',
+         Voter.objects.filter(county=voter.county, party_affiliation=voter.party_affiliation)),
+        ('voters in a congressional district',
+         Voter.objects.filter(congressional_district=voter.congressional_district)),
+        ('voters in a senate district',
+         Voter.objects.filter(state_senate_district=voter.state_senate_district)),
+        ('participants in one election',
+         Participation.objects.filter(election=general).values('voter_id')),
+        ('one voter\'s elections',
+         Participation.objects.filter(voter=voter).values('election_id')),
+    ]
+    queries = []
+    for name, queryset in querysets:
+        # Without the models' default ordering, which PostgreSQL would
+        # otherwise pick an index for
+        sql, params = queryset.order_by().query.sql_with_params()
+        queries.append((name, 'SELECT count(*) FROM ({}) q'.format(sql), params))
+
+    queries.append((
+        'primary turnout by county',
+        """SELECT v.county, count(*) FROM ohiovoter_participation p
+           JOIN ohiovoter_voter v ON v.sos_voterid = p.voter_id
+           WHERE p.election_id = ANY(%s) GROUP BY v.county""",
+        [primaries],
+    ))
+    return queries
+
+
+def plan_summary(plan):
+    """
+    Describe the scans in a plan, like 'Index Scan on some_index', with the
+    partitions of the participation table counted rather than listed.
+    """
+    scans = set()
+    partitions = set()
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get('Plans', []))
+        if not node['Node Type'].endswith('Scan') or node['Node Type'] == 'Bitmap Heap Scan':
+            continue
+        target = node.get('Index Name', node.get('Relation Name'))
+        match = PARTITION.match(target)
+        if match:
+            partitions.add(match.group(2))
+            target = PARTITION.sub(r'\1_*', target)
+        scans.add('{} on {}'.format(node['Node Type'], target))
+
+    summary = sorted(scans)
+    if partitions:
+        summary.append('{} participation partition{}'.format(len(partitions), '' if len(partitions) == 1 else 's'))
+    return ', '.join(summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of each query; the median is reported')
+    args = parser.parse_args()
+
+    print('{:<36} {:>10}  {}'.format('', 'median', 'plan'))
+    with closing(connection.cursor()) as cursor:
+        for name, sql, params in sample_queries():
+            timings = []
+            for _ in range(args.repeat):
+                cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params)
+                result = cursor.fetchone()[0]
+                # psycopg2 only decodes json columns it knows about
+                if isinstance(result, str):
+                    result = json.loads(result)
+                timings.append(result[0]['Execution Time'])
+
+            print('{:<36} {:>8.1f}ms  {}'.format(name, statistics.median(timings), plan_summary(result[0]['Plan'])))
+
+
+if __name__ == '__main__':
+    main()
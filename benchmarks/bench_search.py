@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Benchmark of ohiovoter.search.match_voters on whatever is imported in the
+configured database (nothing is written). Records are made from a sample of
+voters, as given, misspelled, and without a date of birth, and matched both
+with a query per record on the exact name and date of birth and with
+match_voters. For each way, it reports records matched per second and how
+often the voter the record came from was the best candidate.
+
+    python benchmarks/bench_search.py --records 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ohiovoter.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from ohiovoter.models import Voter  # noqa: E402
+from ohiovoter.search import match_voters, split_name  # noqa: E402
+
+
+SPELLED_OUT = {'ST': 'Street', 'AVE': 'Avenue', 'RD': 'Road', 'DR': 'Drive', 'LN': 'Lane', 'N': 'North', 'S': 'South'}
+
+
+def misspell(name):
+    """
+    The name with one letter after the first changed, the kind of typo
+    Soundex forgives when the letter is a vowel.
+    """
+    if len(name) < 3:
+        return name
+    position = random.randrange(1, len(name))
+    return name[:position] + random.choice('AEIOU') + name[position + 1:]
+
+
+def sample_records(count):
+    """
+    (voter id, records) for each variant of `count` random voters.
+    """
+    voters = list(
+        Voter.objects.exclude(last_name='').exclude(first_name='').order_by('?').values_list(
+            'sos_voterid', 'first_name', 'last_name', 'date_of_birth', 'residential_address1',
+        )[:count]
+    )
+    voter_ids = [voter[0] for voter in voters]
+    return voter_ids, [
+        ('as given', [
+            ('{} {}'.format(first, last), born, address) for _, first, last, born, address in voters
+        ]),
+        ('misspelled', [
+            ('{}, {}'.format(misspell(last), first.title()), born, address) for _, first, last, born, address in voters
+        ]),
+        ('no date of birth', [
+            ('{} {}'.format(first.title(), last.title()), None,
+             ' '.join(SPELLED_OUT.get(word, word) for word in (address or '').split()))
+            for _, first, last, born, address in voters
+        ]),
+    ]
+
+
+def exact_lookups(records, batch_size):
+    """
+    The best voter id (or None) for each record, from a query per record for
+    voters with exactly its first name, last name and date of birth.
+    """
+    best = []
+    for name, born, address in records:
+        first, last = split_name(name)
+        best.append(Voter.objects.filter(
+            last_name=last.strip().upper(), first_name=first.upper(), date_of_birth=born,
+        ).values_list('sos_voterid', flat=True).first())
+    return best
+
+
+def batch_matches(records, batch_size):
+    """
+    The best voter id (or None) for each record, from match_voters.
+    """
+    return [candidates[0][0] if candidates else None for candidates in match_voters(records, batch_size=batch_size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=2000, help='Voters to make records from')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Records per match_voters query')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    voter_ids, variants = sample_records(args.records)
+
+    print('{:<18} {:>14} {:>10} {:>14} {:>10}'.format('', 'exact/s', 'found', 'match_voters/s', 'found'))
+    for name, records in variants:
+        results = []
+        for match in (exact_lookups, batch_matches):
+            started = time.perf_counter()
+            best = match(records, args.batch_size)
+            elapsed = time.perf_counter() - started
+            found = sum(1 for voter_id, best_id in zip(voter_ids, best) if voter_id == best_id)
+            results.extend([len(records) / elapsed, found / len(records)])
+
+        print('{:<18} {:>14.0f} {:>9.1%} {:>14.0f} {:>9.1%}'.format(name, *results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Generate synthetic county voter files laid out like the Secretary of State's:
+a quoted CSV per county with the voter columns followed by one column per
+election, headed like GENERAL-11/08/2016, holding the party each voter
+participated as. Every county in the importer's list gets a file, sized
+unevenly the way real counties are, so the output can be imported with
+`import_data --source-dir`.
+
+    python benchmarks/generate_voter_files.py /tmp/voter-files --rows 500000 --elections 150
+"""
+import argparse
+import csv
+from datetime import date, timedelta
+import os
+import random
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ohiovoter.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from ohiovoter.management.commands.import_data import COUNTIES, VOTER_COLUMNS  # noqa: E402
+from ohiovoter.search import SEARCH_KEY_COLUMNS  # noqa: E402
+
+
+SOURCE_COLUMNS = [c for c in VOTER_COLUMNS if c not in ('county', 'row_hash') and c not in SEARCH_KEY_COLUMNS]
+
+LAST_NAMES = ['SMITH', 'JOHNSON', 'WILLIAMS', 'BROWN', 'JONES', 'MILLER', 'DAVIS', 'WILSON', 'HODGES', 'MOORE']
+FIRST_NAMES = ['JAMES', 'MARY', 'JOHN', 'PATRICIA', 'ROBERT', 'JENNIFER', 'MICHAEL', 'LINDA', 'MATTHEW', 'SARAH']
+STREETS = ['MAIN ST', 'HIGH ST', 'BROAD ST', 'OAK AVE', 'MAPLE DR', 'CHURCH ST', 'PARK RD', 'ELM ST']
+CITIES = ['COLUMBUS', 'CLEVELAND', 'CINCINNATI', 'TOLEDO', 'AKRON', 'DAYTON', 'PARMA', 'CANTON']
+
+
+def election_headers(num_elections):
+    """
+    Headers for `num_elections` elections, oldest first, cycling through
+    the election categories.
+    """
+    categories = ['GENERAL', 'PRIMARY', 'SPECIAL']
+    start = date(2000, 3, 7)
+    return [
+        '{}-{}'.format(categories[i % 3], (start + timedelta(days=40 * i)).strftime('%m/%d/%Y'))
+        for i in range(num_elections)
+    ]
+
+
+def synthetic_header(num_elections):
+    return [c.upper() for c in SOURCE_COLUMNS] + election_headers(num_elections)
+
+
+def synthetic_voter(rng, sos_voterid, county_number):
+    """
+    Values for every source column of one voter, of the types the Voter
+    fields expect, with the usual share of blanks.
+    """
+    values = {
+        'sos_voterid': sos_voterid,
+        'county_number': str(county_number),
+        'county_id': str(rng.randint(1, 9999999)),
+        'last_name': rng.choice(LAST_NAMES),
+        'first_name': rng.choice(FIRST_NAMES),
+        'middle_name': rng.choice(FIRST_NAMES + [''] * 3),
+        'suffix': rng.choice(['', '', '', '', 'JR', 'SR', 'III']),
+        'date_of_birth': (date(1920, 1, 1) + timedelta(days=rng.randint(0, 30000))).isoformat(),
+        'registration_date': (date(1960, 1, 1) + timedelta(days=rng.randint(0, 20000))).isoformat(),
+        'voter_status': rng.choice(['ACTIVE', 'ACTIVE', 'ACTIVE', 'CONFIRMATION']),
+        'party_affiliation': rng.choice(['', '', 'D', 'R']),
+        'residential_address1': '{} {}'.format(rng.randint(1, 9999), rng.choice(STREETS)),
+        'residential_city': rng.choice(CITIES),
+        'residential_state': 'OH',
+        'residential_zip': str(rng.randint(43001, 45999)),
+        'congressional_district': str(rng.randint(1, 16)),
+        'precinct_name': 'PRECINCT {}'.format(rng.randint(1, 200)),
+        'precinct_code': '{:02d}-{}'.format(county_number, rng.randint(1, 200)),
+        'state_representative_district': str(rng.randint(1, 99)),
+        'state_senate_district': str(rng.randint(1, 33)),
+        'ward': rng.choice(['', 'WARD 1', 'WARD 2', 'WARD 3']),
+    }
+    return [values.get(column, '') for column in SOURCE_COLUMNS]
+
+
+def synthetic_rows(num_rows, num_elections, turnout, seed=0, county_number=1, first_voter=0):
+    """
+    Yield `num_rows` rows of a synthetic county file, to go under
+    synthetic_header(num_elections). `turnout` is the fraction of election
+    cells that hold a vote.
+    """
+    rng = random.Random(seed)
+    primaries = [header.startswith('PRIMARY') for header in election_headers(num_elections)]
+
+    for i in range(first_voter, first_voter + num_rows):
+        row = synthetic_voter(rng, 'OH{:010d}'.format(i), county_number)
+        for primary in primaries:
+            if rng.random() < turnout:
+                row.append(rng.choice('DRX') if primary else 'X')
+            else:
+                row.append('')
+        yield row
+
+
+def county_row_counts(total_rows, seed=0):
+    """
+    Split `total_rows` over the counties, a few large ones and many small
+    ones, like the real file. Every county gets at least one voter.
+    """
+    rng = random.Random(seed)
+    weights = [rng.paretovariate(1.2) for _ in COUNTIES]
+    scale = max(total_rows - len(COUNTIES), 0) / sum(weights)
+    counts = [1 + int(weight * scale) for weight in weights]
+    counts[weights.index(max(weights))] += max(total_rows - sum(counts), 0)
+    return dict(zip(COUNTIES, counts))
+
+
+def write_county_files(directory, total_rows, num_elections, turnout, seed=0, archive=True):
+    """
+    Write a file for every county into `directory`, zipped as
+    {COUNTY}.zip unless `archive` is false, and return the number of rows
+    written for each county.
+    """
+    os.makedirs(directory, exist_ok=True)
+    counts = county_row_counts(total_rows, seed)
+
+    header = synthetic_header(num_elections)
+    first_voter = 0
+    for county_number, county in enumerate(COUNTIES, 1):
+        rows = synthetic_rows(counts[county], num_elections, turnout, seed + county_number, county_number, first_voter)
+        first_voter += counts[county]
+
+        text_file_name = os.path.join(directory, '{}.TXT'.format(county))
+        with open(text_file_name, 'w', encoding='utf-8', newline='') as text_file:
+            writer = csv.writer(text_file, quoting=csv.QUOTE_ALL)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+        if archive:
+            with zipfile.ZipFile(os.path.join(directory, '{}.zip'.format(county)), 'w', zipfile.ZIP_DEFLATED) as z:
+                z.write(text_file_name, '{}.TXT'.format(county))
+            os.remove(text_file_name)
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory')
+    parser.add_argument('--rows', type=int, default=100000, help='Voters across all counties')
+    parser.add_argument('--elections', type=int, default=150)
+    parser.add_argument('--turnout', type=float, default=0.06,
+                        help='Fraction of election cells that hold a vote (the statewide file is about 6%%)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--text', action='store_true', help='Write plain {COUNTY}.TXT files instead of archives')
+    args = parser.parse_args()
+
+    counts = write_county_files(args.directory, args.rows, args.elections, args.turnout, args.seed, not args.text)
+    print('Wrote {:,} voters in {} county files to {}'.format(sum(counts.values()), len(counts), args.directory))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+from contextlib import closing
+from datetime import date
+from itertools import count
+
+from django.db import connection, transaction
+
+from ohiovoter.models import Election
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+
+# Voter columns that turnout can be broken down by
+GROUP_COLUMNS = (
+    'county',
+    'county_number',
+    'precinct_name',
+    'precinct_code',
+    'ward',
+    'residential_city',
+    'residential_zip',
+    'congressional_district',
+    'state_senate_district',
+    'state_representative_district',
+    'township',
+    'village',
+    'city',
+    'city_school_district',
+    'local_school_district',
+    'exempted_vill_school_district',
+    'county_court_district',
+    'court_of_appeals',
+    'party_affiliation',
+    'voter_status',
+)
+
+_cursor_names = count()
+
+
+def election_ids(elections):
+    """
+    Ids for an Election, an id, or an iterable of either.
+    """
+    if isinstance(elections, (Election, int)):
+        elections = [elections]
+    return [e.pk if isinstance(e, Election) else e for e in elections]
+
+
+def primary_ids(primary_date):
+    """
+    Ids of every party's primary held on `primary_date`.
+    """
+    return list(
+        Election.objects.filter(date=primary_date, category=Election.CATEGORY_PRIMARY).values_list('id', flat=True)
+    )
+
+
+def turnout(elections, by='county'):
+    """
+    Turnout among current registrants, grouped by one or more Voter columns
+    (see GROUP_COLUMNS). A voter counts as having voted if they participated
+    in any of `elections`, so pass every party's primary for primary
+    turnout (see primary_ids).
+
+    Returns a list of (group, registered, voted, rate) sorted by group, where
+    group is a value, or a tuple of values if `by` names several columns.
+    Everything is counted in PostgreSQL in one pass over the voters.
+    """
+    columns = [by] if isinstance(by, str) else list(by)
+    for column in columns:
+        if column not in GROUP_COLUMNS:
+            raise ValueError('Can not group turnout by {!r}'.format(column))
+    group = ', '.join('v.{}'.format(column) for column in columns)
+
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(
+            """SELECT {group}, count(*), count(*) FILTER (WHERE EXISTS (
+                   SELECT 1 FROM ohiovoter_participation p
+                   WHERE p.voter_id = v.sos_voterid AND p.election_id = ANY(%s)
+               ))
+               FROM ohiovoter_voter v
+               GROUP BY {group}
+               ORDER BY {group}""".format(group=group),
+            [election_ids(elections)],
+        )
+        rows = cursor.fetchall()
+
+    results = []
+    for row in rows:
+        key = row[0] if len(columns) == 1 else tuple(row[:len(columns)])
+        registered, voted = row[-2:]
+        results.append((key, registered, voted, voted / registered))
+    return results
+
+
+def crossover(earlier_primary_date, later_primary_date):
+    """
+    How voters who took part in both primaries moved between parties.
+
+    Returns a dict of (earlier party, later party) to the number of voters,
+    with parties as Election.PARTY_* codes.
+    """
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(
+            """SELECT a.party, b.party, count(*)
+               FROM ohiovoter_participation pa
+               JOIN ohiovoter_election a ON a.id = pa.election_id
+               JOIN ohiovoter_participation pb ON pb.voter_id = pa.voter_id
+               JOIN ohiovoter_election b ON b.id = pb.election_id
+               WHERE pa.election_id = ANY(%s) AND pb.election_id = ANY(%s)
+               GROUP BY a.party, b.party""",
+            [primary_ids(earlier_primary_date), primary_ids(later_primary_date)],
+        )
+        return {(earlier, later): voters for earlier, later, voters in cursor.fetchall()}
+
+
+def retention(elections):
+    """
+    For each consecutive pair of `elections` (Elections or ids, in the order
+    given), how many of the first one's voters also voted in the second.
+
+    Returns a list of (election id, next election id, voters, retained,
+    rate). Each pair is one join of the participation indexes in PostgreSQL.
+    """
+    ids = election_ids(elections)
+    results = []
+    with closing(connection.cursor()) as cursor:
+        for election_id, next_election_id in zip(ids, ids[1:]):
+            cursor.execute(
+                """SELECT count(*), count(b.voter_id)
+                   FROM ohiovoter_participation a
+                   LEFT JOIN ohiovoter_participation b
+                       ON b.voter_id = a.voter_id AND b.election_id = %s
+                   WHERE a.election_id = %s""",
+                [next_election_id, election_id],
+            )
+            voters, retained = cursor.fetchone()
+            results.append((election_id, next_election_id, voters, retained, retained / voters if voters else None))
+    return results
+
+
+def iter_batches(queryset, fields, batch_size=50000):
+    """
+    Stream `fields` of `queryset` (which may follow relations, like
+    'voter__county') as lists of up to `batch_size` tuples, through a
+    server-side cursor so the whole result is never held in memory and no
+    model instances are built.
+    """
+    sql, params = queryset.values_list(*fields).query.sql_with_params()
+    return iter_query_batches(sql, params, batch_size)
+
+
+def iter_query_batches(sql, params=None, batch_size=50000):
+    """
+    Stream the rows of a query as lists of up to `batch_size` tuples,
+    through a server-side cursor.
+    """
+    with transaction.atomic():
+        connection.ensure_connection()
+        # A named psycopg2 cursor is a server-side cursor
+        with closing(connection.connection.cursor('ohiovoter_batches_{}'.format(next(_cursor_names)))) as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield rows
+
+
+def fetch_columns(queryset, fields, batch_size=50000):
+    """
+    `fields` of `queryset` as a dict of field name to NumPy array, filled in
+    batches (see iter_batches). Integers become int64 arrays (float64 if any
+    are null) and dates datetime64[D]; everything else is an object array.
+    """
+    if numpy is None:
+        raise ImportError('fetch_columns needs NumPy (pip install numpy)')
+
+    chunks = {field: [] for field in fields}
+    for rows in iter_batches(queryset, fields, batch_size):
+        for field, values in zip(fields, zip(*rows)):
+            chunks[field].append(column_array(values))
+
+    return {
+        field: numpy.concatenate(arrays) if arrays else numpy.array([], dtype=object)
+        for field, arrays in chunks.items()
+    }
+
+
+def column_array(values):
+    sample = next((value for value in values if value is not None), None)
+    if isinstance(sample, date):
+        return numpy.array(values, dtype='datetime64[D]')
+    if isinstance(sample, int) and not isinstance(sample, bool):
+        if None in values:
+            return numpy.array([numpy.nan if value is None else value for value in values], dtype='float64')
+        return numpy.array(values, dtype='int64')
+    return numpy.array(values, dtype=object)
+
+
+def fetch_frame(queryset, fields, batch_size=50000):
+    """
+    fetch_columns as a pandas DataFrame.
+    """
+    if pandas is None:
+        raise ImportError('fetch_frame needs pandas (pip install pandas)')
+    return pandas.DataFrame(fetch_columns(queryset, fields, batch_size), columns=list(fields))
@@ -0,0 +1,545 @@
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from itertools import chain
+from multiprocessing.pool import ThreadPool
+import re
+import time
+
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+
+from ohiovoter.models import DeferredDefinition
+from ohiovoter.partitions import (
+    create_partitioned_table, is_partitioned, rename_partitions, sync_election_partitions,
+)
+
+
+class DeferredIndexes(object):
+    """
+    The secondary indexes, unique constraints and foreign keys of a set of
+    tables, dropped before a bulk load and rebuilt afterwards. Primary keys
+    are left in place.
+
+    Definitions are read from the PostgreSQL catalog rather than the Django
+    models, so whatever indexes exist on the tables (including ones added by
+    hand) come back exactly as they were. On a partitioned table they're
+    dropped and rebuilt on every partition.
+
+    The definitions are saved to the DeferredDefinition table in the same
+    transaction as the drop, and each is forgotten once it's rebuilt. If
+    the process dies in between, saved() picks up what's left.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.partitioned = set()
+        self.indexes = []  # (table, index name, CREATE INDEX statement)
+        self.unique_constraints = []  # (table, constraint name, CREATE UNIQUE INDEX statement, constraint definition)
+        self.foreign_keys = []  # (table, constraint name, constraint definition)
+        # Indexes behind unique constraints that were built but not yet
+        # attached when an earlier import died
+        self.built_indexes = set()
+
+    @classmethod
+    def saved(cls):
+        """
+        What an earlier import dropped and didn't get to rebuild, less
+        whatever of it exists again, or None if there's nothing.
+        """
+        with closing(connection.cursor()) as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [DeferredDefinition._meta.db_table])
+            if cursor.fetchone()[0] is None:
+                # Not migrated yet
+                return None
+
+            deferred = cls([])
+            for definition in DeferredDefinition.objects.all():
+                cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [definition.name])
+                index_exists, = cursor.fetchone()
+                cursor.execute(
+                    'SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s)',
+                    [definition.table, definition.name],
+                )
+                constraint_exists, = cursor.fetchone()
+
+                if definition.partitioned:
+                    deferred.partitioned.add(definition.table)
+                if definition.kind == DeferredDefinition.KIND_INDEX and not index_exists:
+                    deferred.indexes.append((definition.table, definition.name, definition.index_definition))
+                elif definition.kind == DeferredDefinition.KIND_UNIQUE and not constraint_exists:
+                    deferred.unique_constraints.append((
+                        definition.table, definition.name, definition.index_definition,
+                        definition.constraint_definition,
+                    ))
+                    if index_exists:
+                        deferred.built_indexes.add(definition.name)
+                elif definition.kind == DeferredDefinition.KIND_FOREIGN_KEY and not constraint_exists:
+                    deferred.foreign_keys.append((definition.table, definition.name, definition.constraint_definition))
+
+        if not (deferred.indexes or deferred.unique_constraints or deferred.foreign_keys):
+            DeferredDefinition.objects.all().delete()
+            return None
+        deferred.tables = sorted(set(
+            item[0] for item in deferred.indexes + deferred.unique_constraints + deferred.foreign_keys
+        ))
+        return deferred
+
+    def drop(self):
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            self.partitioned = set(table for table in self.tables if is_partitioned(cursor, table))
+            constraints, indexes = table_definitions(cursor, self.tables)
+            # A partitioned table's index definitions are ON ONLY the table
+            self.indexes = [(table, name, copy_index(definition, name, table)) for table, name, definition in indexes]
+            for table, name, constraint_type, definition, index_definition, referenced_table in constraints:
+                if constraint_type == 'f':
+                    self.foreign_keys.append((table, name, definition))
+                elif constraint_type == 'u':
+                    self.unique_constraints.append((table, name, copy_index(index_definition, name, table), definition))
+
+            # Saved with the drop, so they outlive this process
+            DeferredDefinition.objects.bulk_create(
+                [
+                    DeferredDefinition(
+                        table=table, name=name, kind=DeferredDefinition.KIND_INDEX, index_definition=definition,
+                        partitioned=table in self.partitioned,
+                    )
+                    for table, name, definition in self.indexes
+                ] + [
+                    DeferredDefinition(
+                        table=table, name=name, kind=DeferredDefinition.KIND_UNIQUE,
+                        index_definition=index_definition, constraint_definition=definition,
+                        partitioned=table in self.partitioned,
+                    )
+                    for table, name, index_definition, definition in self.unique_constraints
+                ] + [
+                    DeferredDefinition(
+                        table=table, name=name, kind=DeferredDefinition.KIND_FOREIGN_KEY,
+                        constraint_definition=definition, partitioned=table in self.partitioned,
+                    )
+                    for table, name, definition in self.foreign_keys
+                ]
+            )
+
+            for table, name, definition in self.foreign_keys:
+                cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(table, name))
+            for table, name, index_definition, definition in self.unique_constraints:
+                cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(table, name))
+            for table, name, definition in self.indexes:
+                cursor.execute('DROP INDEX {}'.format(name))
+
+    def rebuild_indexes(self, workers):
+        """
+        Build every dropped index, including the ones behind unique
+        constraints, with up to `workers` concurrent connections.
+        PostgreSQL lets several CREATE INDEX statements run on the same table
+        at once.
+        """
+        statements = [definition for table, name, definition in self.indexes]
+        for table, name, index_definition, definition in self.unique_constraints:
+            if name in self.built_indexes:
+                continue
+            if table in self.partitioned:
+                # PostgreSQL can't attach a constraint to an existing index
+                # of a partitioned table
+                statements.append('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(table, name, definition))
+            else:
+                statements.append(index_definition)
+        run_in_parallel(statements, workers)
+
+        # Attaching a constraint to an existing index is a catalog change
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            for table, name, index_definition, definition in self.unique_constraints:
+                if table not in self.partitioned:
+                    cursor.execute('ALTER TABLE {0} ADD CONSTRAINT {1} UNIQUE USING INDEX {1}'.format(table, name))
+            DeferredDefinition.objects.filter(
+                kind__in=[DeferredDefinition.KIND_INDEX, DeferredDefinition.KIND_UNIQUE],
+                name__in=[name for table, name, definition in self.indexes] +
+                         [name for table, name, index_definition, definition in self.unique_constraints],
+            ).delete()
+
+    def rebuild_foreign_keys(self):
+        # Adding a foreign key locks both tables against other foreign key
+        # validations, so there's nothing to gain from running these at once
+        with closing(connection.cursor()) as cursor:
+            for table, name, definition in self.foreign_keys:
+                cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(table, name, definition))
+                DeferredDefinition.objects.filter(
+                    kind=DeferredDefinition.KIND_FOREIGN_KEY, table=table, name=name,
+                ).delete()
+
+
+def table_definitions(cursor, tables):
+    """
+    Read the constraints and indexes of `tables` from the catalog.
+
+    Returns a list of (table, constraint name, constraint type, constraint
+    definition, index definition, referenced table) for every primary key,
+    unique and foreign key constraint, and a list of (table, index name,
+    CREATE INDEX statement) for every other index.
+    """
+    cursor.execute(
+        """SELECT c.conrelid::regclass::text, c.conname, c.contype, pg_get_constraintdef(c.oid),
+                  pg_get_indexdef(c.conindid), c.confrelid::regclass::text
+           FROM pg_constraint c
+           WHERE c.conrelid = ANY(%s::regclass[]) AND c.contype IN ('p', 'u', 'f')
+           ORDER BY c.conrelid, c.conname""",
+        [tables],
+    )
+    constraints = cursor.fetchall()
+
+    cursor.execute(
+        """SELECT i.indrelid::regclass::text, i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+           FROM pg_index i
+           WHERE i.indrelid = ANY(%s::regclass[]) AND NOT i.indisprimary AND NOT EXISTS (
+               SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid AND c.contype <> 'f'
+           )
+           ORDER BY i.indrelid, i.indexrelid""",
+        [tables],
+    )
+    indexes = cursor.fetchall()
+
+    return constraints, indexes
+
+
+# CREATE INDEX statements as pg_get_indexdef() writes them
+INDEX_DEFINITION = re.compile(r'^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+ (USING .*)$')
+
+
+class ShadowTables(object):
+    """
+    Empty copies of a set of tables for a full import to load into while the
+    live tables keep serving reads.
+
+    Once the copies are loaded, build() gives them every index and constraint
+    the live tables have, under temporary names. swap()
+    then drops the live tables and renames the copies, and their indexes and
+    constraints, into place in a single transaction: queries see the previous
+    data right up until it commits, and the new data right after.
+
+    Foreign keys between the tables being swapped point at the copies; any
+    other table referencing them would block the swap. The copy of a table
+    partitioned by election is partitioned the same way.
+
+    With `unlogged`, the copies (other than partitioned ones) are created
+    UNLOGGED, so loading them writes no WAL, and set_logged() makes them
+    crash-safe before build(). A crash while they're unlogged empties them.
+    """
+
+    def __init__(self, tables, unlogged=False):
+        self.tables = tables
+        self.names = {table: '{}_shadow'.format(table) for table in tables}
+        self.unlogged = unlogged
+        self.partitioned = set()
+        self.renames = []  # (table, temporary name, name, whether it's a constraint)
+
+    def create(self, keep_existing=False):
+        """
+        Create the empty copies, replacing any left over from an earlier
+        import unless `keep_existing` is set (to resume loading them).
+        """
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            if not keep_existing:
+                cursor.execute('DROP TABLE IF EXISTS {}'.format(', '.join(self.names[table] for table in self.tables)))
+            for table in self.tables:
+                if not is_partitioned(cursor, table):
+                    cursor.execute(
+                        'CREATE {}TABLE IF NOT EXISTS {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'.format(
+                            'UNLOGGED ' if self.unlogged else '', self.names[table], table,
+                        )
+                    )
+                    continue
+                self.partitioned.add(table)
+                cursor.execute('SELECT to_regclass(%s)', [self.names[table]])
+                if cursor.fetchone()[0] is None:
+                    create_partitioned_table(cursor, self.names[table], table)
+
+        for table in self.partitioned:
+            sync_election_partitions(self.names[table])
+
+    def exist(self):
+        """
+        Whether every copy exists, left over from an earlier import.
+        """
+        with closing(connection.cursor()) as cursor:
+            for table in self.tables:
+                cursor.execute('SELECT to_regclass(%s)', [self.names[table]])
+                if cursor.fetchone()[0] is None:
+                    return False
+        return True
+
+    def build(self, workers):
+        """
+        Build the live tables' indexes and constraints on the copies, with up
+        to `workers` concurrent connections.
+        """
+        shadow_tables = [self.names[table] for table in self.tables]
+
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            # Anything an interrupted build left behind
+            constraints, indexes = table_definitions(cursor, shadow_tables)
+            for table, name, constraint_type, definition, index_definition, referenced_table in constraints:
+                if constraint_type == 'f':
+                    cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(table, name))
+            for table, name, constraint_type, definition, index_definition, referenced_table in constraints:
+                if constraint_type != 'f':
+                    cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(table, name))
+            for table, name, definition in indexes:
+                cursor.execute('DROP INDEX {}'.format(name))
+
+            constraints, indexes = table_definitions(cursor, self.tables)
+
+        self.renames = []
+        statements = []
+        attach = []
+        foreign_keys = []
+
+        def temporary_name(table, name, constraint):
+            temporary = '{}_{}'.format(self.names[table], len(self.renames))
+            self.renames.append((table, temporary, name, constraint))
+            return temporary
+
+        for table, name, definition in indexes:
+            statements.append(copy_index(definition, temporary_name(table, name, False), self.names[table]))
+
+        for table, name, constraint_type, definition, index_definition, referenced_table in constraints:
+            temporary = temporary_name(table, name, True)
+            if constraint_type == 'f':
+                if referenced_table in self.names:
+                    definition = definition.replace(
+                        'REFERENCES {}('.format(referenced_table),
+                        'REFERENCES {}('.format(self.names[referenced_table]),
+                    )
+                foreign_keys.append((self.names[table], temporary, definition))
+            elif table in self.partitioned:
+                # PostgreSQL can't attach a constraint to an existing index
+                # of a partitioned table
+                statements.append('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(self.names[table], temporary, definition))
+            else:
+                statements.append(copy_index(index_definition, temporary, self.names[table]))
+                attach.append((
+                    self.names[table], temporary, 'PRIMARY KEY' if constraint_type == 'p' else 'UNIQUE',
+                ))
+
+        run_in_parallel(statements, workers)
+
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            for table, name, constraint in attach:
+                cursor.execute('ALTER TABLE {0} ADD CONSTRAINT {1} {2} USING INDEX {1}'.format(table, name, constraint))
+
+        with closing(connection.cursor()) as cursor:
+            for table, name, definition in foreign_keys:
+                cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(table, name, definition))
+
+    def set_logged(self):
+        """
+        Make unlogged copies crash-safe, which writes each of them to the WAL
+        once. PostgreSQL won't let a logged table reference an unlogged one,
+        so this comes before build() adds the foreign keys.
+        """
+        with closing(connection.cursor()) as cursor:
+            for table in self.tables:
+                cursor.execute(
+                    "SELECT relpersistence = 'u' FROM pg_class WHERE oid = %s::regclass", [self.names[table]],
+                )
+                if cursor.fetchone()[0]:
+                    cursor.execute('ALTER TABLE {} SET LOGGED'.format(self.names[table]))
+
+    def swap(self):
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            cursor.execute('DROP TABLE {}'.format(', '.join(self.tables)))
+            for table in self.tables:
+                cursor.execute('ALTER TABLE {} RENAME TO {}'.format(self.names[table], table))
+                if table in self.partitioned:
+                    rename_partitions(cursor, table, self.names[table])
+            for table, temporary, name, constraint in self.renames:
+                if constraint:
+                    cursor.execute('ALTER TABLE {} RENAME CONSTRAINT {} TO {}'.format(table, temporary, name))
+                else:
+                    cursor.execute('ALTER INDEX {} RENAME TO {}'.format(temporary, name))
+
+
+def copy_index(definition, name, table):
+    """
+    Rewrite a CREATE INDEX statement to build the same index, called `name`,
+    on `table` (and on every partition, if it's partitioned).
+    """
+    match = INDEX_DEFINITION.match(definition)
+    return 'CREATE {}INDEX {} ON {} {}'.format(match.group(1) or '', name, table, match.group(3))
+
+
+class IteratorFile(object):
+    """
+    A read-only file over an iterator of strings, for feeding COPY ... FROM
+    STDIN. psycopg2 reads the file in small blocks, so the iterator is only
+    advanced as fast as PostgreSQL ingests: nothing is buffered beyond the
+    current block, and producing rows overlaps with the database writing them.
+    """
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self._buffer = ''
+
+    def read(self, size=-1):
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            try:
+                part = next(self._iterator)
+            except StopIteration:
+                break
+            parts.append(part)
+            length += len(part)
+
+        data = ''.join(parts)
+        if size < 0:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+class LineWriter(object):
+    """
+    Collects what a csv.writer writes so each formatted line can be handed
+    on as soon as it's written.
+    """
+
+    def __init__(self):
+        self.line = ''
+
+    def write(self, data):
+        self.line += data
+
+
+# Settings for every database session of an import, tuned for bulk
+# loading. import_data --db-setting overrides or adds to them.
+LOAD_SESSION_SETTINGS = OrderedDict([
+    # Commits don't wait for the WAL to reach disk. A crash can lose the
+    # last few commits but never corrupts anything, and a unit commits along
+    # with its ledger entry, so --resume loads whatever was lost again.
+    ('synchronous_commit', 'off'),
+    # For the sorts and hashes of incremental merges, histories and rollups
+    ('work_mem', '64MB'),
+    # For building indexes and validating foreign keys
+    ('maintenance_work_mem', '256MB'),
+])
+
+# The settings applied to each connection this process opens, installed by
+# use_session_settings
+_session_settings = OrderedDict()
+
+
+def apply_session_settings(sender, connection, **kwargs):
+    if not _session_settings:
+        return
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(
+            'SELECT {}'.format(', '.join(['set_config(%s, %s, false)'] * len(_session_settings))),
+            list(chain.from_iterable(_session_settings.items())),
+        )
+
+
+def use_session_settings(settings):
+    """
+    Apply `settings`, a dict of PostgreSQL setting names to values, to every
+    database connection this process opens from now on, in place of any
+    given before.
+    """
+    global _session_settings
+    _session_settings = OrderedDict(settings)
+    connection_created.connect(apply_session_settings, dispatch_uid='ohiovoter.bulkload.apply_session_settings')
+
+
+# Shared semaphore capping how many load workers write to the database at
+# once, installed in each worker process by init_load_worker
+_writer_slots = None
+
+
+def init_load_worker(slots, session_settings):
+    """
+    Set up a load worker process: its share of the database writer slots,
+    and the settings for its database session.
+
+    Each worker keeps its connection open from one unit to the next, so the
+    workers make a pool of --parse-workers connections, at most --db-writers
+    of them COPYing at once.
+    """
+    global _writer_slots
+    _writer_slots = slots
+    use_session_settings(session_settings)
+
+
+# How many lines writer_slot parses ahead between checks for a free slot
+WRITER_SLOT_POLL_LINES = 1000
+
+
+@contextmanager
+def writer_slot(lines, metrics=None):
+    """
+    Hold one of the database writer slots for as long as a batch is being
+    COPYed, and yield a file over the batch's lines to COPY from.
+
+    When a slot is free the lines are streamed straight into COPY. When none
+    is, the batch is parsed into memory while waiting for one, checking for
+    a free slot every WRITER_SLOT_POLL_LINES lines, so the worker keeps doing
+    useful work instead of idling on the semaphore; once it has a slot, the
+    rest of the batch is streamed. Only if the whole batch is parsed before
+    a slot frees up does it block. Time spent blocked on a slot is added to
+    `metrics`, if given.
+    """
+    if _writer_slots is None:
+        yield IteratorFile(lines)
+        return
+
+    if _writer_slots.acquire(False):
+        stream = IteratorFile(lines)
+    else:
+        lines = iter(lines)
+        parsed = []
+        for line in lines:
+            parsed.append(line)
+            if len(parsed) % WRITER_SLOT_POLL_LINES == 0 and _writer_slots.acquire(False):
+                break
+        else:
+            started = time.perf_counter()
+            _writer_slots.acquire()
+            if metrics is not None:
+                metrics.add_time('writer slot wait', time.perf_counter() - started)
+        stream = IteratorFile(chain(parsed, lines))
+
+    try:
+        yield stream
+    finally:
+        _writer_slots.release()
+
+
+def analyze(tables, workers):
+    run_in_parallel(['ANALYZE {}'.format(table) for table in tables], workers)
+
+
+def run_in_parallel(statements, workers):
+    """
+    Execute each statement on its own connection, at most `workers` at a time.
+    A statement can also be a (statement, parameters) tuple.
+    """
+    def execute(statement):
+        if isinstance(statement, tuple):
+            statement, params = statement
+        else:
+            params = None
+        try:
+            with closing(connection.cursor()) as cursor:
+                cursor.execute(statement, params)
+        finally:
+            # Django connections are per thread; don't leave this one open
+            connection.close()
+
+    if not statements:
+        return
+
+    pool = ThreadPool(max(1, min(workers, len(statements))))
+    try:
+        pool.map(execute, statements)
+    finally:
+        pool.close()
+        pool.join()
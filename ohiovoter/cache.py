@@ -0,0 +1,284 @@
+from collections import OrderedDict
+from contextlib import closing
+from datetime import date
+from functools import wraps
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, models
+
+
+class MemoryBackend(object):
+    """
+    Pickled results in this process's memory, evicting the least recently
+    used once they add up to more than `max_size` bytes.
+    """
+
+    def __init__(self, max_size=64 * 1024 * 1024):
+        self.max_size = max_size
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        if len(data) > self.max_size:
+            return
+        with self._lock:
+            old_data = self._entries.pop(key, None)
+            if old_data is not None:
+                self.size -= len(old_data)
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class FileBackend(object):
+    """
+    Pickled results as files in `directory`, which any number of processes
+    can share, evicting the least recently used once they add up to more
+    than `max_size` bytes. A file's modification time is when it was last
+    used.
+    """
+
+    def __init__(self, directory, max_size=1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def file_name(self, key):
+        return os.path.join(self.directory, '{}.pickle'.format(key))
+
+    def get(self, key):
+        file_name = self.file_name(key)
+        try:
+            with open(file_name, 'rb') as cache_file:
+                data = cache_file.read()
+            os.utime(file_name)
+        except FileNotFoundError:
+            # Never cached, or evicted by another process
+            return None
+        return data
+
+    def set(self, key, data):
+        if len(data) > self.max_size:
+            return
+        # Written under a temporary name and renamed, so readers never see
+        # half a file
+        descriptor, temporary_name = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as cache_file:
+            cache_file.write(data)
+        os.replace(temporary_name, self.file_name(key))
+        self.evict()
+
+    def entries(self):
+        """
+        (last used, size, file name) for every cached result.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pickle'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, file_name in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(file_name)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def clear(self):
+        for _, _, file_name in self.entries():
+            try:
+                os.remove(file_name)
+            except FileNotFoundError:
+                pass
+
+
+def snapshot_version():
+    """
+    The version of the last completed import, or None while an import is
+    changing the data (or before the first one).
+    """
+    with closing(connection.cursor()) as cursor:
+        cursor.execute('SELECT version FROM ohiovoter_importsnapshot ORDER BY completed DESC LIMIT 1')
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def key_value(value):
+    """
+    `value` as something whose repr() identifies it: model instances by
+    their primary key, querysets by their SQL.
+    """
+    if isinstance(value, models.Model):
+        return (value._meta.label, value.pk)
+    if isinstance(value, models.QuerySet):
+        sql, params = value.query.sql_with_params()
+        return (value.model._meta.label, sql, key_value(params))
+    if isinstance(value, dict):
+        return tuple(sorted((key, key_value(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(key_value(item) for item in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(key_value(item) for item in value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def function_name(function):
+    return '{}.{}'.format(function.__module__, function.__qualname__)
+
+
+class ResultCache(object):
+    """
+    Caches results computed from the voter file until the next import.
+
+    Every key includes the snapshot version stamped by import_data, so a
+    completed import makes everything cached before it unreachable (and the
+    backend is cleared when this cache sees the version change). Nothing is
+    cached or served while an import is running.
+
+    The version is looked up in the database on every get, which is one
+    small query; `version_ttl` trusts it for that many seconds instead, for
+    callers that can accept results up to that stale just after an import.
+    """
+
+    def __init__(self, backend=None, version_ttl=0):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.version_ttl = version_ttl
+        self._version = None
+        self._version_checked = None
+        # The last version that wasn't None, which an import running in
+        # between doesn't change
+        self._last_version = None
+        self._lock = threading.Lock()
+
+    def version(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._version_checked is not None and now - self._version_checked < self.version_ttl:
+                return self._version
+        version = snapshot_version()
+        with self._lock:
+            if version is not None:
+                if self._last_version is not None and version != self._last_version:
+                    self.backend.clear()
+                self._last_version = version
+            self._version = version
+            self._version_checked = now
+        return version
+
+    def get_or_compute(self, key, compute):
+        """
+        The cached result for `key` (anything key_value understands), or
+        compute() cached for next time.
+        """
+        version = self.version()
+        if version is None:
+            return compute()
+
+        digest = hashlib.sha1('{}:{!r}'.format(version, key_value(key)).encode('utf-8')).hexdigest()
+        data = self.backend.get(digest)
+        if data is not None:
+            return pickle.loads(data)
+
+        result = compute()
+        self.backend.set(digest, pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+        return result
+
+    def queryset(self, queryset):
+        """
+        The results of `queryset`, as a list.
+        """
+        return self.get_or_compute(('queryset', queryset), lambda: list(queryset))
+
+    def cached(self, function):
+        """
+        Decorate `function` to cache its result for each set of arguments.
+        """
+        name = function_name(function)
+
+        @wraps(function)
+        def cached_function(*args, **kwargs):
+            return self.get_or_compute((name, args, kwargs), lambda: function(*args, **kwargs))
+        return cached_function
+
+    def clear(self):
+        self.backend.clear()
+
+
+_default_cache = None
+
+
+def default_cache():
+    """
+    The ResultCache configured by the OHIOVOTER_RESULT_CACHE setting, like
+
+        OHIOVOTER_RESULT_CACHE = {
+            'BACKEND': 'file',                  # or 'memory', the default
+            'LOCATION': '/var/cache/ohiovoter', # for 'file'
+            'MAX_SIZE': 256 * 1024 * 1024,      # bytes
+            'VERSION_TTL': 0,                   # seconds
+        }
+    """
+    global _default_cache
+    if _default_cache is None:
+        options = getattr(settings, 'OHIOVOTER_RESULT_CACHE', {})
+        backend_options = {'max_size': options['MAX_SIZE']} if 'MAX_SIZE' in options else {}
+        if options.get('BACKEND', 'memory') == 'file':
+            backend = FileBackend(options['LOCATION'], **backend_options)
+        else:
+            backend = MemoryBackend(**backend_options)
+        _default_cache = ResultCache(backend, version_ttl=options.get('VERSION_TTL', 0))
+    return _default_cache
+
+
+def cached(function):
+    """
+    Decorate `function` to cache its results in the default cache, like
+
+        turnout = cached(analytics.turnout)
+    """
+    name = function_name(function)
+
+    @wraps(function)
+    def cached_function(*args, **kwargs):
+        return default_cache().get_or_compute((name, args, kwargs), lambda: function(*args, **kwargs))
+    return cached_function
+
+
+def cached_queryset(queryset):
+    """
+    The results of `queryset` as a list, from the default cache.
+    """
+    return default_cache().queryset(queryset)
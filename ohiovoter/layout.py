@@ -0,0 +1,299 @@
+from datetime import date, datetime
+import re
+
+from ohiovoter.models import Election, Voter
+
+
+class LayoutError(ValueError):
+    """
+    A county file header that doesn't match VOTER_LAYOUT.
+    """
+
+
+# The Voter fields read from a county file, in the order the importer COPYs
+# them, each with any other headers the Secretary of State has used for it.
+# A field's own header is its name uppercased, like SOS_VOTERID. Columns can
+# come in any order, but every one of these must be there.
+VOTER_LAYOUT = [
+    ('sos_voterid', ()),
+    ('county_number', ()),
+    ('county_id', ()),
+    ('last_name', ()),
+    ('first_name', ()),
+    ('middle_name', ()),
+    ('suffix', ()),
+    ('date_of_birth', ()),
+    ('registration_date', ()),
+    ('voter_status', ()),
+    ('party_affiliation', ()),
+    ('residential_address1', ()),
+    ('residential_secondary_addr', ('RESIDENTIAL_SECONDARY_ADDRESS',)),
+    ('residential_city', ()),
+    ('residential_state', ()),
+    ('residential_zip', ()),
+    ('residential_zip_plus4', ()),
+    ('residential_country', ()),
+    ('residential_postalcode', ('RESIDENTIAL_POSTAL_CODE',)),
+    ('mailing_address1', ()),
+    ('mailing_secondary_address', ('MAILING_SECONDARY_ADDR',)),
+    ('mailing_city', ()),
+    ('mailing_state', ()),
+    ('mailing_zip', ()),
+    ('mailing_zip_plus4', ()),
+    ('mailing_country', ()),
+    ('mailing_postal_code', ('MAILING_POSTALCODE',)),
+    ('career_center', ()),
+    ('city', ()),
+    ('city_school_district', ()),
+    ('county_court_district', ()),
+    ('congressional_district', ()),
+    ('court_of_appeals', ()),
+    ('edu_service_center_district', ()),
+    ('exempted_vill_school_district', ()),
+    ('library', ('LIBRARY_DISTRICT',)),
+    ('local_school_district', ()),
+    ('municipal_court_district', ()),
+    ('precinct_name', ()),
+    ('precinct_code', ()),
+    ('state_board_of_education', ()),
+    ('state_representative_district', ()),
+    ('state_senate_district', ()),
+    ('township', ()),
+    ('village', ()),
+    ('ward', ()),
+]
+
+VOTER_HEADERS = {
+    header: field
+    for field, other_headers in VOTER_LAYOUT
+    for header in (field.upper(),) + other_headers
+}
+
+# Every column that isn't a voter field is an election, headed with its
+# category and date, like GENERAL-11/08/2016 (or GENERAL-2016-11-08)
+ELECTION_HEADERS = [
+    re.compile(r'^(?P<category>[A-Z]+)-(?P<month>\d{1,2})/(?P<day>\d{1,2})/(?P<year>\d{4})$'),
+    re.compile(r'^(?P<category>[A-Z]+)-(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})$'),
+]
+
+
+# The range of a PostgreSQL integer column
+INTEGER_MIN = -2 ** 31
+INTEGER_MAX = 2 ** 31 - 1
+
+
+def normalize_integer(value):
+    number = int(value)
+    if not INTEGER_MIN <= number <= INTEGER_MAX:
+        raise ValueError('out of range')
+    return str(number)
+
+
+def normalize_date(value):
+    value = value.strip()
+    for date_format in ('%Y-%m-%d', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(value, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            pass
+    raise ValueError('not a date')
+
+
+# Voter fields that PostgreSQL stores as something other than text, and how
+# to turn a value from the county file into one PostgreSQL will accept
+TYPED_VOTER_FIELDS = {
+    field.name: normalize_integer if field.get_internal_type() == 'IntegerField' else normalize_date
+    for field in Voter._meta.get_fields()
+    if field.concrete and field.get_internal_type() in ('IntegerField', 'DateField')
+}
+
+# The longest value each text Voter field holds
+TEXT_VOTER_FIELD_LENGTHS = {
+    field.name: field.max_length
+    for field in Voter._meta.get_fields()
+    if field.concrete and field.get_internal_type() == 'CharField'
+}
+
+
+def parse_election_header(header):
+    """
+    The (category, ISO date) of an election column's header, or None if it
+    isn't shaped like one. Raises LayoutError for an unknown category or a
+    date that doesn't exist.
+    """
+    for pattern in ELECTION_HEADERS:
+        match = pattern.match(header)
+        if match is None:
+            continue
+
+        category = Election.CATEGORY_CHOICES_REVERSE_MAP.get(match.group('category'))
+        if category is None:
+            raise LayoutError('{} is not a known election category, in {}'.format(match.group('category'), header))
+        try:
+            election_date = date(int(match.group('year')), int(match.group('month')), int(match.group('day')))
+        except ValueError:
+            raise LayoutError('{} has an invalid date'.format(header))
+        return category, election_date.isoformat()
+    return None
+
+
+class ColumnPlan(object):
+    """
+    A county file header compiled into everything the importer needs to know
+    about each column, so parsing a row is only picking out the voter columns
+    and walking the election columns that have a value.
+
+    Voter columns are matched to fields through VOTER_LAYOUT, and their
+    values come out in its order whatever order the file has them in. Every
+    other column is an election (see parse_election_header), holding the
+    party the voter participated as (or nothing if they didn't vote).
+
+    The header is checked as it's compiled: a missing, repeated or
+    unrecognized column raises LayoutError, naming every problem at once,
+    before a single row is parsed.
+    """
+
+    def __init__(self, header, election_ids=None, missing_election=None):
+        """
+        election_ids maps (category, ISO date, party) to an Election id.
+        missing_election is called with (category, date, party) for any
+        election not in that map and must return its id.
+        """
+        self.election_ids = election_ids or {}
+        self.missing_election = missing_election
+        self.width = len(header)
+
+        field_indices = {}
+        election_indices = {}
+        self.election_columns = []
+        problems = []
+
+        for index, name in enumerate(header):
+            # Tolerate a byte order mark and stray spaces or capitalization
+            name = name.lstrip('\ufeff').strip().upper()
+
+            field = VOTER_HEADERS.get(name)
+            if field is not None:
+                if field in field_indices:
+                    problems.append('{} appears twice'.format(field))
+                field_indices[field] = index
+                continue
+
+            try:
+                election = parse_election_header(name)
+            except LayoutError as error:
+                problems.append(str(error))
+                continue
+            if election is None:
+                problems.append('{!r} is neither a voter column nor an election'.format(name))
+            elif election in election_indices:
+                problems.append('{} appears twice'.format(name))
+            else:
+                election_indices[election] = index
+                self.election_columns.append((index,) + election)
+
+        missing = [field for field, other_headers in VOTER_LAYOUT if field not in field_indices]
+        if missing:
+            problems.append('missing voter column{} {}'.format(
+                '' if len(missing) == 1 else 's', ', '.join(field.upper() for field in missing),
+            ))
+        if problems:
+            raise LayoutError('; '.join(problems))
+
+        voter_indices = [field_indices[field] for field, other_headers in VOTER_LAYOUT]
+        # (position among the voter values, field name, normalizer, cache of
+        # normalized values) for each voter column that isn't text
+        self.typed_columns = [
+            (position, field, TYPED_VOTER_FIELDS[field], {})
+            for position, (field, other_headers) in enumerate(VOTER_LAYOUT)
+            if field in TYPED_VOTER_FIELDS
+        ]
+        # (position, field name, longest value) for each text voter column
+        self.text_columns = [
+            (position, field, TEXT_VOTER_FIELD_LENGTHS[field])
+            for position, (field, other_headers) in enumerate(VOTER_LAYOUT)
+            if field in TEXT_VOTER_FIELD_LENGTHS
+        ]
+        self._shortest_text_limit = min(length for position, field, length in self.text_columns)
+
+        if voter_indices == list(range(len(voter_indices))):
+            self._voter_slice = slice(0, len(voter_indices))
+        else:
+            self._voter_slice = None
+        self.voter_indices = voter_indices
+
+        # Election ids keyed by (column index, party), filled in the first
+        # time that party shows up in that column
+        self._column_election_ids = {}
+
+    def voter_values(self, row):
+        """
+        The row's voter columns, as a new list.
+        """
+        if self._voter_slice is not None:
+            return row[self._voter_slice]
+        return [row[index] for index in self.voter_indices]
+
+    def normalize(self, values):
+        """
+        Normalize the typed columns of a row's voter values in place: dates
+        become ISO dates and integers lose any padding. Raises ValueError,
+        naming the column, for a value that isn't valid, including an integer
+        PostgreSQL can't store or text longer than its field allows.
+        """
+        # Nearly every row is well within the limits, so only look closer
+        # when some value might not be
+        if max(map(len, values)) > self._shortest_text_limit:
+            for position, field_name, length in self.text_columns:
+                if len(values[position]) > length:
+                    raise ValueError('{}: {} characters is longer than the {} allowed'.format(
+                        field_name, len(values[position]), length,
+                    ))
+
+        for position, field_name, normalizer, normalized_values in self.typed_columns:
+            value = values[position]
+            if value:
+                # County files repeat the same few thousand dates and numbers
+                normalized = normalized_values.get(value)
+                if normalized is None:
+                    try:
+                        normalized = normalizer(value)
+                    except ValueError:
+                        raise ValueError('{}: {!r} is not a valid {}'.format(
+                            field_name, value, 'integer' if normalizer is normalize_integer else 'date',
+                        ))
+                    normalized_values[value] = normalized
+                values[position] = normalized
+
+    def election_keys(self):
+        """
+        Every (category, date, party) election this file could refer to.
+        """
+        return [
+            (category, date, party)
+            for index, category, date in self.election_columns
+            for party in Election.PARTY_CHOICES_SET
+        ]
+
+    def elections(self, row):
+        """
+        Yield the id of every election the row participated in.
+        """
+        column_election_ids = self._column_election_ids
+        for index, category, date in self.election_columns:
+            party = row[index]
+            if party:
+                key = (index, party)
+                election_pk = column_election_ids.get(key)
+                if election_pk is None:
+                    election_pk = self._resolve_election(category, date, party)
+                    column_election_ids[key] = election_pk
+                yield election_pk
+
+    def _resolve_election(self, category, date, party):
+        election_pk = self.election_ids.get((category, date, party))
+        if election_pk is None:
+            if self.missing_election is None:
+                raise KeyError('Unknown election: {} {} {}'.format(category, date, party))
+            election_pk = self.missing_election(category, date, party)
+        return election_pk
@@ -0,0 +1,254 @@
+from contextlib import closing
+from functools import partial
+from multiprocessing import Pool, cpu_count
+import os
+import time
+
+from django import db
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ohiovoter.analytics import iter_query_batches
+from ohiovoter.management.commands.import_data import COUNTIES, VOTER_COLUMNS
+from ohiovoter.models import Voter, VoterHistory
+from ohiovoter.search import SEARCH_KEY_COLUMNS
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+EXPORT_COLUMNS = [column for column in VOTER_COLUMNS if column != 'row_hash' and column not in SEARCH_KEY_COLUMNS]
+
+HISTORY_COLUMNS = [
+    'elections',
+    'general_count',
+    'primary_count',
+    'first_vote_date',
+    'last_vote_date',
+    'last_primary_date',
+    'last_primary_party',
+    'primary_parties',
+]
+
+# Voter columns that can be filtered on with a command line option of the
+# same name
+DISTRICT_COLUMNS = ['congressional_district', 'state_senate_district', 'state_representative_district']
+
+FORMATS = ['csv', 'jsonl', 'parquet']
+
+
+class Command(BaseCommand):
+    help = 'Export voters, optionally with their vote history, to CSV, JSON lines or Parquet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            help='The file to write, or with --by-county the directory to write '
+                 'a {COUNTY} file per county into.',
+        )
+        parser.add_argument(
+            '--format',
+            dest='format',
+            choices=FORMATS,
+            default='csv',
+            help='Output format (default: csv). parquet needs pyarrow.',
+        )
+        parser.add_argument(
+            '--county',
+            action='append',
+            dest='counties',
+            default=[],
+            help='Only export voters in this county. Can be repeated.',
+        )
+        parser.add_argument(
+            '--election',
+            action='append',
+            dest='elections',
+            default=[],
+            help='Only export voters who participated in an election on this '
+                 'date (YYYY-MM-DD). Can be repeated, to match any of them.',
+        )
+        parser.add_argument(
+            '--status',
+            action='append',
+            dest='statuses',
+            default=[],
+            help='Only export voters with this voter status (like ACTIVE). Can be repeated.',
+        )
+        for column in DISTRICT_COLUMNS:
+            parser.add_argument(
+                '--{}'.format(column.replace('_', '-')),
+                action='append',
+                type=int,
+                dest=column,
+                default=[],
+                help='Only export voters in this {}. Can be repeated.'.format(column.replace('_', ' ')),
+            )
+        parser.add_argument(
+            '--history',
+            action='store_true',
+            dest='history',
+            default=False,
+            help='Add each voter\'s vote history summary (see VoterHistory) as extra columns.',
+        )
+        parser.add_argument(
+            '--by-county',
+            action='store_true',
+            dest='by_county',
+            default=False,
+            help='Write a file per county, several at once.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            dest='workers',
+            default=cpu_count(),
+            help='How many counties to export at once with --by-county (default: one per CPU).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=10000,
+            help='Rows fetched at a time for jsonl and parquet output (default: 10000).',
+        )
+
+    def handle(self, *args, **kwargs):
+        output_format = kwargs['format']
+        if output_format == 'parquet' and pyarrow is None:
+            raise CommandError('--format parquet needs pyarrow (pip install pyarrow)')
+
+        counties = [county.upper() for county in kwargs['counties']]
+        for county in counties:
+            if county not in COUNTIES:
+                raise CommandError('{} is not an Ohio county'.format(county))
+
+        filters = {
+            'elections': kwargs['elections'],
+            'statuses': kwargs['statuses'],
+            'districts': {column: kwargs[column] for column in DISTRICT_COLUMNS if kwargs[column]},
+        }
+        export = partial(
+            self.export_voters,
+            filters=filters,
+            history=kwargs['history'],
+            output_format=output_format,
+            batch_size=kwargs['batch_size'],
+        )
+
+        started = time.time()
+        if kwargs['by_county']:
+            os.makedirs(kwargs['output'], exist_ok=True)
+            jobs = [
+                (county, os.path.join(kwargs['output'], '{}.{}'.format(county, output_format)))
+                for county in counties or COUNTIES
+            ]
+            # Don't let the workers inherit (and later close) our connection
+            db.connections.close_all()
+            with Pool(kwargs['workers']) as pool:
+                for county, file_name in pool.imap_unordered(export, jobs):
+                    print('{} County...Wrote {}'.format(county.title(), file_name))
+        else:
+            export((counties, kwargs['output']))
+            print('Wrote {}'.format(kwargs['output']))
+
+        print('Exported in {:.1f}s'.format(time.time() - started))
+
+    @staticmethod
+    def export_query(counties, filters, history):
+        """
+        The SELECT for the voters to export and its parameters. `counties`
+        is a county name, a list of them, or empty for every county.
+        """
+        columns = ['v.{}'.format(column) for column in EXPORT_COLUMNS]
+        if history:
+            columns.extend('h.{}'.format(column) for column in HISTORY_COLUMNS)
+
+        conditions = []
+        params = []
+        if isinstance(counties, str):
+            conditions.append('v.county = %s')
+            params.append(counties)
+        elif counties:
+            conditions.append('v.county = ANY(%s)')
+            params.append(list(counties))
+        if filters['statuses']:
+            conditions.append('v.voter_status = ANY(%s)')
+            params.append(filters['statuses'])
+        for column, values in sorted(filters['districts'].items()):
+            conditions.append('v.{} = ANY(%s)'.format(column))
+            params.append(values)
+        if filters['elections']:
+            conditions.append(
+                """EXISTS (
+                       SELECT 1 FROM ohiovoter_participation p
+                       JOIN ohiovoter_election e ON e.id = p.election_id
+                       WHERE p.voter_id = v.sos_voterid AND e.date = ANY(%s::date[])
+                   )"""
+            )
+            params.append(filters['elections'])
+
+        sql = 'SELECT {} FROM ohiovoter_voter v'.format(', '.join(columns))
+        if history:
+            sql += ' LEFT JOIN ohiovoter_voterhistory h ON h.voter_id = v.sos_voterid'
+        if conditions:
+            sql += ' WHERE {}'.format(' AND '.join(conditions))
+        return sql, params
+
+    @staticmethod
+    def export_voters(job, filters, history, output_format, batch_size):
+        """
+        Export the voters of the (counties, file name) `job`. Runs in a
+        worker process for --by-county exports.
+        """
+        counties, file_name = job
+        db.connections.close_all()
+
+        sql, params = Command.export_query(counties, filters, history)
+        if output_format == 'csv':
+            Command.write_csv(sql, params, file_name)
+        elif output_format == 'jsonl':
+            Command.write_jsonl(sql, params, file_name, batch_size)
+        else:
+            Command.write_parquet(sql, params, file_name, history, batch_size)
+        return counties, file_name
+
+    @staticmethod
+    def write_csv(sql, params, file_name):
+        # PostgreSQL formats the CSV itself, so rows go straight from COPY to
+        # the file
+        with closing(connection.cursor()) as cursor, open(file_name, 'w', encoding='utf-8', newline='') as output:
+            query = cursor.mogrify(sql, params).decode('utf-8')
+            cursor.copy_expert('COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER)'.format(query), output)
+
+    @staticmethod
+    def write_jsonl(sql, params, file_name, batch_size):
+        with open(file_name, 'w', encoding='utf-8') as output:
+            json_sql = 'SELECT row_to_json(q)::text FROM ({}) q'.format(sql)
+            for rows in iter_query_batches(json_sql, params, batch_size):
+                output.write(''.join(row[0] + '\n' for row in rows))
+
+    @staticmethod
+    def write_parquet(sql, params, file_name, history, batch_size):
+        schema = Command.parquet_schema(history)
+        with pyarrow.parquet.ParquetWriter(file_name, schema) as writer:
+            for rows in iter_query_batches(sql, params, batch_size):
+                columns = [pyarrow.array(values, type=field.type) for field, values in zip(schema, zip(*rows))]
+                writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+
+    @staticmethod
+    def parquet_schema(history):
+        types = {
+            'CharField': pyarrow.string(),
+            'TextField': pyarrow.string(),
+            'IntegerField': pyarrow.int32(),
+            'DateField': pyarrow.date32(),
+            'ArrayField': pyarrow.list_(pyarrow.int32()),
+        }
+        fields = [(column, Voter._meta.get_field(column)) for column in EXPORT_COLUMNS]
+        if history:
+            fields.extend((column, VoterHistory._meta.get_field(column)) for column in HISTORY_COLUMNS)
+        return pyarrow.schema([(column, types[field.get_internal_type()]) for column, field in fields])
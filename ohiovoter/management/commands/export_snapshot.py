@@ -0,0 +1,181 @@
+from contextlib import closing
+from datetime import datetime
+from itertools import chain
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from ohiovoter.analytics import iter_query_batches
+from ohiovoter.cache import snapshot_version
+from ohiovoter.models import Election
+from ohiovoter.snapshot import (
+    CATEGORICAL_COLUMNS, DATE_COLUMNS, FORMAT_VERSION, MANIFEST_NAME, numpy, smallest_code_type,
+)
+
+
+class Command(BaseCommand):
+    help = ('Write a columnar snapshot of the voters and their vote history, '
+            'for offline analysis with NumPy (see ohiovoter.snapshot).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            help='The directory to write the snapshot to.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=50000,
+            help='Voters fetched at a time (default: 50000).',
+        )
+
+    def handle(self, *args, **kwargs):
+        if numpy is None:
+            raise CommandError('Writing a snapshot needs NumPy (pip install numpy)')
+
+        directory = kwargs['output']
+        os.makedirs(directory, exist_ok=True)
+        # The manifest is written last, so a snapshot is only readable once
+        # it's complete
+        manifest_name = os.path.join(directory, MANIFEST_NAME)
+        if os.path.exists(manifest_name):
+            os.remove(manifest_name)
+
+        started = time.time()
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            # Read everything from one view of the data, even if an import
+            # starts in the meantime
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            version = snapshot_version()
+
+            cursor.execute('SELECT count(*), COALESCE(max(octet_length(sos_voterid)), 1) FROM ohiovoter_voter')
+            voters, id_width = cursor.fetchone()
+            cursor.execute('SELECT COALESCE(sum(cardinality(elections)), 0) FROM ohiovoter_voterhistory')
+            participations, = cursor.fetchone()
+            elections = list(Election.objects.order_by('date', 'category', 'party'))
+
+            print('Writing {:,} voters and {:,} participations...'.format(voters, participations))
+            categories = self.write_columns(
+                directory, voters, id_width, participations, elections, kwargs['batch_size'],
+            )
+
+        manifest = {
+            'format': FORMAT_VERSION,
+            'snapshot_version': version,
+            'created': datetime.now().isoformat(),
+            'voters': voters,
+            'participations': participations,
+            'elections': [
+                {
+                    'id': election.id,
+                    'date': election.date.isoformat(),
+                    'category': election.get_category_display(),
+                    'party': election.party,
+                }
+                for election in elections
+            ],
+            'columns': ['sos_voterid'] + DATE_COLUMNS + CATEGORICAL_COLUMNS,
+            'categories': categories,
+        }
+        with open(manifest_name, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+        print('Wrote a snapshot to {} in {:.1f}s'.format(directory, time.time() - started))
+
+    @staticmethod
+    def write_columns(directory, voters, id_width, participations, elections, batch_size):
+        """
+        Stream the voters and their histories into a .npy file per column
+        and the participation matrix. Returns the categories of each
+        categorical column.
+        """
+        open_memmap = numpy.lib.format.open_memmap
+
+        def path(name):
+            return os.path.join(directory, '{}.npy'.format(name))
+
+        voter_ids = open_memmap(path('sos_voterid'), 'w+', dtype='S{}'.format(id_width), shape=(voters,))
+        dates = {
+            column: open_memmap(path(column), 'w+', dtype='datetime64[D]', shape=(voters,))
+            for column in DATE_COLUMNS
+        }
+        # Codes in order of first appearance until every value has been
+        # seen, then sorted and shrunk to fit (see encode_column)
+        unsorted_codes = {
+            column: open_memmap(path(column + '.unsorted'), 'w+', dtype=numpy.uint32, shape=(voters,))
+            for column in CATEGORICAL_COLUMNS
+        }
+        dictionaries = {column: {} for column in CATEGORICAL_COLUMNS}
+        indptr = open_memmap(path('participation_indptr'), 'w+', dtype=numpy.int64, shape=(voters + 1,))
+        participation_elections = open_memmap(
+            path('participation_elections'), 'w+', dtype=smallest_code_type(len(elections)), shape=(participations,),
+        )
+        election_index = {election.id: index for index, election in enumerate(elections)}
+
+        sql = """SELECT v.sos_voterid, {dates}, {categorical}, h.elections
+                 FROM ohiovoter_voter v
+                 LEFT JOIN ohiovoter_voterhistory h ON h.voter_id = v.sos_voterid
+                 ORDER BY v.sos_voterid""".format(
+            dates=', '.join('v.{}'.format(column) for column in DATE_COLUMNS),
+            categorical=', '.join('v.{}'.format(column) for column in CATEGORICAL_COLUMNS),
+        )
+
+        start = 0
+        position = 0
+        indptr[0] = 0
+        for rows in iter_query_batches(sql, batch_size=batch_size):
+            end = start + len(rows)
+            columns = list(zip(*rows))
+
+            voter_ids[start:end] = columns[0]
+            for column, values in zip(DATE_COLUMNS, columns[1:]):
+                dates[column][start:end] = numpy.array(values, dtype='datetime64[D]')
+            for column, values in zip(CATEGORICAL_COLUMNS, columns[1 + len(DATE_COLUMNS):]):
+                dictionary = dictionaries[column]
+                unsorted_codes[column][start:end] = [dictionary.setdefault(value, len(dictionary)) for value in values]
+
+            histories = [history or [] for history in columns[-1]]
+            batch_elections = [election_index[election_id] for election_id in chain.from_iterable(histories)]
+            participation_elections[position:position + len(batch_elections)] = batch_elections
+            indptr[start + 1:end + 1] = position + numpy.cumsum([len(history) for history in histories])
+            position += len(batch_elections)
+            start = end
+
+        for array in [voter_ids, indptr, participation_elections] + list(dates.values()) + list(unsorted_codes.values()):
+            array.flush()
+        # Let go of the unsorted files so encode_column can remove them
+        unsorted_codes.clear()
+
+        return {
+            column: Command.encode_column(path(column + '.unsorted'), path(column), dictionaries[column])
+            for column in CATEGORICAL_COLUMNS
+        }
+
+    @staticmethod
+    def encode_column(unsorted_path, path, dictionary, chunk_size=1000000):
+        """
+        Rewrite a column's codes so they follow its values in sorted order
+        (None last), in the smallest type that fits, and return the values.
+        """
+        values = sorted(value for value in dictionary if value is not None)
+        if None in dictionary:
+            values.append(None)
+
+        code_type = smallest_code_type(len(values))
+        recode = numpy.zeros(max(len(dictionary), 1), dtype=code_type)
+        for code, value in enumerate(values):
+            recode[dictionary[value]] = code
+
+        unsorted_codes = numpy.load(unsorted_path, mmap_mode='r')
+        codes = numpy.lib.format.open_memmap(path, 'w+', dtype=code_type, shape=unsorted_codes.shape)
+        for start in range(0, len(codes), chunk_size):
+            codes[start:start + chunk_size] = recode[unsorted_codes[start:start + chunk_size]]
+        codes.flush()
+
+        del unsorted_codes
+        os.remove(unsorted_path)
+        return values
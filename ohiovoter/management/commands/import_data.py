@@ -1,21 +1,40 @@
-from contextlib import closing
+import argparse
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+import calendar
 import csv
+import ftplib
 from django.db import connection
-from datetime import datetime
-import glob
+from functools import partial
 import hashlib
-from io import StringIO
-from multiprocessing import Pool, cpu_count
+from io import StringIO, TextIOWrapper
+from itertools import chain, count, islice
+from multiprocessing import BoundedSemaphore, cpu_count
 import os
+import re
 import tempfile
+import time
 import urllib.request
+import uuid
 import zipfile
+import zlib
 
 from django import db
 from django.core import management
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
 
-from ohiovoter.models import Election, Voter
+from ohiovoter.bulkload import (
+    LOAD_SESSION_SETTINGS, DeferredIndexes, LineWriter, ShadowTables, analyze, init_load_worker, run_in_parallel,
+    use_session_settings, writer_slot,
+)
+from ohiovoter.layout import TYPED_VOTER_FIELDS, VOTER_LAYOUT, ColumnPlan, LayoutError
+from ohiovoter.metrics import ImportMetrics, Metrics
+from ohiovoter.models import Election, ImportSnapshot, LoadUnit, RegistrationRollup, RejectedRow, VoterHistory
+from ohiovoter.partitions import sync_election_partitions
+from ohiovoter.scheduler import CountyScheduler, WorkerLost
+from ohiovoter.search import search_keys
 
 
 COUNTIES = [
@@ -110,59 +129,24 @@ COUNTIES = [
 ]
 
 
-VOTER_COLUMNS = [
-    'sos_voterid',
-    'county_number',
-    'county_id',
-    'last_name',
-    'first_name',
-    'middle_name',
-    'suffix',
-    'date_of_birth',
-    'registration_date',
-    'voter_status',
-    'party_affiliation',
-    'residential_address1',
-    'residential_secondary_addr',
-    'residential_city',
-    'residential_state',
-    'residential_zip',
-    'residential_zip_plus4',
-    'residential_country',
-    'residential_postalcode',
-    'mailing_address1',
-    'mailing_secondary_address',
-    'mailing_city',
-    'mailing_state',
-    'mailing_zip',
-    'mailing_zip_plus4',
-    'mailing_country',
-    'mailing_postal_code',
-    'career_center',
-    'city',
-    'city_school_district',
-    'county_court_district',
-    'congressional_district',
-    'court_of_appeals',
-    'edu_service_center_district',
-    'exempted_vill_school_district',
-    'library',
-    'local_school_district',
-    'municipal_court_district',
-    'precinct_name',
-    'precinct_code',
-    'state_board_of_education',
-    'state_representative_district',
-    'state_senate_district',
-    'township',
-    'village',
-    'ward',
+# The voter fields the importer COPYs: those read from the county file,
+# then the ones it works out itself
+VOTER_COLUMNS = [field for field, other_headers in VOTER_LAYOUT] + [
     'county',
+    'row_hash',
+    'last_name_key',
+    'first_name_key',
+    'last_name_code',
+    'first_name_code',
+    'address_key',
 ]
 
 
+# Where the values search_keys() is built from sit in a row's voter values
+SEARCH_KEY_SOURCES = [VOTER_COLUMNS.index(column) for column in ('last_name', 'first_name', 'residential_address1')]
+
+
 ELECTION_COLUMNS = [
-    'id',
     'category',
     'date',
     'party',
@@ -175,152 +159,1243 @@ PARTICIPATION_COLUMNS = [
 ]
 
 
+FTP_HOST = 'sosftp.sos.state.oh.us'
+FTP_DIRECTORY = 'free/Voter'
+
+
+# Bytes of a county file in each unit of work handed to a load worker, which
+# loads it in one transaction (default for --unit-size)
+UNIT_SIZE = 32 * 1024 * 1024
+
+
+# Rows per COPY batch when streaming a unit into the database (default for
+# --copy-batch-size)
+COPY_BATCH_SIZE = 100000
+
+
+# A load worker's second connection, for creating elections outside the
+# unit being loaded (see insert_missing_election)
+_election_connection = None
+
+
+VOTER_STAGING_TABLE = 'ohiovoter_voter_staging'
+PARTICIPATION_STAGING_TABLE = 'ohiovoter_participation_staging'
+
+
+# Summarizes the participations of the voters matching {where} into
+# VoterHistory rows. Voters who never voted get a row too, with no elections.
+VOTER_HISTORY_QUERY = """
+    INSERT INTO {history} (
+        voter_id, elections, general_count, primary_count, first_vote_date, last_vote_date,
+        last_primary_date, last_primary_party, primary_parties
+    )
+    SELECT v.sos_voterid,
+           COALESCE(array_agg(e.id ORDER BY e.date, e.id) FILTER (WHERE e.id IS NOT NULL), '{{}}'),
+           count(*) FILTER (WHERE e.category = {general}),
+           count(*) FILTER (WHERE e.category = {primary}),
+           min(e.date),
+           max(e.date),
+           max(e.date) FILTER (WHERE e.category = {primary}),
+           (array_agg(e.party ORDER BY e.date DESC) FILTER (WHERE e.category = {primary}))[1],
+           COALESCE(string_agg(e.party, '' ORDER BY e.date) FILTER (WHERE e.category = {primary}), '')
+    FROM {voter} v
+    LEFT JOIN {participation} p ON p.voter_id = v.sos_voterid
+    LEFT JOIN ohiovoter_election e ON e.id = p.election_id
+    WHERE {where}
+    GROUP BY v.sos_voterid
+"""
+
+
+ROLLUP_TABLES = ('ohiovoter_registrationrollup', 'ohiovoter_turnoutrollup')
+
+# What every rollup is broken down by: a precinct, the districts it's in,
+# and the party voters are registered with
+ROLLUP_COLUMNS = [
+    'county',
+    'precinct_code',
+    'congressional_district',
+    'state_senate_district',
+    'state_representative_district',
+    'party_affiliation',
+]
+
+# Count the voters matching {where} into RegistrationRollup and
+# TurnoutRollup rows
+REGISTRATION_ROLLUP_QUERY = """
+    INSERT INTO {registration} ({columns}, voter_status, voters)
+    SELECT {voter_columns}, v.voter_status, count(*)
+    FROM {voter} v
+    WHERE {where}
+    GROUP BY {voter_columns}, v.voter_status
+"""
+
+TURNOUT_ROLLUP_QUERY = """
+    INSERT INTO {turnout} (election_id, {columns}, voters)
+    SELECT p.election_id, {voter_columns}, count(*)
+    FROM {voter} v
+    JOIN {participation} p ON p.voter_id = v.sos_voterid
+    WHERE {where}
+    GROUP BY p.election_id, {voter_columns}
+"""
+
+
+def session_setting(value):
+    """
+    A (name, value) tuple from a --db-setting NAME=VALUE argument.
+    """
+    name, equals, setting = value.partition('=')
+    if not equals or not re.match(r'^[A-Za-z_][A-Za-z0-9_.]*$', name.strip()):
+        raise argparse.ArgumentTypeError('expected NAME=VALUE, like work_mem=256MB, not {!r}'.format(value))
+    return name.strip(), setting.strip()
+
+
+def positive_integer(value):
+    """
+    An integer argument that must be at least 1, like a number of workers.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError('expected a whole number of at least 1, not {!r}'.format(value))
+    return number
+
+
 class Command(BaseCommand):
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            dest='incremental',
+            default=False,
+            help='Compare each county against the data already loaded and only '
+                 'write the voters and participations that changed, instead of '
+                 'flushing the database.',
+        )
+        parser.add_argument(
+            '--defer-indexes',
+            action='store_true',
+            dest='defer_indexes',
+            default=False,
+            help='Drop the secondary indexes and foreign keys of the voter and '
+                 'participation tables while loading, then rebuild them in '
+                 'parallel and ANALYZE. Faster for a full import.',
+        )
+        parser.add_argument(
+            '--shadow',
+            action='store_true',
+            dest='shadow',
+            default=False,
+            help='Load a full import into shadow copies of the voter and '
+                 'participation tables, index and ANALYZE them, then swap them '
+                 'in at once. The current data stays queryable until the swap.',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            dest='resume',
+            default=False,
+            help='Resume an interrupted import instead of starting over. Counties '
+                 'and units the last run finished are skipped, as long as their '
+                 'source file hasn\'t changed. Use the same mode (full, --shadow '
+                 'or --incremental) as the interrupted run.',
+        )
+        parser.add_argument(
+            '--download-workers',
+            type=positive_integer,
+            dest='download_workers',
+            default=4,
+            help='How many county archives to download at once (default: 4).',
+        )
+        parser.add_argument(
+            '--parse-workers',
+            type=positive_integer,
+            dest='parse_workers',
+            default=cpu_count(),
+            help='How many worker processes parse and load counties (default: one per CPU).',
+        )
+        parser.add_argument(
+            '--db-writers',
+            type=positive_integer,
+            dest='db_writers',
+            default=None,
+            help='How many workers may COPY into the database at once '
+                 '(default: the number of parse workers).',
+        )
+        parser.add_argument(
+            '--unit-size',
+            type=int,
+            dest='unit_size',
+            default=UNIT_SIZE // (1024 * 1024),
+            help='Megabytes of a county file each worker loads in one transaction '
+                 '(default: {}).'.format(UNIT_SIZE // (1024 * 1024)),
+        )
+        parser.add_argument(
+            '--copy-batch-size',
+            type=int,
+            dest='copy_batch_size',
+            default=COPY_BATCH_SIZE,
+            help='Rows per COPY within a transaction (default: {}).'.format(COPY_BATCH_SIZE),
+        )
+        parser.add_argument(
+            '--db-setting',
+            type=session_setting,
+            action='append',
+            dest='db_settings',
+            default=[],
+            metavar='NAME=VALUE',
+            help='A PostgreSQL setting for the import\'s database sessions, like '
+                 'work_mem=256MB. Overrides the defaults ({}). Can be repeated.'.format(
+                     ', '.join('{}={}'.format(name, value) for name, value in LOAD_SESSION_SETTINGS.items())
+                 ),
+        )
+        parser.add_argument(
+            '--unlogged',
+            action='store_true',
+            dest='unlogged',
+            default=False,
+            help='With --shadow, load into UNLOGGED copies that write no WAL, '
+                 'and make them crash-safe just before the swap.',
+        )
+        parser.add_argument(
+            '--cache-dir',
+            dest='cache_dir',
+            default=None,
+            help='Keep the downloaded county archives in this directory, and '
+                 'only download the ones that changed on the server since.',
+        )
+        parser.add_argument(
+            '--source-dir',
+            dest='source_dir',
+            default=None,
+            help='Import the county files ({COUNTY}.zip or {COUNTY}.TXT) in '
+                 'this directory instead of downloading them.',
+        )
+        parser.add_argument(
+            '--report',
+            dest='report',
+            default=None,
+            help='Write a JSON report of the phase timings and everything the '
+                 'workers measured to this file.',
+        )
+        parser.add_argument(
+            '--noinput', '--no-input',
+            action='store_false',
+            dest='interactive',
+            default=True,
+            help='Don\'t ask for confirmation before importing.',
+        )
+
+    @contextmanager
+    def phase(self, name):
+        started = time.time()
+        yield
+        self.phase_timings.append((name, time.time() - started))
+
+    def print_phase_timings(self):
+        print('\nTime spent in each phase:')
+        for name, elapsed in self.phase_timings:
+            print('  {:<32} {:>10.1f}s'.format(name, elapsed))
+        print('  {:<32} {:>10.1f}s'.format('total', sum(_[1] for _ in self.phase_timings)))
+
     @staticmethod
-    def download_county_data(county, destination_directory):
-        url = 'ftp://sosftp.sos.state.oh.us/free/Voter/{}.zip'.format(county)
+    def remote_county_files():
+        """
+        The size in bytes and modification time (as a Unix timestamp, or None
+        if the server won't say) of each county archive on the FTP server, or
+        an empty dict if the server won't tell us.
+        """
+        files = {}
+        try:
+            with closing(ftplib.FTP(FTP_HOST, timeout=60)) as ftp:
+                ftp.login()
+                ftp.cwd(FTP_DIRECTORY)
+                ftp.voidcmd('TYPE I')  # SIZE is only reliable in binary mode
+                for county in COUNTIES:
+                    file_name = '{}.zip'.format(county)
+                    size = ftp.size(file_name)
+                    try:
+                        # 213 YYYYMMDDHHMMSS, in UTC
+                        modified = calendar.timegm(time.strptime(ftp.voidcmd('MDTM ' + file_name)[4:18], '%Y%m%d%H%M%S'))
+                    except (ftplib.error_perm, ValueError):
+                        modified = None
+                    files[county] = (size, modified)
+        except ftplib.all_errors:
+            return {}
+        return files
 
+    @staticmethod
+    def intact_archive(file_name):
+        """
+        Whether a zip archive opens and every member matches its CRC.
+        """
+        try:
+            with zipfile.ZipFile(file_name) as zip_file:
+                return zip_file.testzip() is None
+        except (zipfile.BadZipFile, zlib.error, OSError, EOFError):
+            return False
+
+    @staticmethod
+    def download_county_data(county, destination_directory, remote_files):
+        """
+        Download a county archive into `destination_directory`, unless the
+        copy already there is the one on the server: same size and
+        modification time, and an intact zip. A cached archive that's
+        damaged is deleted and downloaded again.
+        """
+        url = 'ftp://{}/{}/{}.zip'.format(FTP_HOST, FTP_DIRECTORY, county)
         downloaded_file = '{}/{}.zip'.format(destination_directory, county)
-        urllib.request.urlretrieve(url, downloaded_file)
-        with zipfile.ZipFile(downloaded_file, 'r') as z:
-            z.extractall(destination_directory)
-
-        # Some of our files are very large.
-        # Let's split them into smaller files maxed at 100000 lines
-        divisor = 100000
-        outfileno = 1
-        outfile = None
-
-        big_file_name = '{}/{}.TXT'.format(destination_directory, county)
-        with open(big_file_name, 'r') as input_file:
-            reader = csv.reader(input_file)
-            header = next(reader, None)  # skip the headers
-
-            for index, row in enumerate(reader):
-                if index % divisor == 0:
-                    if outfile is not None:
-                        outfile.close()
-                    outfilename = '{}/{}-{}.csv'.format(destination_directory, county, outfileno)
-                    outfile = open(outfilename, 'w')
-                    outfileno += 1
-                    writer = csv.writer(outfile)
-                    writer.writerow(header)
-                writer.writerow(row)
+        size, modified = remote_files.get(county, (None, None))
+
+        if modified is not None and os.path.exists(downloaded_file):
+            stat = os.stat(downloaded_file)
+            if stat.st_size == size and int(stat.st_mtime) == modified:
+                if Command.intact_archive(downloaded_file):
+                    print('{} County...Using cached archive'.format(county.title()))
+                    return size
+                print('{} County...Cached archive is damaged, downloading it again'.format(county.title()))
+                os.remove(downloaded_file)
+
+        # Download next to the archive and move it into place when complete,
+        # so an interrupted download never passes for a cached archive
+        partial_file = '{}.part'.format(downloaded_file)
+        urllib.request.urlretrieve(url, partial_file)
+        if modified is not None:
+            os.utime(partial_file, (modified, modified))
+        os.replace(partial_file, downloaded_file)
+
+        return os.path.getsize(downloaded_file)
+
+    @staticmethod
+    def find_county_data(county, source_directory):
+        return os.path.getsize(Command.county_file_name(county, source_directory))
+
+    @staticmethod
+    def county_file_name(county, directory_name):
+        """
+        The county's archive, {COUNTY}.zip, in `directory_name`, or the
+        county file itself, {COUNTY}.TXT, if there's no archive.
+        """
+        for file_name in ('{}.zip', '{}.ZIP', '{}.TXT', '{}.txt'):
+            path = os.path.join(directory_name, file_name.format(county))
+            if os.path.exists(path):
+                return path
+        raise CommandError('No {0}.zip or {0}.TXT found in {1}'.format(county, directory_name))
+
+    @staticmethod
+    @contextmanager
+    def open_county_file(county, directory_name):
+        """
+        Open the county file for reading as bytes, straight out of its
+        archive if it has one.
+        """
+        file_name = Command.county_file_name(county, directory_name)
+        if not zipfile.is_zipfile(file_name):
+            with open(file_name, 'rb') as raw_file:
+                yield raw_file
+            return
+
+        with zipfile.ZipFile(file_name, 'r') as z, z.open(Command.county_file_member(z, county)) as raw_file:
+            yield raw_file
+
+    @staticmethod
+    def county_file_member(zip_file, county):
+        # Each county archive holds a single {COUNTY}.TXT member, but don't
+        # depend on the exact capitalization of its name
+        for name in zip_file.namelist():
+            if name.upper() == '{}.TXT'.format(county):
+                return name
+        raise CommandError('No {}.TXT found in the {} county archive'.format(county, county.title()))
+
+    @staticmethod
+    def read_county_header(county, directory_name):
+        with Command.open_county_file(county, directory_name) as raw_file:
+            return next(csv.reader(TextIOWrapper(raw_file, encoding='utf-8', newline='')))
+
+    @staticmethod
+    def county_column_plan(county, directory_name):
+        """
+        The county file's header, compiled and checked, so a layout the
+        importer doesn't know fails the import before any rows are parsed.
+        """
+        header = Command.read_county_header(county, directory_name)
+        try:
+            return ColumnPlan(header)
+        except LayoutError as error:
+            raise CommandError('The {} County file has an unexpected layout: {}'.format(county.title(), error))
+
+    @staticmethod
+    def create_elections(election_keys):
+        """
+        Insert every election the county files could refer to in one
+        statement, and return the (category, date, party) -> id map the
+        workers resolve election columns with. Elections nobody participated
+        in are removed again by prune_elections once the load is done.
+        """
+        # Sorting by date first keeps newly created ids in date order
+        election_rows = []
+        for category, date, party in sorted(election_keys, key=lambda key: (key[1], key[0], key[2])):
+            election_rows.extend([category, date, party])
+
+        with closing(connection.cursor()) as cursor:
+            if election_rows:
+                query_string = 'INSERT INTO ohiovoter_election ({}) VALUES {} ON CONFLICT (category, date, party) DO NOTHING'.format(
+                    ','.join(ELECTION_COLUMNS),
+                    ','.join(['(%s, %s, %s)'] * len(election_keys)),
+                )
+                cursor.execute(query_string, election_rows)
+
+            cursor.execute('SELECT id, {} FROM ohiovoter_election'.format(','.join(ELECTION_COLUMNS)))
+            return {
+                (category, date.strftime('%Y-%m-%d'), party): election_pk
+                for election_pk, category, date, party in cursor.fetchall()
+            }
+
+    @staticmethod
+    def insert_missing_election(category, date, party, metrics=None):
+        # Only reached for a party code that isn't one of Election.PARTY_CHOICES
+        if metrics is not None:
+            metrics.count('election upserts')
+
+        # Created on a connection of its own that commits right away. Inside
+        # the unit's transaction the new row would stay locked until the unit
+        # commits, blocking (or deadlocking) every other worker that meets
+        # the same election.
+        global _election_connection
+        if _election_connection is None:
+            _election_connection = connection.copy()
+        with closing(_election_connection.cursor()) as cursor:
+            cursor.execute(
+                'INSERT INTO ohiovoter_election ({}) VALUES (%s, %s, %s) '
+                'ON CONFLICT (category, date, party) DO NOTHING'.format(','.join(ELECTION_COLUMNS)),
+                [category, date, party],
+            )
+            cursor.execute(
+                'SELECT id FROM ohiovoter_election WHERE category = %s AND date = %s AND party = %s',
+                [category, date, party],
+            )
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def prune_elections():
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(
+                """DELETE FROM ohiovoter_election e WHERE NOT EXISTS (
+                       SELECT 1 FROM ohiovoter_participation p WHERE p.election_id = e.id
+                   )"""
+            )
+
+    @staticmethod
+    def unlogged_shadow_lost():
+        """
+        Whether any unlogged shadow table was loaded before the database
+        server last started. Recovering from a crash empties unlogged tables,
+        so the ledger can't be trusted for them.
+        """
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(
+                """SELECT EXISTS (
+                       SELECT 1 FROM pg_class WHERE relname LIKE %s AND relpersistence = 'u'
+                   ) AND EXISTS (
+                       SELECT 1 FROM ohiovoter_loadunit WHERE updated < pg_postmaster_start_time()
+                   )""",
+                [r'ohiovoter\_%\_shadow'],
+            )
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def staging_tables(county):
+        return (
+            '{}_{}'.format(VOTER_STAGING_TABLE, county.lower()),
+            '{}_{}'.format(PARTICIPATION_STAGING_TABLE, county.lower()),
+        )
+
+    @staticmethod
+    def staging_tables_lost(county):
+        """
+        Whether a county's staging tables are missing, or may have been
+        emptied by the database server restarting since the county's ledger
+        entries were written (crash recovery empties unlogged tables).
+        """
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(
+                """SELECT to_regclass(%s) IS NULL OR to_regclass(%s) IS NULL OR EXISTS (
+                       SELECT 1 FROM ohiovoter_loadunit WHERE county = %s AND updated < pg_postmaster_start_time()
+                   )""",
+                list(Command.staging_tables(county)) + [county],
+            )
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def create_staging_tables(county):
+        # Shared (not temporary) tables, since a county's units are spread
+        # over every worker. They're UNLOGGED as they only live until the
+        # county is merged.
+        voter_staging, participation_staging = Command.staging_tables(county)
+        with closing(connection.cursor()) as cursor:
+            cursor.execute('DROP TABLE IF EXISTS {}, {}'.format(voter_staging, participation_staging))
+            cursor.execute('CREATE UNLOGGED TABLE {} (LIKE ohiovoter_voter)'.format(voter_staging))
+            cursor.execute(
+                'CREATE UNLOGGED TABLE {} AS '
+                'SELECT voter_id, election_id FROM ohiovoter_participation WITH NO DATA'.format(participation_staging)
+            )
+
+    @staticmethod
+    def merge_county_staging(county):
+        """
+        Apply the difference between a county's staged snapshot and the live
+        tables. Voters whose row_hash is unchanged are left alone; new and
+        changed voters are upserted and get their participations and
+        VoterHistory rewritten; voters that disappeared from the county file
+        are deleted. If anything changed, the county's rollups are recounted,
+        along with those of any county a changed voter moved away from.
+
+        Returns a (changed, removed) tuple of voter counts.
+        """
+        update_columns = ', '.join(
+            '{0} = EXCLUDED.{0}'.format(column) for column in VOTER_COLUMNS if column != 'sos_voterid'
+        )
+        voter_fields = ', '.join(VOTER_COLUMNS)
+        participation_fields = ', '.join(PARTICIPATION_COLUMNS)
+        voter_staging, participation_staging = Command.staging_tables(county)
+
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            # Counties finish on several workers at once, and one county's
+            # merge can move in a voter another's is about to remove. Merges
+            # take turns (this lock conflicts with itself but not with
+            # reads), so each sees everything the ones before it committed.
+            cursor.execute('LOCK TABLE ohiovoter_voter IN SHARE ROW EXCLUSIVE MODE')
+
+            cursor.execute(
+                """CREATE TEMPORARY TABLE changed_voters ON COMMIT DROP AS
+                   SELECT s.sos_voterid FROM {staging} s
+                   LEFT JOIN ohiovoter_voter v ON v.sos_voterid = s.sos_voterid
+                   -- Voters imported before there were search keys get them
+                   WHERE v.row_hash IS DISTINCT FROM s.row_hash OR v.last_name_key IS NULL
+                      OR v.county IS DISTINCT FROM s.county""".format(
+                    staging=voter_staging,
+                )
+            )
+            changed = cursor.rowcount
+
+            cursor.execute(
+                """CREATE TEMPORARY TABLE removed_voters ON COMMIT DROP AS
+                   SELECT v.sos_voterid FROM ohiovoter_voter v
+                   WHERE v.county = %s AND NOT EXISTS (
+                       SELECT 1 FROM {staging} s WHERE s.sos_voterid = v.sos_voterid
+                   ) AND NOT EXISTS (
+                       -- A voter whose row was rejected is still in the file
+                       SELECT 1 FROM ohiovoter_rejectedrow r WHERE r.county = %s AND r.sos_voterid = v.sos_voterid
+                   )""".format(staging=voter_staging),
+                [county, county],
+            )
+            removed = cursor.rowcount
+
+            cursor.execute(
+                """DELETE FROM ohiovoter_participation p
+                   WHERE p.voter_id IN (
+                       SELECT sos_voterid FROM changed_voters
+                       UNION ALL
+                       SELECT sos_voterid FROM removed_voters
+                   )"""
+            )
+            cursor.execute(
+                """DELETE FROM ohiovoter_voterhistory
+                   WHERE voter_id IN (
+                       SELECT sos_voterid FROM changed_voters
+                       UNION ALL
+                       SELECT sos_voterid FROM removed_voters
+                   )"""
+            )
+            cursor.execute(
+                'DELETE FROM ohiovoter_voter WHERE county = %s AND sos_voterid IN (SELECT sos_voterid FROM removed_voters)',
+                [county],
+            )
+            # A voter who moved here from a county merged earlier was never
+            # removed from it, so its rollups still count them
+            cursor.execute(
+                """SELECT DISTINCT v.county FROM ohiovoter_voter v
+                   JOIN changed_voters c ON c.sos_voterid = v.sos_voterid
+                   WHERE v.county <> %s""",
+                [county],
+            )
+            rollup_counties = [row[0] for row in cursor.fetchall()]
+            if changed or removed:
+                rollup_counties.append(county)
+            cursor.execute(
+                """INSERT INTO ohiovoter_voter ({fields})
+                   SELECT {fields} FROM {staging} JOIN changed_voters USING (sos_voterid)
+                   ON CONFLICT (sos_voterid) DO UPDATE SET {updates}""".format(
+                    fields=voter_fields,
+                    staging=voter_staging,
+                    updates=update_columns,
+                )
+            )
+            cursor.execute(
+                """INSERT INTO ohiovoter_participation ({fields})
+                   SELECT p.voter_id, p.election_id FROM {staging} p
+                   JOIN changed_voters c ON c.sos_voterid = p.voter_id""".format(
+                    fields=participation_fields,
+                    staging=participation_staging,
+                )
+            )
+            cursor.execute(Command.voter_history_query(
+                'ohiovoter_voter', 'ohiovoter_participation', 'ohiovoter_voterhistory',
+                'v.sos_voterid IN (SELECT sos_voterid FROM changed_voters)',
+            ))
+
+            for rollup_county in rollup_counties:
+                for rollup_table in ROLLUP_TABLES:
+                    cursor.execute('DELETE FROM {} WHERE county = %s'.format(rollup_table), [rollup_county])
+                for query in Command.rollup_queries('ohiovoter_voter', 'ohiovoter_participation', ROLLUP_TABLES):
+                    cursor.execute(query, [rollup_county])
+
+            cursor.execute('DROP TABLE {}, {}'.format(voter_staging, participation_staging))
+
+        return changed, removed
+
+    @staticmethod
+    def voter_history_query(voter_table, participation_table, history_table, where):
+        return VOTER_HISTORY_QUERY.format(
+            history=history_table,
+            voter=voter_table,
+            participation=participation_table,
+            where=where,
+            general=Election.CATEGORY_GENERAL,
+            primary=Election.CATEGORY_PRIMARY,
+        )
+
+    @staticmethod
+    def build_voter_history(voter_table, participation_table, history_table, workers):
+        """
+        Rebuild every voter's history from scratch, a county at a time on
+        up to `workers` connections.
+        """
+        with closing(connection.cursor()) as cursor:
+            cursor.execute('TRUNCATE {}'.format(history_table))
+
+        query = Command.voter_history_query(voter_table, participation_table, history_table, 'v.county = %s')
+        run_in_parallel([(query, [county]) for county in COUNTIES], workers)
+
+    @staticmethod
+    def rollup_queries(voter_table, participation_table, rollup_tables):
+        """
+        The statements that fill the (registration, turnout) `rollup_tables`
+        for the county given as their parameter.
+        """
+        registration_table, turnout_table = rollup_tables
+        columns = ', '.join(ROLLUP_COLUMNS)
+        voter_columns = ', '.join('v.{}'.format(column) for column in ROLLUP_COLUMNS)
+        return [
+            REGISTRATION_ROLLUP_QUERY.format(
+                registration=registration_table,
+                columns=columns,
+                voter_columns=voter_columns,
+                voter=voter_table,
+                where='v.county = %s',
+            ),
+            TURNOUT_ROLLUP_QUERY.format(
+                turnout=turnout_table,
+                columns=columns,
+                voter_columns=voter_columns,
+                voter=voter_table,
+                participation=participation_table,
+                where='v.county = %s',
+            ),
+        ]
+
+    @staticmethod
+    def build_rollups(voter_table, participation_table, rollup_tables, workers):
+        """
+        Rebuild the rollups from scratch, a county at a time on up to
+        `workers` connections.
+        """
+        with closing(connection.cursor()) as cursor:
+            cursor.execute('TRUNCATE {}'.format(', '.join(rollup_tables)))
+
+        queries = Command.rollup_queries(voter_table, participation_table, rollup_tables)
+        run_in_parallel([(query, [county]) for county in COUNTIES for query in queries], workers)
+
+    @staticmethod
+    def voter_csv_lines(rows, column_plan, county, participation_writer, rejects):
+        """
+        Yield each row's voter as a line of CSV for COPY, writing its
+        participations to participation_writer along the way. rows are
+        (line number, row) tuples; a row that can't be loaded is appended to
+        rejects as a (line number, reason, row) tuple instead.
+        """
+        line_writer = LineWriter()
+        voter_writer = csv.writer(line_writer, delimiter=',', quoting=csv.QUOTE_ALL)
+
+        for line, row in rows:
+            if len(row) != column_plan.width:
+                rejects.append((line, 'expected {} columns, found {}'.format(column_plan.width, len(row)), row))
+                continue
+
+            this_voters_data = column_plan.voter_values(row)
+            voter_id = this_voters_data[0]
+            if not voter_id:
+                rejects.append((line, 'sos_voterid is missing', row))
+                continue
+
+            try:
+                column_plan.normalize(this_voters_data)
+            except ValueError as error:
+                rejects.append((line, str(error), row))
+                continue
+
+            for election_id in column_plan.elections(row):
+                participation_writer.writerow([voter_id, election_id])
+
+            # I need to manually add this on since I'm inferring it
+            this_voters_data.append(county)
+
+            # Fingerprint the whole source row, vote history included,
+            # so an incremental import can tell which voters changed
+            row_hash = hashlib.md5('\x1f'.join(row).encode('utf-8')).hexdigest()
+            this_voters_data.append(row_hash)
+
+            # Keys for matching records against the voter file
+            this_voters_data.extend(search_keys(*(this_voters_data[index] for index in SEARCH_KEY_SOURCES)))
+
+            line_writer.line = ''
+            voter_writer.writerow(this_voters_data)
+            yield line_writer.line
 
     @staticmethod
-    def load_county_data_into_db(county, directory_name):
-        db.connections.close_all()
+    def read_county_units(county, directory_name, unit_size=UNIT_SIZE):
+        """
+        Split a county file into units of about `unit_size` bytes of whole
+        lines, read straight out of the zip member if archived, and yield a
+        (unit number, CRC-32 of the unit, header, unit data) tuple for each.
 
-        processed_elections = set()
+        Units are cut on line boundaries without parsing the CSV, which
+        relies on the Secretary of State files never having a line break
+        inside a quoted value.
+        """
+        with Command.open_county_file(county, directory_name) as raw_file:
+            header = next(csv.reader([raw_file.readline().decode('utf-8')]))
 
-        county_filenames = []
-        pattern = '{}/{}-*csv'.format(directory_name, county)
-        for f in glob.glob(pattern):
-            county_filenames.append(f)
+            for unit in count():
+                data = raw_file.read(unit_size)
+                if not data:
+                    break
+                if not data.endswith(b'\n'):
+                    data += raw_file.readline()
+                yield unit, '{:08x}'.format(zlib.crc32(data) & 0xffffffff), header, data
 
-        for county_filename in county_filenames:
-            with open(county_filename, encoding='utf-8') as input_file:
-                reader = csv.reader(input_file)
+    @staticmethod
+    def county_checksum(county, directory_name, unit_size=UNIT_SIZE):
+        """
+        Identifies a county file and the way it's cut into units, so a resumed
+        import can tell whether the units it already loaded still apply.
+        For an archive the CRC comes from the zip directory, so nothing has
+        to be read; a plain county file is read through once.
+        """
+        file_name = Command.county_file_name(county, directory_name)
+        if zipfile.is_zipfile(file_name):
+            with zipfile.ZipFile(file_name, 'r') as z:
+                info = z.getinfo(Command.county_file_member(z, county))
+            return '{:08x}:{}:{}'.format(info.CRC, info.file_size, unit_size)
 
-                header = next(reader)
+        crc = 0
+        with open(file_name, 'rb') as raw_file:
+            for block in iter(partial(raw_file.read, 1024 * 1024), b''):
+                crc = zlib.crc32(block, crc)
+        return '{:08x}:{}:{}'.format(crc & 0xffffffff, os.path.getsize(file_name), unit_size)
 
-                voter_stream = StringIO()
-                election_stream = StringIO()
-                participation_stream = StringIO()
+    @staticmethod
+    def county_file_size(county, directory_name):
+        """
+        The size in bytes of the county file, uncompressed.
+        """
+        file_name = Command.county_file_name(county, directory_name)
+        if zipfile.is_zipfile(file_name):
+            with zipfile.ZipFile(file_name, 'r') as z:
+                return z.getinfo(Command.county_file_member(z, county)).file_size
+        return os.path.getsize(file_name)
 
-                voter_writer = csv.writer(voter_stream, delimiter=',', quoting=csv.QUOTE_ALL)
-                voter_writer.writerow(VOTER_COLUMNS)  # start with the header
+    @staticmethod
+    def delete_county(county, voter_table, participation_table):
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            cursor.execute(
+                """DELETE FROM {} WHERE voter_id IN (
+                       SELECT sos_voterid FROM {} WHERE county = %s
+                   )""".format(participation_table, voter_table),
+                [county],
+            )
+            cursor.execute('DELETE FROM {} WHERE county = %s'.format(voter_table), [county])
 
-                # Since I'm defining this table, not pulling it from the CSV,
-                # I don't need to quote my values, and we'll add the header at write
-                participation_writer = csv.writer(participation_stream, delimiter=',')
+    @staticmethod
+    def load_county_unit(county, unit, checksum, header, data, election_ids, voter_table, participation_table,
+                         copy_batch_size=COPY_BATCH_SIZE):
+        # The worker's connection carries over from its last task
+        db.close_old_connections()
 
-                for row in reader:
-                    this_voters_data = []
-                    this_voters_elections = []
+        metrics = Metrics()
+        rows = data.count(b'\n')
+        metrics.count('bytes read', len(data))
+        metrics.count('rows parsed', rows)
+        rejects = []
 
-                    for index, column_value in enumerate(row):
-                        field_name = header[index]
-                        lower_field_name = field_name.lower()
+        # The whole unit, its rejected rows and its ledger entry commit
+        # together or not at all, so a unit is never left half loaded
+        with metrics.timer('load units'), transaction.atomic():
+            Command.copy_county_unit(
+                county, header, data, election_ids, voter_table, participation_table, metrics, rejects, copy_batch_size,
+            )
 
-                        if hasattr(Voter, lower_field_name):  # parse Voter data
-                            this_voters_data.append(column_value)
-                        else:  # parse Election data
-                            if column_value:
-                                category_display, date_string = field_name.split('-')
+            if rejects:
+                metrics.count('rows rejected', len(rejects))
+                RejectedRow.objects.bulk_create([
+                    RejectedRow(
+                        county=county,
+                        unit=unit,
+                        line=line,
+                        sos_voterid=row[0] if row and row[0] else None,
+                        reason=reason,
+                        data=Command.csv_line(row),
+                    )
+                    for line, reason, row in rejects
+                ])
 
-                                election_category = Election.CATEGORY_CHOICES_REVERSE_MAP[category_display]
-                                election_date = datetime.strptime(date_string, '%m/%d/%Y').strftime('%Y-%m-%d')
-                                election_party = column_value
+            LoadUnit.objects.create(
+                county=county,
+                unit=unit,
+                checksum=checksum,
+                status=LoadUnit.STATUS_LOADED,
+                rows=rows,
+            )
 
-                                election_hashable_key = '{}.{}.{}'.format(election_category, election_date, election_party).encode('utf-8')
-                                election_id = hashlib.sha256(election_hashable_key).hexdigest()
+        return metrics
 
-                                election_data = [election_id, election_category, election_date, election_party]
+    @staticmethod
+    def csv_line(row):
+        line = StringIO()
+        csv.writer(line, quoting=csv.QUOTE_ALL, lineterminator='').writerow(row)
+        return line.getvalue()
 
-                                # We'll write the elections as we go
-                                # And keep track of them in memory
-                                if not election_id in processed_elections:
-                                    with closing(connection.cursor()) as cursor:
-                                        fields = ','.join(ELECTION_COLUMNS)
-                                        query_string = 'INSERT INTO ohiovoter_election ({}) VALUES (%s, %s, %s, %s) ON CONFLICT (id) DO NOTHING'.format(fields)
-                                        cursor.execute(
-                                            query_string,
-                                            election_data,
-                                        )
-                                    processed_elections.add(election_id)
+    @staticmethod
+    def copy_county_unit(county, header, data, election_ids, voter_table, participation_table, metrics, rejects,
+                         copy_batch_size=COPY_BATCH_SIZE):
+        # Line numbers are counted from the start of the unit
+        reader = enumerate(csv.reader(StringIO(data.decode('utf-8'), newline='')), 1)
+        column_plan = ColumnPlan(header, election_ids, partial(Command.insert_missing_election, metrics=metrics))
 
-                                participation_writer.writerow([this_voters_data[0], election_id])
+        # Rows are COPYed in batches of copy_batch_size so memory stays
+        # bounded whatever the size of the unit.
+        while True:
+            rows = islice(reader, copy_batch_size)
+            first_row = next(rows, None)
+            if first_row is None:
+                break
 
-                    # I need to manually add this on since I'm inferring it
-                    this_voters_data.append(county)
-                    voter_writer.writerow(this_voters_data)
+            # Participations are narrow, so a batch's worth is buffered
+            # while the voters stream; they can only be written once the
+            # voters they reference are in.
+            participation_stream = StringIO()
+            participation_writer = csv.writer(participation_stream, delimiter=',')
 
-                # Write Voters
-                voter_stream.seek(0)
-                with closing(connection.cursor()) as cursor:
-                    # We need to do this manually since copy_from doesn't handle CSV quoting
-                    cursor.copy_expert("""COPY ohiovoter_voter FROM STDIN WITH CSV HEADER DELIMITER AS ','""", voter_stream)
+            voter_lines = Command.voter_csv_lines(
+                chain([first_row], rows), column_plan, county, participation_writer, rejects,
+            )
+            # Parsing happens while COPY reads the voters, so this worker's
+            # CPU time over the batch is the time spent parsing
+            parse_started = time.process_time()
+            with writer_slot(voter_lines, metrics) as voter_stream:
+                # Write Voters, parsing them as COPY reads
+                with metrics.timer('COPY voters'), closing(connection.cursor()) as cursor:
+                    # We need to do this manually since copy_from doesn't handle
+                    # CSV quoting. Every value is quoted, so blanks in the
+                    # typed columns have to be forced to NULL.
+                    cursor.copy_expert(
+                        """COPY {} ({}) FROM STDIN WITH (FORMAT csv, FORCE_NULL ({}))""".format(
+                            voter_table,
+                            ','.join(VOTER_COLUMNS),
+                            ','.join(column for column in VOTER_COLUMNS if column in TYPED_VOTER_FIELDS),
+                        ),
+                        voter_stream,
+                    )
+                metrics.add_time('parse rows (CPU)', time.process_time() - parse_started)
 
                 # Write Participations
+                metrics.count('participations', participation_stream.getvalue().count('\n'))
                 participation_stream.seek(0)
-                with closing(connection.cursor()) as cursor:
+                with metrics.timer('COPY participations'), closing(connection.cursor()) as cursor:
                     cursor.copy_from(
                         file=participation_stream,
-                        table='ohiovoter_participation',
+                        table=participation_table,
                         sep=',',
                         columns=PARTICIPATION_COLUMNS,
                     )
 
-        print('{} County...Finished!'.format(county.title()))
+    @staticmethod
+    def finish_county(county, incremental=False):
+        db.close_old_connections()
+
+        metrics = Metrics()
+
+        with transaction.atomic():
+            county_unit = LoadUnit.objects.select_for_update().get(county=county, unit=None)
+            if county_unit.status == LoadUnit.STATUS_LOADED:
+                print('{} County...Already loaded'.format(county.title()))
+                return metrics
+
+            if incremental:
+                with metrics.timer('merge staging tables'):
+                    changed, removed = Command.merge_county_staging(county)
+                metrics.count('voters new or changed', changed)
+                metrics.count('voters removed', removed)
+                print('{} County...Finished! ({} new or changed, {} removed)'.format(county.title(), changed, removed))
+            else:
+                print('{} County...Finished!'.format(county.title()))
+
+            county_unit.status = LoadUnit.STATUS_LOADED
+            county_unit.rows = LoadUnit.objects.filter(county=county, unit__isnull=False).aggregate(rows=Sum('rows'))['rows']
+            county_unit.save()
+
+        return metrics
+
+    def prepare_county(self, county, directory_name, incremental, resume, tables):
+        """
+        Get a downloaded county ready to load, and return the arguments for
+        each of its units still to be loaded. `tables` are the voter and
+        participation tables a full import loads into.
+        """
+        # Every election this county refers to exists before it loads
+        column_plan = self.county_column_plan(county, directory_name)
+        with self.metrics.timer('create elections'):
+            election_ids = self.create_elections(column_plan.election_keys())
+            sync_election_partitions(tables[1])
+        self.metrics.prepared(county, self.county_file_size(county, directory_name))
+
+        if incremental:
+            voter_table, participation_table = self.staging_tables(county)
+        else:
+            voter_table, participation_table = tables
+
+        checksum = self.county_checksum(county, directory_name, self.unit_size)
+        county_unit = LoadUnit.objects.filter(county=county, unit=None).first()
+        loaded_units = {}
+
+        resuming = resume and county_unit is not None and county_unit.checksum == checksum
+        if (resuming and incremental and county_unit.status != LoadUnit.STATUS_LOADED and
+                self.staging_tables_lost(county)):
+            # Merging what's left would delete every voter of the lost units
+            print('{} County...Its staging tables were lost when the database server restarted, '
+                  'starting the county over'.format(county.title()))
+            resuming = False
+
+        if resuming:
+            # Pick up where the last run stopped
+            if county_unit.status != LoadUnit.STATUS_LOADED:
+                loaded_units = dict(
+                    LoadUnit.objects.filter(county=county, unit__isnull=False).values_list('unit', 'checksum')
+                )
+                print('{} County...Resuming after {} loaded units'.format(county.title(), len(loaded_units)))
+        else:
+            if county_unit is not None:
+                # The file changed since the last run (or its staging tables
+                # are gone); whatever it loaded is stale
+                if not incremental:
+                    self.delete_county(county, voter_table, participation_table)
+                LoadUnit.objects.filter(county=county).delete()
+                RejectedRow.objects.filter(county=county).delete()
+            county_unit = LoadUnit.objects.create(county=county, checksum=checksum)
+            if incremental:
+                self.create_staging_tables(county)
+
+        if county_unit.status == LoadUnit.STATUS_LOADED:
+            self.metrics.skipped(county, self.county_file_size(county, directory_name))
+            return []
+
+        return self.county_units(county, directory_name, loaded_units, election_ids, voter_table, participation_table)
+
+    def county_units(self, county, directory_name, loaded_units, election_ids, voter_table, participation_table):
+        units = self.metrics.timed('read and unzip', self.read_county_units(county, directory_name, self.unit_size))
+        for unit, unit_checksum, header, data in units:
+            if loaded_units.get(unit) == unit_checksum:
+                self.metrics.skipped(county, len(data))
+                continue
+            yield (
+                unit, unit_checksum, header, data, election_ids, voter_table, participation_table, self.copy_batch_size,
+            )
 
     def handle(self, **kwargs):
-        message = ('\nThis command will completely wipe your database and '
-                   'download & parse the latest Ohio Voter File data. The '
-                   'process can take minutes or hours depending on your '
-                   'machine. Continue? (y/n): ')
+        incremental = kwargs['incremental']
+        defer_indexes = kwargs['defer_indexes']
+        resume = kwargs['resume']
+        shadow = kwargs['shadow']
+        unlogged = kwargs['unlogged']
+        cache_dir = kwargs['cache_dir']
+        source_dir = kwargs['source_dir']
+        self.unit_size = kwargs['unit_size'] * 1024 * 1024
+        self.copy_batch_size = kwargs['copy_batch_size']
+
+        if incremental and defer_indexes:
+            raise CommandError('--defer-indexes only applies to a full import, not --incremental')
+        if incremental and shadow:
+            raise CommandError('--shadow only applies to a full import, not --incremental')
+        if shadow and defer_indexes:
+            raise CommandError('--shadow always builds the indexes after loading; drop --defer-indexes')
+        if unlogged and not shadow:
+            raise CommandError('--unlogged only applies to --shadow (incremental staging tables are always unlogged)')
+        if self.unit_size <= 0 or self.copy_batch_size <= 0:
+            raise CommandError('--unit-size and --copy-batch-size must be positive')
+        # Checked again for call_command(), which skips the argument types
+        for option in ('download_workers', 'parse_workers', 'db_writers'):
+            if kwargs[option] is not None and kwargs[option] < 1:
+                raise CommandError('--{} must be at least 1'.format(option.replace('_', '-')))
+        db_writers = kwargs['db_writers'] if kwargs['db_writers'] is not None else kwargs['parse_workers']
+        if cache_dir and source_dir:
+            raise CommandError('--source-dir imports local files, so there\'s nothing to --cache-dir')
+        if source_dir:
+            if not os.path.isdir(source_dir):
+                raise CommandError('{} is not a directory'.format(source_dir))
+            # Fail before touching the database if a county is missing or
+            # its file has a layout we don't know
+            for county in COUNTIES:
+                self.county_file_name(county, source_dir)
+            for county in COUNTIES:
+                self.county_column_plan(county, source_dir)
 
-        answer = input(message)
+        if resume:
+            message = ('\nThis command will resume an interrupted import, '
+                       'downloading & parsing the latest Ohio Voter File data and '
+                       'loading whatever the last run didn\'t finish. Continue? '
+                       '(y/n): ')
+        elif incremental:
+            message = ('\nThis command will download & parse the latest Ohio '
+                       'Voter File data and update your database with only the '
+                       'voters that changed since the last import. The process '
+                       'can take minutes or hours depending on your machine. '
+                       'Continue? (y/n): ')
+        elif shadow:
+            message = ('\nThis command will download & parse the latest Ohio '
+                       'Voter File data into new tables, then replace your '
+                       'current voter data with them. Your current data stays '
+                       'available until the switch. The process can take minutes '
+                       'or hours depending on your machine. Continue? (y/n): ')
+        else:
+            message = ('\nThis command will completely wipe your database and '
+                       'download & parse the latest Ohio Voter File data. The '
+                       'process can take minutes or hours depending on your '
+                       'machine. Continue? (y/n): ')
+
+        if kwargs['interactive']:
+            answer = input(message)
+        else:
+            answer = 'y'
 
         if answer == 'y':
-            # start fresh
-            management.call_command('flush', interactive=False)
-            management.call_command('migrate', interactive=False)
+            self.phase_timings = []
+            num_cpus = cpu_count()
+
+            # Every connection the import opens from here on, in this process
+            # and in the workers, gets the load settings
+            session_settings = OrderedDict(LOAD_SESSION_SETTINGS)
+            session_settings.update(kwargs['db_settings'])
+            use_session_settings(session_settings)
+            db.connections.close_all()
+
+            with self.phase('prepare database'):
+                # Before anything else, put back whatever an earlier
+                # --defer-indexes import dropped and died before rebuilding
+                leftover_indexes = DeferredIndexes.saved()
+                if leftover_indexes is not None:
+                    print('Restoring the indexes and foreign keys an interrupted import dropped...')
+                    leftover_indexes.rebuild_indexes(num_cpus)
+                    leftover_indexes.rebuild_foreign_keys()
+
+                if not incremental and not resume and not shadow:
+                    # start fresh
+                    management.call_command('flush', interactive=False)
+                management.call_command('migrate', interactive=False)
+                if shadow:
+                    shadow_tables = ShadowTables(
+                        ['ohiovoter_voter', 'ohiovoter_participation', 'ohiovoter_voterhistory'] + list(ROLLUP_TABLES),
+                        unlogged=unlogged,
+                    )
+                if shadow and resume and not shadow_tables.exist():
+                    # The ledger alone would skip every county it remembers
+                    # and swap empty tables in over the live ones
+                    raise CommandError('There is no interrupted --shadow import to resume. '
+                                       'Run the import again without --resume.')
+                if shadow and resume and self.unlogged_shadow_lost():
+                    print('The database server restarted since the last run loaded its unlogged '
+                          'shadow tables, which may have emptied them. Starting the import over...')
+                    resume = False
+                if not resume:
+                    LoadUnit.objects.all().delete()
+                    RejectedRow.objects.all().delete()
+                if not shadow:
+                    # Cached results stop being served until the import
+                    # completes
+                    ImportSnapshot.objects.all().delete()
+
+                # Incremental merges only keep existing summaries up to date;
+                # build them in full if there aren't any yet
+                build_summaries = not incremental or not (
+                    VoterHistory.objects.exists() and RegistrationRollup.objects.exists()
+                )
+
+                if shadow:
+                    shadow_tables.create(keep_existing=resume)
+                    tables = (shadow_tables.names['ohiovoter_voter'], shadow_tables.names['ohiovoter_participation'])
+                    history_table = shadow_tables.names['ohiovoter_voterhistory']
+                    rollup_tables = tuple(shadow_tables.names[table] for table in ROLLUP_TABLES)
+                else:
+                    tables = ('ohiovoter_voter', 'ohiovoter_participation')
+                    history_table = 'ohiovoter_voterhistory'
+                    rollup_tables = ROLLUP_TABLES
 
             print('\nDownloading and parsing county data. This will take a while...')
 
             with tempfile.TemporaryDirectory() as tmpdirname:
-                num_cpus = cpu_count()
+                if defer_indexes:
+                    print('Dropping indexes and foreign keys...')
+                    deferred_indexes = DeferredIndexes(['ohiovoter_voter', 'ohiovoter_participation', 'ohiovoter_voterhistory'])
+                    with self.phase('drop indexes'):
+                        deferred_indexes.drop()
+
+                if source_dir:
+                    directory_name = source_dir
+                    counties = COUNTIES
+                    download = partial(self.find_county_data, source_directory=source_dir)
+                else:
+                    directory_name = cache_dir or tmpdirname
+                    if cache_dir:
+                        os.makedirs(cache_dir, exist_ok=True)
+
+                    # Biggest downloads first, when the server tells us their
+                    # sizes (ftplib's size() is None for a reply it can't parse)
+                    remote_files = self.remote_county_files()
+                    counties = sorted(COUNTIES, key=lambda county: -(remote_files.get(county, (0, None))[0] or 0))
+                    download = partial(
+                        self.download_county_data,
+                        destination_directory=directory_name,
+                        remote_files=remote_files,
+                    )
+
+                self.metrics = ImportMetrics(counties)
+                scheduler = CountyScheduler(
+                    download=download,
+                    prepare=partial(
+                        self.prepare_county,
+                        directory_name=directory_name,
+                        incremental=incremental,
+                        resume=resume,
+                        tables=tables,
+                    ),
+                    load=self.load_county_unit,
+                    finish=partial(self.finish_county, incremental=incremental),
+                    download_workers=kwargs['download_workers'],
+                    load_workers=kwargs['parse_workers'],
+                    load_initializer=init_load_worker,
+                    load_initargs=(
+                        BoundedSemaphore(db_writers), session_settings,
+                    ),
+                    monitor=self.metrics,
+                )
+
+                print('Downloading and importing county data...')
+                try:
+                    # Don't let the workers inherit (and later close) our connection
+                    db.connections.close_all()
+                    with self.phase('download and load county data'):
+                        scheduler.run(counties)
+                except BaseException as error:
+                    if defer_indexes:
+                        # Never leave the tables without their indexes
+                        print('Import failed, restoring indexes and foreign keys...')
+                        deferred_indexes.rebuild_indexes(num_cpus)
+                        deferred_indexes.rebuild_foreign_keys()
+                    if isinstance(error, WorkerLost):
+                        raise CommandError('{}. Rerun the import with --resume to pick up where it stopped.'.format(
+                            error,
+                        ))
+                    raise
+
+            if build_summaries and not shadow:
+                # Before any deferred indexes come back; the primary keys
+                # it joins on are still there
+                print('Building voter histories...')
+                with self.phase('build voter history'):
+                    self.build_voter_history(tables[0], tables[1], history_table, num_cpus)
+
+                print('Building rollups...')
+                with self.phase('build rollups'):
+                    self.build_rollups(tables[0], tables[1], rollup_tables, num_cpus)
+
+            if defer_indexes:
+                print('Rebuilding indexes...')
+                with self.phase('rebuild indexes'):
+                    deferred_indexes.rebuild_indexes(num_cpus)
+
+                print('Rebuilding foreign keys...')
+                with self.phase('rebuild foreign keys'):
+                    deferred_indexes.rebuild_foreign_keys()
+
+            if shadow:
+                if unlogged:
+                    # Before the indexes and foreign keys, which would
+                    # otherwise be rewritten along with the tables
+                    print('Making the new tables crash-safe...')
+                    with self.phase('log tables'):
+                        shadow_tables.set_logged()
+
+                print('Building indexes and foreign keys on the new tables...')
+                with self.phase('build indexes'):
+                    shadow_tables.build(num_cpus)
+
+                print('Building voter histories...')
+                with self.phase('build voter history'):
+                    self.build_voter_history(tables[0], tables[1], history_table, num_cpus)
+
+                print('Building rollups...')
+                with self.phase('build rollups'):
+                    self.build_rollups(tables[0], tables[1], rollup_tables, num_cpus)
+
+                print('Analyzing the new tables...')
+                with self.phase('analyze'):
+                    analyze(list(tables) + [history_table] + list(rollup_tables), num_cpus)
+
+                print('Swapping in the new tables...')
+                with self.phase('swap tables'), transaction.atomic():
+                    ImportSnapshot.objects.all().delete()
+                    shadow_tables.swap()
+                    # The ledger describes the shadow tables, which are the
+                    # live ones from here on; there's nothing left to resume
+                    LoadUnit.objects.all().delete()
+
+            with self.phase('prune elections'):
+                self.prune_elections()
+                sync_election_partitions()
+
+            if defer_indexes:
+                print('Analyzing tables...')
+                with self.phase('analyze'):
+                    analyze(
+                        ['ohiovoter_election', 'ohiovoter_voter', 'ohiovoter_participation', 'ohiovoter_voterhistory'] +
+                        list(ROLLUP_TABLES),
+                        num_cpus,
+                    )
 
-                pool = Pool(num_cpus)
+            # A new version for results computed from the data (see
+            # ohiovoter.cache)
+            ImportSnapshot.objects.create(version=uuid.uuid4().hex)
 
-                args = [(county, tmpdirname) for county in COUNTIES]
+            self.print_phase_timings()
+            self.metrics.print_summary()
 
-                print('Downloading county data...')
-                pool.starmap(self.download_county_data, args)
+            rejected = RejectedRow.objects.count()
+            if rejected:
+                print('\n{:,} rows could not be loaded. See the ohiovoter_rejectedrow table for why.'.format(rejected))
 
-                print('Importing county data...')
-                pool.starmap(self.load_county_data_into_db, args)
+            if kwargs['report']:
+                self.metrics.write_report(kwargs['report'], self.phase_timings)
+                print('\nWrote a timing report to {}'.format(kwargs['report']))
 
             print('\nDone!')
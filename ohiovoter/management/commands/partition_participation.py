@@ -0,0 +1,84 @@
+from contextlib import closing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from ohiovoter.bulkload import analyze, copy_index, table_definitions
+from ohiovoter.partitions import (
+    PARTICIPATION_TABLE, create_partitioned_table, is_partitioned, sync_election_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = ('Partition the participation table by election (PostgreSQL 11 or later), '
+            'or merge it back into a single table with --undo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--undo',
+            action='store_true',
+            dest='undo',
+            default=False,
+            help='Turn a partitioned participation table back into a single table.',
+        )
+
+    def handle(self, *args, **options):
+        undo = options['undo']
+
+        if not undo and connection.pg_version < 110000:
+            raise CommandError('Partitioning the participation table needs PostgreSQL 11 or later')
+
+        with closing(connection.cursor()) as cursor:
+            partitioned = is_partitioned(cursor, PARTICIPATION_TABLE)
+        if partitioned != undo:
+            print('The participation table {}.'.format('isn\'t partitioned' if undo else 'is already partitioned'))
+            return
+
+        print('Rewriting the participation table...')
+        self.rebuild_table(PARTICIPATION_TABLE, partition=not undo)
+
+        print('Analyzing the participation table...')
+        analyze([PARTICIPATION_TABLE], 1)
+
+        print('Done!')
+
+    @staticmethod
+    def rebuild_table(table, partition):
+        """
+        Copy `table` into a new table, partitioned by election or not, with
+        the same constraints and indexes under the same names, and replace
+        it, all in one transaction.
+        """
+        old_table = '{}_old'.format(table)
+
+        with transaction.atomic(), closing(connection.cursor()) as cursor:
+            constraints, indexes = table_definitions(cursor, [table])
+
+            # Free up the constraint and index names for the new table
+            cursor.execute('ALTER TABLE {} RENAME TO {}'.format(table, old_table))
+            for _, name, constraint_type, definition, index_definition, referenced_table in constraints:
+                if constraint_type == 'f':
+                    cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(old_table, name))
+            for _, name, constraint_type, definition, index_definition, referenced_table in constraints:
+                if constraint_type != 'f':
+                    cursor.execute('ALTER TABLE {} DROP CONSTRAINT {}'.format(old_table, name))
+            for _, name, definition in indexes:
+                cursor.execute('DROP INDEX {}'.format(name))
+
+            if partition:
+                create_partitioned_table(cursor, table, old_table)
+                sync_election_partitions(table)
+            else:
+                cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)'.format(table, old_table))
+
+            cursor.execute('INSERT INTO {} SELECT * FROM {}'.format(table, old_table))
+            cursor.execute('DROP TABLE {}'.format(old_table))
+
+            for _, name, constraint_type, definition, index_definition, referenced_table in constraints:
+                if constraint_type != 'f':
+                    cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(table, name, definition))
+            for _, name, definition in indexes:
+                cursor.execute(copy_index(definition, name, table))
+            for _, name, constraint_type, definition, index_definition, referenced_table in constraints:
+                if constraint_type == 'f':
+                    cursor.execute('ALTER TABLE {} ADD CONSTRAINT {} {}'.format(table, name, definition))
@@ -0,0 +1,168 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import json
+import time
+
+
+class Metrics(object):
+    """
+    Counters and timings (in seconds) collected while importing. Workers
+    fill one in for each unit they load and hand it back to the parent
+    process, which adds them all up.
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.timings = defaultdict(float)
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def add_time(self, name, seconds):
+        self.timings[name] += seconds
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - started
+
+    def timed(self, name, iterable):
+        """
+        Iterate over `iterable`, adding the time spent getting each item to
+        the `name` timing.
+        """
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.timings[name] += time.perf_counter() - started
+            yield item
+
+    def add(self, other):
+        for name, amount in other.counters.items():
+            self.counters[name] += amount
+        for name, seconds in other.timings.items():
+            self.timings[name] += seconds
+
+    def as_dict(self):
+        return {'counters': dict(self.counters), 'timings': dict(self.timings)}
+
+
+class ImportMetrics(Metrics):
+    """
+    Everything measured during an import, aggregated in the parent process,
+    along with per-county wall times and the source bytes left to load.
+
+    It's the monitor a CountyScheduler reports to, and prints a progress
+    line, with an ETA once every county's size is known, at most every
+    `interval` seconds.
+    """
+
+    def __init__(self, counties, interval=15):
+        super(ImportMetrics, self).__init__()
+        self.counties = {
+            county: {'downloaded': None, 'started': None, 'finished': None, 'bytes': None, 'bytes loaded': 0, 'rows': 0}
+            for county in counties
+        }
+        self.interval = interval
+        self.started = time.time()
+        self.last_progress = self.started
+        self.progress_bytes = 0
+        self.progress_time = self.started
+
+    # Called by prepare_county, in the parent process
+
+    def prepared(self, county, size):
+        self.counties[county]['bytes'] = size
+
+    def skipped(self, county, size):
+        """
+        A unit already loaded by an interrupted import.
+        """
+        self.counties[county]['bytes loaded'] += size
+
+    # Called by the CountyScheduler
+
+    def downloaded(self, county, size):
+        self.counties[county]['downloaded'] = time.time()
+        self.count('archive bytes downloaded', size)
+
+    def dispatched(self, county):
+        if self.counties[county]['started'] is None:
+            self.counties[county]['started'] = time.time()
+
+    def loaded(self, county, unit_metrics):
+        self.add(unit_metrics)
+        self.counties[county]['bytes loaded'] += unit_metrics.counters['bytes read']
+        self.counties[county]['rows'] += unit_metrics.counters['rows parsed']
+        if time.time() - self.last_progress >= self.interval:
+            self.print_progress()
+
+    def finished(self, county, county_metrics):
+        if county_metrics is not None:
+            self.add(county_metrics)
+        self.counties[county]['finished'] = time.time()
+
+    def print_progress(self):
+        now = time.time()
+        loaded = sum(c['bytes loaded'] for c in self.counties.values())
+        sizes = [c['bytes'] for c in self.counties.values()]
+        finished = sum(1 for c in self.counties.values() if c['finished'] is not None)
+
+        # Throughput since the last progress line, so the ETA follows the
+        # current rate rather than the start-up
+        rate = (loaded - self.progress_bytes) / max(now - self.progress_time, 1e-9)
+        self.progress_bytes, self.progress_time, self.last_progress = loaded, now, now
+
+        if None in sizes:
+            eta = 'ETA once every county is downloaded'
+        elif rate > 0:
+            eta = 'ETA {}'.format(format_duration((sum(sizes) - loaded) / rate))
+        else:
+            eta = 'ETA unknown'
+
+        print('Progress: {}/{} counties, {:,} rows, {:.1f} MB loaded, {:.1f} MB/s, {}'.format(
+            finished, len(self.counties), self.counters['rows parsed'], loaded / 1e6, rate / 1e6, eta,
+        ))
+
+    def report(self, phase_timings):
+        """
+        Everything measured, as a JSON-serializable dict.
+        """
+        counties = {}
+        for county, c in self.counties.items():
+            counties[county] = {
+                'bytes': c['bytes'],
+                'rows': c['rows'],
+                'wait seconds': (c['started'] - c['downloaded']) if c['started'] and c['downloaded'] else None,
+                'wall seconds': (c['finished'] - c['started']) if c['finished'] and c['started'] else None,
+            }
+
+        report = self.as_dict()
+        report['phases'] = [{'name': name, 'seconds': seconds} for name, seconds in phase_timings]
+        report['counties'] = counties
+        return report
+
+    def print_summary(self):
+        print('\nImport metrics (summed over all workers):')
+        for name in sorted(self.counters):
+            print('  {:<32} {:>12,}'.format(name, self.counters[name]))
+        for name in sorted(self.timings):
+            print('  {:<32} {:>11.1f}s'.format(name, self.timings[name]))
+
+    def write_report(self, file_name, phase_timings):
+        with open(file_name, 'w') as report_file:
+            json.dump(self.report(phase_timings), report_file, indent=2, sort_keys=True)
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{}:{:02d}:{:02d}'.format(hours, minutes, seconds)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Elections trade their 64 character SHA-256 id for a small integer, numbered
+# in date order, and participations lose their surrogate id in favor of a
+# composite (voter_id, election_id) primary key. The separate voter_id and
+# election_id indexes are dropped; the primary key and the
+# (election_id, voter_id) unique constraint already cover both lookups.
+COMPACT_KEYS_SQL = [
+    'ALTER TABLE ohiovoter_election RENAME COLUMN id TO old_id',
+    'ALTER TABLE ohiovoter_election ADD COLUMN id serial',
+    """UPDATE ohiovoter_election e SET id = o.id FROM (
+           SELECT old_id, row_number() OVER (ORDER BY date, category, party) AS id FROM ohiovoter_election
+       ) o WHERE o.old_id = e.old_id""",
+    "SELECT setval('ohiovoter_election_id_seq', COALESCE(MAX(id), 0) + 1, false) FROM ohiovoter_election",
+
+    'ALTER TABLE ohiovoter_participation ADD COLUMN new_election_id integer',
+    """UPDATE ohiovoter_participation p SET new_election_id = e.id
+       FROM ohiovoter_election e WHERE e.old_id = p.election_id""",
+    # Dropping the old columns also drops their keys, constraints and indexes
+    'ALTER TABLE ohiovoter_participation DROP COLUMN election_id',
+    'ALTER TABLE ohiovoter_participation DROP COLUMN id',
+    'ALTER TABLE ohiovoter_election DROP COLUMN old_id',
+    'ALTER TABLE ohiovoter_participation RENAME COLUMN new_election_id TO election_id',
+    'ALTER TABLE ohiovoter_participation ALTER COLUMN election_id SET NOT NULL',
+
+    'ALTER TABLE ohiovoter_election ADD PRIMARY KEY (id)',
+    """ALTER TABLE ohiovoter_election
+       ADD CONSTRAINT ohiovoter_election_category_date_party_uniq UNIQUE (category, date, party)""",
+
+    # The only indexes left on participation are the two on voter_id
+    """DO $$
+       DECLARE
+           index_name regclass;
+       BEGIN
+           FOR index_name IN
+               SELECT indexrelid::regclass FROM pg_index
+               WHERE indrelid = 'ohiovoter_participation'::regclass AND NOT indisprimary AND NOT indisunique
+           LOOP
+               EXECUTE 'DROP INDEX ' || index_name;
+           END LOOP;
+       END
+       $$""",
+    'ALTER TABLE ohiovoter_participation ADD PRIMARY KEY (voter_id, election_id)',
+    """ALTER TABLE ohiovoter_participation
+       ADD CONSTRAINT ohiovoter_participation_election_id_voter_id_uniq UNIQUE (election_id, voter_id)""",
+    """ALTER TABLE ohiovoter_participation
+       ADD CONSTRAINT ohiovoter_participation_election_id_fk_ohiovoter_election_id
+       FOREIGN KEY (election_id) REFERENCES ohiovoter_election (id) DEFERRABLE INITIALLY DEFERRED""",
+]
+
+# Back to the 0002 schema: elections are keyed by the SHA-256 of
+# "category.date.party" again, the way the importer used to compute them,
+# and participations get back a surrogate id, a character election_id and
+# separate voter_id and election_id indexes. Needs PostgreSQL 11 for
+# sha256(), and a participation table that isn't partitioned (run
+# partition_participation --undo first).
+EXPAND_KEYS_SQL = [
+    'ALTER TABLE ohiovoter_participation DROP CONSTRAINT ohiovoter_participation_election_id_fk_ohiovoter_election_id',
+    'ALTER TABLE ohiovoter_participation DROP CONSTRAINT ohiovoter_participation_election_id_voter_id_uniq',
+    'ALTER TABLE ohiovoter_participation DROP CONSTRAINT ohiovoter_participation_pkey',
+
+    'ALTER TABLE ohiovoter_election ADD COLUMN old_id varchar(64)',
+    """UPDATE ohiovoter_election
+       SET old_id = encode(sha256(convert_to(category || '.' || to_char(date, 'YYYY-MM-DD') || '.' || party, 'UTF8')), 'hex')""",
+
+    'ALTER TABLE ohiovoter_participation ADD COLUMN old_election_id varchar(64)',
+    """UPDATE ohiovoter_participation p SET old_election_id = e.old_id
+       FROM ohiovoter_election e WHERE e.id = p.election_id""",
+    'ALTER TABLE ohiovoter_participation DROP COLUMN election_id',
+    'ALTER TABLE ohiovoter_participation RENAME COLUMN old_election_id TO election_id',
+    'ALTER TABLE ohiovoter_participation ALTER COLUMN election_id SET NOT NULL',
+    'ALTER TABLE ohiovoter_participation ADD COLUMN id serial PRIMARY KEY',
+
+    # Dropping the integer id also drops its primary key and sequence
+    'ALTER TABLE ohiovoter_election DROP CONSTRAINT ohiovoter_election_category_date_party_uniq',
+    'ALTER TABLE ohiovoter_election DROP COLUMN id',
+    'ALTER TABLE ohiovoter_election RENAME COLUMN old_id TO id',
+    'ALTER TABLE ohiovoter_election ALTER COLUMN id SET NOT NULL',
+    'ALTER TABLE ohiovoter_election ADD PRIMARY KEY (id)',
+    'CREATE INDEX ohiovoter_election_id_like ON ohiovoter_election (id varchar_pattern_ops)',
+
+    'CREATE INDEX ohiovoter_participation_voter_id ON ohiovoter_participation (voter_id)',
+    'CREATE INDEX ohiovoter_participation_voter_id_like ON ohiovoter_participation (voter_id varchar_pattern_ops)',
+    'CREATE INDEX ohiovoter_participation_election_id ON ohiovoter_participation (election_id)',
+    """CREATE INDEX ohiovoter_participation_election_id_like
+       ON ohiovoter_participation (election_id varchar_pattern_ops)""",
+    """ALTER TABLE ohiovoter_participation
+       ADD CONSTRAINT ohiovoter_participation_election_id_voter_id_uniq UNIQUE (election_id, voter_id)""",
+    """ALTER TABLE ohiovoter_participation
+       ADD CONSTRAINT ohiovoter_participation_election_id_fk_ohiovoter_election_id
+       FOREIGN KEY (election_id) REFERENCES ohiovoter_election (id) DEFERRABLE INITIALLY DEFERRED""",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ohiovoter', '0002_voter_row_hash'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(COMPACT_KEYS_SQL, EXPAND_KEYS_SQL),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='election',
+                    name='id',
+                    field=models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+                ),
+                migrations.AlterUniqueTogether(
+                    name='election',
+                    unique_together=set([('category', 'date', 'party')]),
+                ),
+                migrations.AlterField(
+                    model_name='participation',
+                    name='election',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='ohiovoter.Election'),
+                ),
+                migrations.AlterField(
+                    model_name='participation',
+                    name='voter',
+                    field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='ohiovoter.Voter'),
+                ),
+                migrations.RemoveField(
+                    model_name='participation',
+                    name='id',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ohiovoter', '0003_compact_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoadUnit',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('county', models.CharField(max_length=512)),
+                ('unit', models.IntegerField(null=True)),
+                ('checksum', models.CharField(max_length=512)),
+                ('status', models.CharField(choices=[('pending', 'PENDING'), ('loaded', 'LOADED')], default='pending', max_length=16)),
+                ('rows', models.IntegerField(null=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ('county', 'unit'),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='loadunit',
+            unique_together=set([('county', 'unit')]),
+        ),
+    ]
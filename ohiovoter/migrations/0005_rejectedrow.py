@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ohiovoter', '0004_loadunit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RejectedRow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('county', models.CharField(max_length=512)),
+                ('unit', models.IntegerField()),
+                ('line', models.IntegerField()),
+                ('sos_voterid', models.CharField(max_length=512, null=True)),
+                ('reason', models.TextField()),
+                ('data', models.TextField()),
+            ],
+            options={
+                'ordering': ('county', 'unit', 'line'),
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ohiovoter', '0005_rejectedrow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoterHistory',
+            fields=[
+                ('voter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='history', serialize=False, to='ohiovoter.Voter')),
+                ('elections', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None)),
+                ('general_count', models.IntegerField(default=0)),
+                ('primary_count', models.IntegerField(default=0)),
+                ('first_vote_date', models.DateField(null=True)),
+                ('last_vote_date', models.DateField(null=True)),
+                ('last_primary_date', models.DateField(null=True)),
+                ('last_primary_party', models.CharField(choices=[('C', 'CONSTITUTION'), ('D', 'DEMOCRAT'), ('E', 'REFORM'), ('G', 'GREEN'), ('L', 'LIBERTARIAN'), ('N', 'NATURAL_LAW'), ('R', 'REPUBLICAN'), ('S', 'SOCIALIST'), ('X', 'N/A')], max_length=512, null=True)),
+                ('primary_parties', models.TextField(default='')),
+            ],
+        ),
+        # Django 1.10 can't declare a GIN index on a model
+        migrations.RunSQL(
+            'CREATE INDEX ohiovoter_voterhistory_elections_gin ON ohiovoter_voterhistory USING gin (elections)',
+            'DROP INDEX ohiovoter_voterhistory_elections_gin',
+        ),
+    ]
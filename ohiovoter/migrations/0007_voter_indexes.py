@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ohiovoter', '0006_voterhistory'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='voter',
+            index_together=set([
+                ('county', 'last_name', 'first_name'),
+                ('last_name', 'first_name'),
+                ('county', 'precinct_code'),
+                ('county', 'party_affiliation'),
+                ('congressional_district',),
+                ('state_senate_district',),
+                ('state_representative_district',),
+            ]),
+        ),
+    ]
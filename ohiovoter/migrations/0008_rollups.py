@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+GEOGRAPHY_COLUMNS = """
+    county varchar(512),
+    precinct_code varchar(512),
+    congressional_district integer,
+    state_senate_district integer,
+    state_representative_district integer,
+    party_affiliation varchar(512),
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ohiovoter', '0007_voter_indexes'),
+    ]
+
+    operations = [
+        # The rollups are unmanaged models over tables the importer fills
+        migrations.RunSQL(
+            [
+                'CREATE TABLE ohiovoter_registrationrollup ({} voter_status varchar(512), voters integer NOT NULL)'.format(
+                    GEOGRAPHY_COLUMNS,
+                ),
+                'CREATE INDEX ohiovoter_registrationrollup_county_precinct ON ohiovoter_registrationrollup (county, precinct_code)',
+                'CREATE TABLE ohiovoter_turnoutrollup (election_id integer NOT NULL, {} voters integer NOT NULL)'.format(
+                    GEOGRAPHY_COLUMNS,
+                ),
+                'CREATE INDEX ohiovoter_turnoutrollup_election_county ON ohiovoter_turnoutrollup (election_id, county, precinct_code)',
+            ],
+            'DROP TABLE ohiovoter_registrationrollup, ohiovoter_turnoutrollup',
+        ),
+        migrations.CreateModel(
+            name='RegistrationRollup',
+            fields=[
+                ('county', models.CharField(max_length=512, primary_key=True, serialize=False)),
+                ('precinct_code', models.CharField(max_length=512, null=True)),
+                ('congressional_district', models.IntegerField(null=True)),
+                ('state_senate_district', models.IntegerField(null=True)),
+                ('state_representative_district', models.IntegerField(null=True)),
+                ('party_affiliation', models.CharField(max_length=512, null=True)),
+                ('voter_status', models.CharField(max_length=512, null=True)),
+                ('voters', models.IntegerField()),
+            ],
+            options={
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TurnoutRollup',
+            fields=[
+                ('county', models.CharField(max_length=512, primary_key=True, serialize=False)),
+                ('election', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='turnout_rollups', to='ohiovoter.Election')),
+                ('precinct_code', models.CharField(max_length=512, null=True)),
+                ('congressional_district', models.IntegerField(null=True)),
+                ('state_senate_district', models.IntegerField(null=True)),
+                ('state_representative_district', models.IntegerField(null=True)),
+                ('party_affiliation', models.CharField(max_length=512, null=True)),
+                ('voters', models.IntegerField()),
+            ],
+            options={
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ohiovoter', '0008_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voter',
+            name='last_name_key',
+            field=models.CharField(max_length=512, null=True),
+        ),
+        migrations.AddField(
+            model_name='voter',
+            name='first_name_key',
+            field=models.CharField(max_length=512, null=True),
+        ),
+        migrations.AddField(
+            model_name='voter',
+            name='last_name_code',
+            field=models.CharField(max_length=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='voter',
+            name='first_name_code',
+            field=models.CharField(max_length=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='voter',
+            name='address_key',
+            field=models.CharField(max_length=512, null=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='voter',
+            index_together=set([
+                ('county', 'last_name', 'first_name'),
+                ('last_name', 'first_name'),
+                ('county', 'precinct_code'),
+                ('county', 'party_affiliation'),
+                ('congressional_district',),
+                ('state_senate_district',),
+                ('state_representative_district',),
+                ('last_name_code', 'first_name_code'),
+                ('date_of_birth', 'first_name_code'),
+                ('address_key', 'last_name_code'),
+            ]),
+        ),
+    ]
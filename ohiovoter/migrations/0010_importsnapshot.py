@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ohiovoter', '0009_voter_search_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=32, unique=True)),
+                ('completed', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ('-completed',),
+            },
+        ),
+    ]
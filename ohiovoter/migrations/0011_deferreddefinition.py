@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ohiovoter', '0010_importsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeferredDefinition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=512)),
+                ('name', models.CharField(max_length=512)),
+                ('kind', models.CharField(choices=[('index', 'INDEX'), ('unique', 'UNIQUE'), ('foreign key', 'FOREIGN KEY')], max_length=16)),
+                ('index_definition', models.TextField(blank=True)),
+                ('constraint_definition', models.TextField(blank=True)),
+                ('partitioned', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+    ]
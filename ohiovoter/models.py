@@ -1,3 +1,4 @@
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 
 
@@ -38,7 +39,6 @@ class Election(models.Model):
 
     PARTY_CHOICES_SET = set([_[0] for _ in PARTY_CHOICES])
 
-    id = models.CharField(primary_key=True, max_length=64, null=False)
     category = models.IntegerField(db_index=True, null=False, blank=False, choices=CATEGORY_CHOICES)
     date = models.DateField(db_index=True, null=False, blank=False)
     party = models.CharField(max_length=512, db_index=True, null=False, blank=False, choices=PARTY_CHOICES)
@@ -58,6 +58,7 @@ class Election(models.Model):
 
     class Meta:
         ordering = ('-date', 'party')
+        unique_together = ('category', 'date', 'party')
 
 
 class Voter(models.Model):
@@ -108,6 +109,14 @@ class Voter(models.Model):
     village = models.CharField(max_length=512, null=True)
     ward = models.CharField(max_length=512, null=True)
     county = models.CharField(max_length=512, null=True)
+    row_hash = models.CharField(max_length=32, null=True)
+    # Normalized names and address, with the names' Soundex codes, for
+    # matching records against the voter file (see ohiovoter.search)
+    last_name_key = models.CharField(max_length=512, null=True)
+    first_name_key = models.CharField(max_length=512, null=True)
+    last_name_code = models.CharField(max_length=4, null=True)
+    first_name_code = models.CharField(max_length=4, null=True)
+    address_key = models.CharField(max_length=512, null=True)
     elections = models.ManyToManyField(Election, through='Participation')
 
     def __str__(self):
@@ -119,11 +128,209 @@ class Voter(models.Model):
 
     class Meta:
         ordering = ('last_name', 'first_name', 'middle_name')
+        # The usual ways into the voter file: a county, a name, a precinct,
+        # a party or a district, and the candidates ohiovoter.search looks at
+        index_together = (
+            ('county', 'last_name', 'first_name'),
+            ('last_name', 'first_name'),
+            ('county', 'precinct_code'),
+            ('county', 'party_affiliation'),
+            ('congressional_district',),
+            ('state_senate_district',),
+            ('state_representative_district',),
+            ('last_name_code', 'first_name_code'),
+            ('date_of_birth', 'first_name_code'),
+            ('address_key', 'last_name_code'),
+        )
 
 
 class Participation(models.Model):
-    election = models.ForeignKey(Election, on_delete=models.CASCADE)
-    voter = models.ForeignKey(Voter, on_delete=models.CASCADE)
+    # The table has no surrogate id: its primary key is the composite
+    # (voter_id, election_id), created in migration 0003. Django can't model a
+    # composite key, so the ORM is told that voter is the primary key. Query
+    # participations freely, but never delete() or save() one instance at a
+    # time; that would address every participation of the voter.
+    # Lookups by election use the (election, voter) unique index
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, db_index=False)
+    voter = models.ForeignKey(Voter, on_delete=models.CASCADE, primary_key=True)
 
     class Meta:
         unique_together = ('election', 'voter')
+
+
+class VoterHistory(models.Model):
+    """
+    A summary of each voter's participation, rebuilt by the importer, so
+    turnout and crossover questions are one pass over a row per voter
+    instead of a query per voter.
+    """
+    voter = models.OneToOneField(Voter, on_delete=models.CASCADE, primary_key=True, related_name='history')
+    # Ids of every election the voter participated in, oldest first. GIN
+    # indexed (see migration 0006), so elections__contains is fast
+    elections = ArrayField(models.IntegerField(), default=list)
+    general_count = models.IntegerField(default=0)
+    primary_count = models.IntegerField(default=0)
+    first_vote_date = models.DateField(null=True)
+    last_vote_date = models.DateField(null=True)
+    last_primary_date = models.DateField(null=True)
+    last_primary_party = models.CharField(max_length=512, null=True, choices=Election.PARTY_CHOICES)
+    # The party of each primary the voter participated in, oldest first,
+    # one character each (like 'XDRR')
+    primary_parties = models.TextField(default='')
+
+    def __str__(self):
+        return '{} - {} elections'.format(self.voter_id, len(self.elections))
+
+
+class RegistrationRollup(models.Model):
+    """
+    Registered voters counted by precinct (along with the districts it's
+    in), party and status, rebuilt by the importer. Sum them up for any
+    geography instead of counting voters.
+    """
+    # The rollup tables are created in migration 0008 and have no primary
+    # key. Django needs one, so the ORM is told that county is the primary
+    # key. Filter and aggregate the rollups freely, but never save() or
+    # delete() one instance at a time.
+    county = models.CharField(max_length=512, primary_key=True)
+    precinct_code = models.CharField(max_length=512, null=True)
+    congressional_district = models.IntegerField(null=True)
+    state_senate_district = models.IntegerField(null=True)
+    state_representative_district = models.IntegerField(null=True)
+    party_affiliation = models.CharField(max_length=512, null=True)
+    voter_status = models.CharField(max_length=512, null=True)
+    voters = models.IntegerField()
+
+    def __str__(self):
+        return '{} County precinct {} - {} voters'.format(self.county.title(), self.precinct_code, self.voters)
+
+    class Meta:
+        managed = False
+
+
+class TurnoutRollup(models.Model):
+    """
+    Voters who participated in each election, counted by precinct (along
+    with the districts it's in) and the party they're registered with,
+    rebuilt by the importer.
+    """
+    # See RegistrationRollup
+    county = models.CharField(max_length=512, primary_key=True)
+    election = models.ForeignKey(Election, on_delete=models.DO_NOTHING, db_constraint=False,
+                                 related_name='turnout_rollups')
+    precinct_code = models.CharField(max_length=512, null=True)
+    congressional_district = models.IntegerField(null=True)
+    state_senate_district = models.IntegerField(null=True)
+    state_representative_district = models.IntegerField(null=True)
+    party_affiliation = models.CharField(max_length=512, null=True)
+    voters = models.IntegerField()
+
+    def __str__(self):
+        return '{} - {} County precinct {} - {} voters'.format(
+            self.election, self.county.title(), self.precinct_code, self.voters,
+        )
+
+    class Meta:
+        managed = False
+
+
+class LoadUnit(models.Model):
+    """
+    The import ledger. There's a row for each county being imported, with
+    unit set to None, and one for each unit of that county's file that has
+    been loaded, so an interrupted import can be resumed where it stopped.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_LOADED = 'loaded'
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'PENDING'),
+        (STATUS_LOADED, 'LOADED'),
+    )
+
+    county = models.CharField(max_length=512)
+    unit = models.IntegerField(null=True)
+    checksum = models.CharField(max_length=512)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    rows = models.IntegerField(null=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        if self.unit is None:
+            return '{} County - {}'.format(self.county.title(), self.get_status_display())
+        return '{} County unit {} - {}'.format(self.county.title(), self.unit, self.get_status_display())
+
+    class Meta:
+        ordering = ('county', 'unit')
+        unique_together = ('county', 'unit')
+
+
+class RejectedRow(models.Model):
+    """
+    A row of a county file the importer couldn't load, such as one with a
+    malformed date or number, set aside so the rest of its unit still loads.
+    """
+    county = models.CharField(max_length=512)
+    unit = models.IntegerField()
+    line = models.IntegerField()
+    sos_voterid = models.CharField(max_length=512, null=True)
+    reason = models.TextField()
+    data = models.TextField()
+
+    def __str__(self):
+        return '{} County unit {} line {} - {}'.format(self.county.title(), self.unit, self.line, self.reason)
+
+    class Meta:
+        ordering = ('county', 'unit', 'line')
+
+
+class ImportSnapshot(models.Model):
+    """
+    Stamped by the importer when an import completes, so results computed
+    from the data can be cached against the import they came from (see
+    ohiovoter.cache). There's no snapshot while an import is changing the
+    data.
+    """
+    version = models.CharField(max_length=32, unique=True)
+    completed = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return '{} - {}'.format(self.version, self.completed)
+
+    class Meta:
+        ordering = ('-completed',)
+
+
+class DeferredDefinition(models.Model):
+    """
+    An index or constraint import_data --defer-indexes dropped and hasn't
+    rebuilt yet, saved along with the drop. If the import dies without
+    rebuilding it (killed, or the database server restarting), the next
+    import puts it back before doing anything else (see
+    ohiovoter.bulkload.DeferredIndexes).
+    """
+    KIND_INDEX = 'index'
+    KIND_UNIQUE = 'unique'
+    KIND_FOREIGN_KEY = 'foreign key'
+
+    KIND_CHOICES = (
+        (KIND_INDEX, 'INDEX'),
+        (KIND_UNIQUE, 'UNIQUE'),
+        (KIND_FOREIGN_KEY, 'FOREIGN KEY'),
+    )
+
+    table = models.CharField(max_length=512)
+    name = models.CharField(max_length=512)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    # The CREATE INDEX statement of an index, or of the index behind a
+    # unique constraint
+    index_definition = models.TextField(blank=True)
+    # The constraint definition of a unique constraint or foreign key
+    constraint_definition = models.TextField(blank=True)
+    partitioned = models.BooleanField(default=False)
+
+    def __str__(self):
+        return '{} {} on {}'.format(self.get_kind_display(), self.name, self.table)
+
+    class Meta:
+        ordering = ('id',)
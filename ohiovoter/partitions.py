@@ -0,0 +1,101 @@
+from contextlib import closing
+import re
+
+from django.db import connection, transaction
+
+
+PARTICIPATION_TABLE = 'ohiovoter_participation'
+
+# Partition bounds as pg_get_expr() writes them
+ELECTION_BOUND = re.compile(r'^FOR VALUES IN \((\d+)\)$')
+
+
+def is_partitioned(cursor, table):
+    cursor.execute('SELECT relkind FROM pg_class WHERE oid = %s::regclass', [table])
+    return cursor.fetchone()[0] == 'p'
+
+
+def election_partitions(cursor, table):
+    """
+    The partitions of `table`, as a dict of election id (None for the
+    default partition) to partition name.
+    """
+    cursor.execute(
+        """SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+           FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+           WHERE i.inhparent = %s::regclass""",
+        [table],
+    )
+    partitions = {}
+    for name, bound in cursor.fetchall():
+        match = ELECTION_BOUND.match(bound)
+        partitions[int(match.group(1)) if match else None] = name
+    return partitions
+
+
+def partition_name(table, election_id):
+    if election_id is None:
+        return '{}_default'.format(table)
+    return '{}_e{}'.format(table, election_id)
+
+
+def create_partitioned_table(cursor, table, like):
+    """
+    Create `table` as a copy of the columns of `like`, partitioned by
+    election, with a default partition for participations in elections that
+    don't have their own yet.
+    """
+    cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY LIST (election_id)'.format(table, like))
+    cursor.execute('CREATE TABLE {} PARTITION OF {} DEFAULT'.format(partition_name(table, None), table))
+
+
+def sync_election_partitions(table=PARTICIPATION_TABLE):
+    """
+    If `table` is partitioned, give every election its own partition, moving
+    in any of its rows that landed in the default partition, and drop the
+    partitions of elections that no longer exist.
+    """
+    with transaction.atomic(), closing(connection.cursor()) as cursor:
+        if not is_partitioned(cursor, table):
+            return
+
+        partitions = election_partitions(cursor, table)
+        cursor.execute('SELECT id FROM ohiovoter_election')
+        election_ids = set(row[0] for row in cursor.fetchall())
+
+        for election_id in sorted(election_ids - set(partitions)):
+            # Filled before it's attached, as PostgreSQL won't attach a
+            # partition while the default partition has rows that belong in it
+            name = partition_name(table, election_id)
+            cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)'.format(name, table))
+            if None in partitions:
+                cursor.execute(
+                    """WITH moved AS (DELETE FROM {} WHERE election_id = %s RETURNING *)
+                       INSERT INTO {} SELECT * FROM moved""".format(partitions[None], name),
+                    [election_id],
+                )
+            cursor.execute('ALTER TABLE {} ATTACH PARTITION {} FOR VALUES IN (%s)'.format(table, name), [election_id])
+
+        for election_id in set(partitions) - election_ids - {None}:
+            cursor.execute('DROP TABLE {}'.format(partitions[election_id]))
+
+
+def rename_partitions(cursor, table, old_table):
+    """
+    Rename the partitions of `table`, and the indexes PostgreSQL named after
+    them, from `old_table`'s partition names to `table`'s.
+    """
+    for election_id, old_name in election_partitions(cursor, table).items():
+        name = partition_name(table, election_id)
+        if old_name != partition_name(old_table, election_id):
+            continue
+        cursor.execute(
+            'SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass',
+            [old_name],
+        )
+        for index_name, in cursor.fetchall():
+            if index_name.startswith(old_name):
+                cursor.execute('ALTER INDEX {} RENAME TO {}'.format(
+                    index_name, (name + index_name[len(old_name):])[:63],
+                ))
+        cursor.execute('ALTER TABLE {} RENAME TO {}'.format(old_name, name))
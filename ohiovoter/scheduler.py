@@ -0,0 +1,158 @@
+import heapq
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+import queue
+
+
+# Seconds between checks that every load worker is still alive
+WORKER_CHECK_INTERVAL = 1
+
+
+class WorkerLost(Exception):
+    """
+    A load worker process died (killed by a signal or the OOM killer, say)
+    with a unit or county in hand, which would otherwise never finish.
+    """
+
+
+class CountyScheduler(object):
+    """
+    Runs the download and load of every county as one pipeline.
+
+    Counties download on a thread pool of `download_workers`. As soon as one
+    finishes, `prepare` runs for it in this process and returns an iterator
+    of units of work, each a tuple of arguments for `load`. Units are handed
+    to a process pool of `load_workers` one at a time, whenever a worker is
+    free, always from the largest county that still has any left. A big
+    county is therefore spread over every worker rather than being loaded by
+    one of them while the others sit idle, and the run takes about as long as
+    the total amount of data, not the largest county.
+
+    Once every unit of a county has loaded, `finish` runs for it in the pool.
+
+    download(county) must return the downloaded size in bytes. load(county,
+    *unit) and finish(county) run in worker processes, so they must be
+    picklable.
+
+    If a `monitor` is given, it's told as each county downloads
+    (downloaded(county, size)), as each unit is handed to a worker
+    (dispatched(county)), and is passed what load and finish return
+    (loaded(county, result) and finished(county, result)).
+
+    If a load worker dies, the pool would quietly replace it and the work it
+    had in hand would never report back, so run() checks on the workers
+    every WORKER_CHECK_INTERVAL seconds and raises WorkerLost if any is gone.
+    """
+
+    def __init__(self, download, prepare, load, finish, download_workers, load_workers,
+                 load_initializer=None, load_initargs=(), monitor=None):
+        self.download = download
+        self.prepare = prepare
+        self.load = load
+        self.finish = finish
+        self.download_workers = download_workers
+        self.load_workers = load_workers
+        self.load_initializer = load_initializer
+        self.load_initargs = load_initargs
+        self.monitor = monitor
+
+    def run(self, counties):
+        """
+        Download and load `counties`, downloading them in the given order.
+        Raises the first error any download, preparation or load hits.
+        """
+        events = queue.Queue()
+        ready = []  # heap of (-size, county, iterator of units)
+        loading = {}  # county -> units handed to the pool but not loaded yet
+        exhausted = set()  # counties with no units left to hand out
+        busy = 0
+        finished = 0
+
+        download_pool = ThreadPool(self.download_workers)
+        load_pool = Pool(self.load_workers, self.load_initializer, self.load_initargs)
+        # The pool only ever replaces a worker that died
+        load_processes = list(load_pool._pool)
+
+        def on_error(error):
+            events.put(('error', None, error))
+
+        def finish(county):
+            load_pool.apply_async(
+                self.finish,
+                (county,),
+                callback=lambda result: events.put(('finished', county, result)),
+                error_callback=on_error,
+            )
+
+        try:
+            for county in counties:
+                download_pool.apply_async(
+                    self.download,
+                    (county,),
+                    callback=lambda size, county=county: events.put(('downloaded', county, size)),
+                    error_callback=on_error,
+                )
+
+            while finished < len(counties):
+                try:
+                    event, county, value = events.get(timeout=WORKER_CHECK_INTERVAL)
+                except queue.Empty:
+                    lost = [process for process in load_processes if process.exitcode is not None]
+                    if lost:
+                        raise WorkerLost('A load worker died (exit code {})'.format(lost[0].exitcode))
+                    continue
+
+                if event == 'error':
+                    raise value
+                elif event == 'downloaded':
+                    if self.monitor is not None:
+                        self.monitor.downloaded(county, value)
+                    heapq.heappush(ready, (-value, county, iter(self.prepare(county))))
+                    loading[county] = 0
+                elif event == 'loaded':
+                    if self.monitor is not None:
+                        self.monitor.loaded(county, value)
+                    busy -= 1
+                    loading[county] -= 1
+                    if loading[county] == 0 and county in exhausted:
+                        finish(county)
+                        busy += 1
+                elif event == 'finished':
+                    if self.monitor is not None:
+                        self.monitor.finished(county, value)
+                    busy -= 1
+                    finished += 1
+
+                while ready and busy < self.load_workers:
+                    size, county, units = ready[0]
+                    unit = next(units, None)
+
+                    if unit is None:
+                        heapq.heappop(ready)
+                        exhausted.add(county)
+                        if loading[county] == 0:
+                            finish(county)
+                            busy += 1
+                        continue
+
+                    if self.monitor is not None:
+                        self.monitor.dispatched(county)
+                    load_pool.apply_async(
+                        self.load,
+                        (county,) + tuple(unit),
+                        callback=lambda result, county=county: events.put(('loaded', county, result)),
+                        error_callback=on_error,
+                    )
+                    loading[county] += 1
+                    busy += 1
+        except BaseException:
+            download_pool.terminate()
+            load_pool.terminate()
+            download_pool.join()
+            load_pool.join()
+            raise
+
+        download_pool.close()
+        load_pool.close()
+        download_pool.join()
+        load_pool.join()
@@ -0,0 +1,220 @@
+from contextlib import closing
+from datetime import date
+from functools import lru_cache
+import re
+import unicodedata
+
+from django.db import connection
+
+from ohiovoter.models import Voter
+
+
+# Voter columns the importer fills with normalized search keys, in the order
+# search_keys() returns them
+SEARCH_KEY_COLUMNS = [
+    'last_name_key',
+    'first_name_key',
+    'last_name_code',
+    'first_name_code',
+    'address_key',
+]
+
+# Soundex digit for each consonant; vowels (and H, W, Y) have none
+SOUNDEX_DIGITS = {
+    letter: str(digit)
+    for digit, letters in enumerate(['BFPV', 'CGJKQSXZ', 'DT', 'L', 'MN', 'R'], 1)
+    for letter in letters
+}
+
+NAME_SUFFIXES = {'JR', 'SR', 'II', 'III', 'IV', 'V'}
+
+# The spellings the county files and people use for the same address word,
+# reduced to the USPS abbreviation
+ADDRESS_WORDS = {
+    'STREET': 'ST',
+    'AVENUE': 'AVE',
+    'AV': 'AVE',
+    'ROAD': 'RD',
+    'DRIVE': 'DR',
+    'LANE': 'LN',
+    'COURT': 'CT',
+    'BOULEVARD': 'BLVD',
+    'PLACE': 'PL',
+    'CIRCLE': 'CIR',
+    'TERRACE': 'TER',
+    'PARKWAY': 'PKWY',
+    'HIGHWAY': 'HWY',
+    'TRAIL': 'TRL',
+    'SQUARE': 'SQ',
+    'NORTH': 'N',
+    'SOUTH': 'S',
+    'EAST': 'E',
+    'WEST': 'W',
+    'NORTHEAST': 'NE',
+    'NORTHWEST': 'NW',
+    'SOUTHEAST': 'SE',
+    'SOUTHWEST': 'SW',
+}
+
+# Words that start the apartment or unit part of an address, which the key
+# leaves out
+UNIT_WORDS = {'#', 'APT', 'APARTMENT', 'UNIT', 'STE', 'SUITE', 'LOT', 'RM', 'ROOM', 'BLDG', 'FL'}
+
+ADDRESS_TOKENS = re.compile(r'[A-Z0-9]+|#')
+
+# Candidates are voters sharing a phonetic name, a first name and a date of
+# birth, or a last name and an address with the record (each an index on
+# Voter), scored on how much of the record they agree with:
+#
+#   last name      4 if the same, 2 if it sounds the same
+#   first name     3 if the same, 2 if it sounds the same, 1 for the initial
+#   date of birth  4
+#   address        3
+MATCH_QUERY = """
+    SELECT i.n, m.sos_voterid, m.score
+    FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[], %s::text[], %s::date[], %s::text[])
+        AS i(n, last_name_key, first_name_key, last_name_code, first_name_code, date_of_birth, address_key)
+    CROSS JOIN LATERAL (
+        SELECT v.sos_voterid,
+               CASE WHEN v.last_name_key = i.last_name_key THEN 4
+                    WHEN v.last_name_code = i.last_name_code THEN 2 ELSE 0 END +
+               CASE WHEN v.first_name_key = i.first_name_key THEN 3
+                    WHEN v.first_name_code = i.first_name_code THEN 2
+                    WHEN left(v.first_name_key, 1) = left(i.first_name_key, 1) THEN 1 ELSE 0 END +
+               CASE WHEN v.date_of_birth = i.date_of_birth THEN 4 ELSE 0 END +
+               CASE WHEN v.address_key = i.address_key THEN 3 ELSE 0 END AS score
+        FROM ohiovoter_voter v
+        WHERE (v.last_name_code = i.last_name_code AND v.first_name_code = i.first_name_code)
+           OR (v.date_of_birth = i.date_of_birth AND v.first_name_code = i.first_name_code)
+           OR (v.address_key = i.address_key AND v.last_name_code = i.last_name_code)
+        ORDER BY score DESC, v.sos_voterid
+        LIMIT %s
+    ) m
+    WHERE m.score >= %s
+    ORDER BY i.n, m.score DESC, m.sos_voterid
+"""
+
+
+@lru_cache(maxsize=65536)
+def name_key(value):
+    """
+    A name reduced to its letters, uppercased and without accents, so
+    "O'Neil", "ONEIL" and "O NEIL" all become ONEIL.
+    """
+    value = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii')
+    return ''.join(letter for letter in value.upper() if 'A' <= letter <= 'Z')
+
+
+@lru_cache(maxsize=65536)
+def soundex(key):
+    """
+    The Soundex code of a name key: its first letter and the digits of the
+    next three consonant sounds, like H322 for HODGES. Names that sound
+    alike, like SMITH and SMYTHE, share a code.
+    """
+    if not key:
+        return ''
+    code = key[0]
+    last_digit = SOUNDEX_DIGITS.get(key[0])
+    for letter in key[1:]:
+        digit = SOUNDEX_DIGITS.get(letter)
+        if digit and digit != last_digit:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W don't separate two consonants with the same digit
+        if letter not in 'HW':
+            last_digit = digit
+    return code.ljust(4, '0')
+
+
+def address_key(value):
+    """
+    A street address without punctuation, its unit, or the differences in
+    how street types and directions get spelled, so "123 North Main Street,
+    Apt. 4" and "123 N MAIN ST" both become 123 N MAIN ST.
+    """
+    words = ADDRESS_TOKENS.findall(value.upper())
+    for position, word in enumerate(words):
+        if position and word in UNIT_WORDS:
+            words = words[:position]
+            break
+    return ' '.join(ADDRESS_WORDS.get(word, word) for word in words)
+
+
+def search_keys(last_name, first_name, address):
+    """
+    The values of SEARCH_KEY_COLUMNS for a voter.
+    """
+    last_name_key = name_key(last_name)
+    first_name_key = name_key(first_name)
+    return [
+        last_name_key,
+        first_name_key,
+        soundex(last_name_key),
+        soundex(first_name_key),
+        address_key(address),
+    ]
+
+
+def split_name(name):
+    """
+    (first name, last name) from "FIRST [MIDDLE] LAST [SUFFIX]" or
+    "LAST, FIRST [MIDDLE]".
+    """
+    if ',' in name:
+        last_name, _, rest = name.partition(',')
+        words = rest.split()
+        return words[0] if words else '', last_name
+    words = name.split()
+    while len(words) > 2 and name_key(words[-1]) in NAME_SUFFIXES:
+        words.pop()
+    if len(words) < 2:
+        return '', name
+    return words[0], words[-1]
+
+
+def match_voters(records, limit=1, min_score=7, batch_size=5000):
+    """
+    Match external records, (name, date of birth, address) tuples, to voters.
+    The name is split by split_name, the date of birth (a date, an ISO date
+    string or None) must be exact, and the address is the street line, like
+    "123 N Main St"; either of the last two can be None.
+
+    Returns a list with, for each record in order, up to `limit` (voter id,
+    score) candidates, best first. Scores run up to 14 (see MATCH_QUERY), and
+    candidates scoring under `min_score` are left out: the default of 7 takes
+    a matching name, or a name that sounds the same with a matching date of
+    birth or address. Each batch of `batch_size` records is one query.
+    """
+    records = list(records)
+    matches = [[] for _ in records]
+
+    with closing(connection.cursor()) as cursor:
+        for start in range(0, len(records), batch_size):
+            columns = [[] for _ in range(7)]
+            for n, (name, date_of_birth, address) in enumerate(records[start:start + batch_size], start):
+                first_name, last_name = split_name(name or '')
+                keys = search_keys(last_name, first_name, address or '')
+                if isinstance(date_of_birth, date):
+                    date_of_birth = date_of_birth.isoformat()
+                # An empty key would match every voter missing that value
+                values = [key or None for key in keys[:4]] + [date_of_birth or None, keys[4] or None]
+                for column, value in zip(columns, [n] + values):
+                    column.append(value)
+
+            cursor.execute(MATCH_QUERY, columns + [limit, min_score])
+            for n, voter_id, score in cursor.fetchall():
+                matches[n].append((voter_id, score))
+
+    return matches
+
+
+def search_voters(name, date_of_birth=None, address=None, limit=10, min_score=0):
+    """
+    The voters most like one person, as a list of (Voter, score) tuples, best
+    first. See match_voters.
+    """
+    matches = match_voters([(name, date_of_birth, address)], limit=limit, min_score=min_score)[0]
+    voters = Voter.objects.in_bulk([voter_id for voter_id, score in matches])
+    return [(voters[voter_id], score) for voter_id, score in matches]
@@ -0,0 +1,194 @@
+import json
+import os
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+FORMAT_VERSION = 1
+
+MANIFEST_NAME = 'manifest.json'
+
+CATEGORICAL_COLUMNS = [
+    'county',
+    'party_affiliation',
+    'voter_status',
+    'congressional_district',
+    'state_senate_district',
+    'state_representative_district',
+    'precinct_code',
+    'ward',
+    'residential_city',
+    'residential_zip',
+    'city',
+    'township',
+    'village',
+    'city_school_district',
+    'local_school_district',
+    'exempted_vill_school_district',
+    'county_court_district',
+    'municipal_court_district',
+    'court_of_appeals',
+]
+
+DATE_COLUMNS = [
+    'date_of_birth',
+    'registration_date',
+]
+
+
+def smallest_code_type(size):
+    """
+    The smallest unsigned integer type with `size` distinct values.
+    """
+    for dtype in (numpy.uint8, numpy.uint16, numpy.uint32):
+        if size <= numpy.iinfo(dtype).max + 1:
+            return dtype
+    return numpy.uint64
+
+
+class Snapshot(object):
+    """
+    A columnar snapshot of the voter file, written by the export_snapshot
+    command, opened for reading with nothing but NumPy: no Django and no
+    PostgreSQL.
+
+    A snapshot is a directory of .npy files, one per column, plus
+    manifest.json:
+
+    - Categorical columns (CATEGORICAL_COLUMNS) are dictionary encoded: the
+      file holds the smallest unsigned integer code that fits, and the
+      manifest lists the value of each code, sorted, with None (for NULL)
+      last if any voter has no value.
+    - Date columns are datetime64[D], with NaT for NULL.
+    - sos_voterid is fixed-width bytes. Voters are in sos_voterid order.
+    - Participation is a sparse voter x election matrix in compressed sparse
+      row form: participation_elections holds the (manifest) election index
+      of every participation, voter by voter, and the participations of
+      voter i are participation_elections[participation_indptr[i]:
+      participation_indptr[i + 1]].
+
+    Everything is memory-mapped, so opening even a statewide snapshot only
+    reads the manifest, and a column is paged in when it's used.
+
+        snapshot = Snapshot('ohio-2016')
+        general = snapshot.election_ids(date='2016-11-08', category='GENERAL')
+        snapshot.turnout(general, by='county')
+    """
+
+    def __init__(self, directory):
+        if numpy is None:
+            raise ImportError('Reading a snapshot needs NumPy (pip install numpy)')
+
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_NAME)) as manifest_file:
+            self.manifest = json.load(manifest_file)
+        if self.manifest['format'] != FORMAT_VERSION:
+            raise ValueError('{} is a format {} snapshot; this version reads format {}'.format(
+                directory, self.manifest['format'], FORMAT_VERSION,
+            ))
+
+        self.voters = self.manifest['voters']
+        self.snapshot_version = self.manifest['snapshot_version']
+
+        elections = self.manifest['elections']
+        self.elections = {
+            'id': numpy.array([election['id'] for election in elections], dtype=numpy.int64),
+            'date': numpy.array([election['date'] for election in elections], dtype='datetime64[D]'),
+            'category': numpy.array([election['category'] for election in elections], dtype=object),
+            'party': numpy.array([election['party'] for election in elections], dtype=object),
+        }
+
+        self._arrays = {}
+
+    def __len__(self):
+        return self.voters
+
+    def array(self, name):
+        """
+        The memory-mapped array in `name`.npy.
+        """
+        if name not in self._arrays:
+            self._arrays[name] = numpy.load(os.path.join(self.directory, '{}.npy'.format(name)), mmap_mode='r')
+        return self._arrays[name]
+
+    def columns(self):
+        return list(self.manifest['columns'])
+
+    def codes(self, column):
+        """
+        The codes of a categorical column (see categories).
+        """
+        if column not in self.manifest['categories']:
+            raise KeyError('{} is not a categorical column'.format(column))
+        return self.array(column)
+
+    def categories(self, column):
+        """
+        The value of each code of a categorical column, as an object array.
+        """
+        return numpy.array(self.manifest['categories'][column], dtype=object)
+
+    def column(self, column):
+        """
+        A column's values: decoded for a categorical column, as stored for
+        the rest.
+        """
+        if column in self.manifest['categories']:
+            return self.categories(column)[self.codes(column)]
+        return self.array(column)
+
+    def election_ids(self, date=None, category=None, party=None):
+        """
+        Ids of the elections matching every criterion given. category is
+        GENERAL, PRIMARY or SPECIAL and party an Election.PARTY_* code.
+        """
+        matches = numpy.ones(len(self.elections['id']), dtype=bool)
+        if date is not None:
+            matches &= self.elections['date'] == numpy.datetime64(date, 'D')
+        if category is not None:
+            matches &= self.elections['category'] == category
+        if party is not None:
+            matches &= self.elections['party'] == party
+        return self.elections['id'][matches].tolist()
+
+    def participated(self, elections):
+        """
+        A boolean array of whether each voter participated in any of
+        `elections` (an id or a list of ids).
+        """
+        if isinstance(elections, int):
+            elections = [elections]
+        wanted = numpy.isin(self.elections['id'], elections)
+        indptr = self.array('participation_indptr')
+
+        # Whether each participation is in a wanted election, padded so every
+        # voter's start is a valid index even if the last voters never voted
+        hits = numpy.append(wanted[self.array('participation_elections')], False)
+        voted = numpy.logical_or.reduceat(hits, indptr[:-1])
+        # reduceat gives a voter with no participations the next voter's first
+        voted &= indptr[1:] > indptr[:-1]
+        return voted
+
+    def turnout(self, elections, by='county', voters=None):
+        """
+        Like ohiovoter.analytics.turnout, for a categorical column: a list of
+        (group, registered, voted, rate). `voters` is an optional boolean
+        array to count only some voters.
+        """
+        codes = numpy.asarray(self.codes(by))
+        categories = self.categories(by)
+        voted = self.participated(elections)
+        if voters is not None:
+            codes = codes[voters]
+            voted = voted[voters]
+
+        registered_counts = numpy.bincount(codes, minlength=len(categories))
+        voted_counts = numpy.bincount(codes[voted], minlength=len(categories))
+        return [
+            (group, int(registered), int(participated), participated / registered)
+            for group, registered, participated in zip(categories, registered_counts, voted_counts)
+            if registered
+        ]
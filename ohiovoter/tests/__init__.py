@@ -0,0 +1,11 @@
+"""
+Unit tests that need no database: run them with
+
+    python -m unittest discover -s ohiovoter/tests -t .
+"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ohiovoter.settings')
+
+import django  # noqa: E402
+django.setup()
@@ -0,0 +1,65 @@
+import threading
+import unittest
+from unittest import mock
+
+from ohiovoter.bulkload import WRITER_SLOT_POLL_LINES, IteratorFile, writer_slot
+
+
+class IteratorFileTest(unittest.TestCase):
+
+    def test_read(self):
+        stream = IteratorFile(['ab', 'cde', '', 'f'])
+        self.assertEqual(stream.read(2), 'ab')
+        self.assertEqual(stream.read(2), 'cd')
+        self.assertEqual(stream.read(), 'ef')
+        self.assertEqual(stream.read(2), '')
+
+
+class WriterSlotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parsed = 0
+
+    def lines(self, slots, count, release_at):
+        """
+        `count` lines, freeing the slot another writer holds as line
+        `release_at` is parsed.
+        """
+        for number in range(count):
+            self.parsed += 1
+            if number == release_at:
+                slots.release()
+            yield '{}\n'.format(number)
+
+    def test_free_slot_streams(self):
+        slots = threading.BoundedSemaphore(1)
+        with mock.patch('ohiovoter.bulkload._writer_slots', slots):
+            with writer_slot(self.lines(slots, 10, None)) as stream:
+                self.assertEqual(self.parsed, 0)
+                self.assertEqual(stream.read(), ''.join('{}\n'.format(number) for number in range(10)))
+            # Released again afterwards
+            self.assertTrue(slots.acquire(False))
+
+    def test_parses_ahead_until_a_slot_frees(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        count = WRITER_SLOT_POLL_LINES * 5
+        with mock.patch('ohiovoter.bulkload._writer_slots', slots):
+            with writer_slot(self.lines(slots, count, WRITER_SLOT_POLL_LINES + 10)) as stream:
+                # Picked up the slot at the next check, and streams the rest
+                self.assertEqual(self.parsed, WRITER_SLOT_POLL_LINES * 2)
+                self.assertEqual(stream.read(), ''.join('{}\n'.format(number) for number in range(count)))
+            self.assertTrue(slots.acquire(False))
+
+    def test_waits_once_everything_is_parsed(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        metrics = mock.Mock()
+        with mock.patch('ohiovoter.bulkload._writer_slots', slots):
+            timer = threading.Timer(0.1, slots.release)
+            timer.start()
+            with writer_slot(self.lines(slots, 10, None), metrics) as stream:
+                self.assertEqual(self.parsed, 10)
+                self.assertEqual(stream.read(), ''.join('{}\n'.format(number) for number in range(10)))
+            timer.join()
+        metrics.add_time.assert_called_once_with('writer slot wait', mock.ANY)
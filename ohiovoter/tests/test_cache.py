@@ -0,0 +1,180 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from ohiovoter.cache import FileBackend, MemoryBackend, ResultCache
+
+
+class MemoryBackendTest(unittest.TestCase):
+
+    def test_get_and_set(self):
+        backend = MemoryBackend(max_size=100)
+        self.assertIsNone(backend.get('a'))
+        backend.set('a', b'x' * 10)
+        self.assertEqual(backend.get('a'), b'x' * 10)
+
+        backend.set('a', b'y' * 20)
+        self.assertEqual(backend.get('a'), b'y' * 20)
+        self.assertEqual(backend.size, 20)
+
+    def test_evicts_least_recently_used_by_size(self):
+        backend = MemoryBackend(max_size=25)
+        backend.set('a', b'a' * 10)
+        backend.set('b', b'b' * 10)
+        backend.get('a')
+        backend.set('c', b'c' * 10)
+
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('a'), b'a' * 10)
+        self.assertEqual(backend.get('c'), b'c' * 10)
+        self.assertEqual(backend.size, 20)
+
+        # One big value can push out several small ones
+        backend.set('d', b'd' * 24)
+        self.assertEqual([backend.get(key) for key in 'acd'], [None, None, b'd' * 24])
+        self.assertEqual(backend.size, 24)
+
+    def test_skips_values_over_max_size(self):
+        backend = MemoryBackend(max_size=25)
+        backend.set('a', b'a' * 10)
+        backend.set('big', b'x' * 26)
+
+        self.assertIsNone(backend.get('big'))
+        self.assertEqual(backend.get('a'), b'a' * 10)
+        self.assertEqual(backend.size, 10)
+
+    def test_clear(self):
+        backend = MemoryBackend(max_size=100)
+        backend.set('a', b'a' * 10)
+        backend.clear()
+        self.assertIsNone(backend.get('a'))
+        self.assertEqual(backend.size, 0)
+
+
+class FileBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def set_used(self, backend, key, when):
+        os.utime(backend.file_name(key), (when, when))
+
+    def test_get_and_set(self):
+        backend = FileBackend(self.directory, max_size=100)
+        self.assertIsNone(backend.get('a'))
+        backend.set('a', b'x' * 10)
+        self.assertEqual(backend.get('a'), b'x' * 10)
+        self.assertEqual(os.listdir(self.directory), ['a.pickle'])
+
+    def test_evicts_least_recently_used_by_size(self):
+        backend = FileBackend(self.directory, max_size=25)
+        backend.set('a', b'a' * 10)
+        self.set_used(backend, 'a', 1000)
+        backend.set('b', b'b' * 10)
+        self.set_used(backend, 'b', 2000)
+        # Reading a result marks it used now
+        backend.get('a')
+        backend.set('c', b'c' * 10)
+
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('a'), b'a' * 10)
+        self.assertEqual(backend.get('c'), b'c' * 10)
+
+    def test_skips_values_over_max_size(self):
+        backend = FileBackend(self.directory, max_size=25)
+        backend.set('a', b'a' * 10)
+        backend.set('big', b'x' * 26)
+
+        self.assertIsNone(backend.get('big'))
+        self.assertEqual(backend.get('a'), b'a' * 10)
+        self.assertEqual(os.listdir(self.directory), ['a.pickle'])
+
+    def test_clear(self):
+        backend = FileBackend(self.directory, max_size=100)
+        backend.set('a', b'a' * 10)
+        backend.set('b', b'b' * 10)
+        backend.clear()
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+@mock.patch('ohiovoter.cache.snapshot_version')
+class ResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.computed = []
+
+    def compute(self, value):
+        def compute():
+            self.computed.append(value)
+            return value
+        return compute
+
+    def test_caches_within_a_version(self, snapshot_version):
+        snapshot_version.return_value = 'v1'
+        cache = ResultCache(MemoryBackend())
+
+        self.assertEqual(cache.get_or_compute(('turnout', 2016), self.compute([1, 2])), [1, 2])
+        self.assertEqual(cache.get_or_compute(('turnout', 2016), self.compute([3, 4])), [1, 2])
+        self.assertEqual(cache.get_or_compute(('turnout', 2012), self.compute([5])), [5])
+        self.assertEqual(self.computed, [[1, 2], [5]])
+
+    def test_clears_when_the_version_changes(self, snapshot_version):
+        backend = MemoryBackend()
+        cache = ResultCache(backend)
+
+        snapshot_version.return_value = 'v1'
+        cache.get_or_compute('key', self.compute('first'))
+        self.assertEqual(len(backend._entries), 1)
+
+        # An import in progress neither serves nor clears anything
+        snapshot_version.return_value = None
+        self.assertEqual(cache.get_or_compute('key', self.compute('during')), 'during')
+        self.assertEqual(len(backend._entries), 1)
+
+        snapshot_version.return_value = 'v1'
+        self.assertEqual(cache.get_or_compute('key', self.compute('again')), 'first')
+
+        snapshot_version.return_value = 'v2'
+        self.assertEqual(cache.get_or_compute('key', self.compute('second')), 'second')
+        self.assertEqual(len(backend._entries), 1)
+        self.assertEqual(self.computed, ['first', 'during', 'second'])
+
+    def test_clears_after_an_import(self, snapshot_version):
+        backend = MemoryBackend()
+        cache = ResultCache(backend)
+
+        snapshot_version.return_value = 'v1'
+        cache.get_or_compute('a', self.compute('a1'))
+        cache.get_or_compute('b', self.compute('b1'))
+        self.assertEqual(len(backend._entries), 2)
+
+        snapshot_version.return_value = None
+        cache.get_or_compute('a', self.compute('during'))
+
+        snapshot_version.return_value = 'v2'
+        self.assertEqual(cache.get_or_compute('a', self.compute('a2')), 'a2')
+        self.assertEqual(len(backend._entries), 1)
+
+    def test_version_ttl(self, snapshot_version):
+        snapshot_version.return_value = 'v1'
+        cache = ResultCache(MemoryBackend(), version_ttl=60)
+        cache.get_or_compute('key', self.compute('first'))
+        cache.get_or_compute('key', self.compute('second'))
+        self.assertEqual(snapshot_version.call_count, 1)
+
+    def test_cached(self, snapshot_version):
+        snapshot_version.return_value = 'v1'
+        cache = ResultCache(FileBackend(tempfile.mkdtemp()))
+        self.addCleanup(shutil.rmtree, cache.backend.directory)
+        calls = []
+
+        @cache.cached
+        def double(value):
+            calls.append(value)
+            return value * 2
+
+        self.assertEqual([double(2), double(2), double(value=2), double(3)], [4, 4, 4, 6])
+        self.assertEqual(calls, [2, 2, 3])
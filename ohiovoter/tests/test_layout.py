@@ -0,0 +1,165 @@
+import unittest
+
+from ohiovoter.layout import (
+    INTEGER_MAX, INTEGER_MIN, VOTER_LAYOUT, ColumnPlan, LayoutError, normalize_date, normalize_integer,
+    parse_election_header,
+)
+from ohiovoter.models import Election
+
+
+VOTER_HEADER = [field.upper() for field, other_headers in VOTER_LAYOUT]
+
+
+def voter_row(**values):
+    """
+    A row for VOTER_HEADER, blank except for `values`.
+    """
+    return [values.get(field, '') for field, other_headers in VOTER_LAYOUT]
+
+
+class ParseElectionHeaderTest(unittest.TestCase):
+
+    def test_election_headers(self):
+        for header, expected in [
+            ('GENERAL-11/08/2016', (Election.CATEGORY_GENERAL, '2016-11-08')),
+            ('PRIMARY-3/1/2016', (Election.CATEGORY_PRIMARY, '2016-03-01')),
+            ('SPECIAL-2016-08-02', (Election.CATEGORY_SPECIAL, '2016-08-02')),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(parse_election_header(header), expected)
+
+    def test_not_an_election(self):
+        for header in ['WARD_NAME', 'GENERAL', 'GENERAL-11/08/16', '11/08/2016']:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_election_header(header))
+
+    def test_unknown_category(self):
+        with self.assertRaisesRegex(LayoutError, 'RUNOFF is not a known election category'):
+            parse_election_header('RUNOFF-11/08/2016')
+
+    def test_invalid_date(self):
+        for header in ['GENERAL-02/30/2016', 'GENERAL-2016-13-01']:
+            with self.subTest(header=header), self.assertRaisesRegex(LayoutError, 'has an invalid date'):
+                parse_election_header(header)
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_normalize_integer(self):
+        for value, expected in [
+            ('7', '7'),
+            ('007', '7'),
+            (' 42 ', '42'),
+            ('-3', '-3'),
+            (str(INTEGER_MAX), str(INTEGER_MAX)),
+            (str(INTEGER_MIN), str(INTEGER_MIN)),
+        ]:
+            with self.subTest(value=value):
+                self.assertEqual(normalize_integer(value), expected)
+
+    def test_invalid_integer(self):
+        for value in ['', 'seven', '4.5', str(INTEGER_MAX + 1), str(INTEGER_MIN - 1), '99999999999']:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                normalize_integer(value)
+
+    def test_normalize_date(self):
+        for value, expected in [
+            ('2016-11-08', '2016-11-08'),
+            ('11/08/2016', '2016-11-08'),
+            ('1/2/1970', '1970-01-02'),
+            (' 1970-01-02 ', '1970-01-02'),
+        ]:
+            with self.subTest(value=value):
+                self.assertEqual(normalize_date(value), expected)
+
+    def test_invalid_date(self):
+        for value in ['', '2016-02-30', '11/08/16', 'yesterday']:
+            with self.subTest(value=value), self.assertRaisesRegex(ValueError, 'not a date'):
+                normalize_date(value)
+
+
+class ColumnPlanTest(unittest.TestCase):
+
+    def test_voter_columns_in_layout_order(self):
+        header = list(reversed(VOTER_HEADER))
+        plan = ColumnPlan(header)
+        row = list(reversed(voter_row(sos_voterid='OH0001', ward='W1')))
+
+        values = plan.voter_values(row)
+        self.assertEqual(values[0], 'OH0001')
+        self.assertEqual(values[-1], 'W1')
+        self.assertEqual(len(values), len(VOTER_LAYOUT))
+
+    def test_other_headers_and_tidying(self):
+        header = [
+            'RESIDENTIAL_SECONDARY_ADDRESS' if name == 'RESIDENTIAL_SECONDARY_ADDR' else name
+            for name in VOTER_HEADER
+        ]
+        header[0] = '\ufeff sos_voterid '
+        plan = ColumnPlan(header)
+        self.assertEqual(plan.voter_values(voter_row(sos_voterid='OH0001')), voter_row(sos_voterid='OH0001'))
+
+    def test_elections(self):
+        header = VOTER_HEADER[:3] + ['GENERAL-11/08/2016'] + VOTER_HEADER[3:] + ['PRIMARY-03/15/2016']
+        election_ids = {
+            (Election.CATEGORY_GENERAL, '2016-11-08', 'X'): 1,
+            (Election.CATEGORY_PRIMARY, '2016-03-15', 'D'): 2,
+        }
+        missing = []
+
+        def missing_election(*election):
+            missing.append(election)
+            return 3
+
+        plan = ColumnPlan(header, election_ids, missing_election)
+        self.assertEqual(plan.width, len(VOTER_HEADER) + 2)
+
+        row = voter_row(sos_voterid='OH0001')
+        self.assertEqual(list(plan.elections(row[:3] + ['X'] + row[3:] + ['D'])), [1, 2])
+        self.assertEqual(list(plan.elections(row[:3] + [''] + row[3:] + [''])), [])
+        self.assertEqual(plan.voter_values(row[:3] + ['X'] + row[3:] + ['D']), row)
+
+        self.assertEqual(list(plan.elections(row[:3] + [''] + row[3:] + ['R'])), [3])
+        self.assertEqual(list(plan.elections(row[:3] + [''] + row[3:] + ['R'])), [3])
+        self.assertEqual(missing, [(Election.CATEGORY_PRIMARY, '2016-03-15', 'R')])
+
+    def test_unknown_election_without_missing_election(self):
+        plan = ColumnPlan(VOTER_HEADER + ['GENERAL-11/08/2016'])
+        with self.assertRaises(KeyError):
+            list(plan.elections(voter_row() + ['X']))
+
+    def test_unknown_column(self):
+        with self.assertRaisesRegex(LayoutError, "'WARD_NAME' is neither a voter column nor an election"):
+            ColumnPlan(VOTER_HEADER + ['WARD_NAME'])
+
+    def test_every_problem_at_once(self):
+        header = [name for name in VOTER_HEADER if name != 'WARD'] + [
+            'VILLAGE', 'GENERAL-02/30/2016', 'GENERAL-11/08/2016', 'GENERAL-2016-11-08',
+        ]
+        with self.assertRaises(LayoutError) as raised:
+            ColumnPlan(header)
+        message = str(raised.exception)
+        for problem in [
+            'village appears twice',
+            'GENERAL-02/30/2016 has an invalid date',
+            'GENERAL-2016-11-08 appears twice',
+            'missing voter column WARD',
+        ]:
+            self.assertIn(problem, message)
+
+    def test_normalize(self):
+        plan = ColumnPlan(VOTER_HEADER)
+        values = voter_row(county_number='007', date_of_birth='01/02/1970', registration_date='', last_name='SMITH')
+        plan.normalize(values)
+        self.assertEqual(values, voter_row(county_number='7', date_of_birth='1970-01-02', last_name='SMITH'))
+
+    def test_normalize_invalid_values(self):
+        plan = ColumnPlan(VOTER_HEADER)
+        for values, message in [
+            (voter_row(county_number='99999999999'), "county_number: '99999999999' is not a valid integer"),
+            (voter_row(county_number='seven'), "county_number: 'seven' is not a valid integer"),
+            (voter_row(date_of_birth='02/30/1970'), "date_of_birth: '02/30/1970' is not a valid date"),
+            (voter_row(last_name='X' * 600), 'last_name: 600 characters is longer than the 512 allowed'),
+        ]:
+            with self.subTest(message=message), self.assertRaisesRegex(ValueError, message):
+                plan.normalize(values)
@@ -0,0 +1,127 @@
+from multiprocessing import Event
+import os
+import signal
+import unittest
+from unittest import mock
+
+from ohiovoter.scheduler import CountyScheduler, WorkerLost
+
+
+# Fake pipeline steps. load and finish run in the pool's worker processes, so
+# they live at module level where pickle can find them.
+
+SIZES = {'ADAMS': 10, 'BROWN': 1000, 'CLARK': 100, 'EMPTY': 5}
+UNITS = {'ADAMS': 3, 'BROWN': 3, 'CLARK': 2, 'EMPTY': 0}
+
+# Set in each load worker by remember_event
+worker_event = None
+
+
+def download(county):
+    if county == 'MISSING':
+        raise IOError('404 for {}'.format(county))
+    return SIZES[county]
+
+
+def prepare(county):
+    return [(number,) for number in range(UNITS[county])]
+
+
+def remember_event(event):
+    global worker_event
+    worker_event = event
+
+
+def load(county, number):
+    # The first unit holds its worker until the test says go, so whatever
+    # downloads in the meantime is queued up behind it
+    if worker_event is not None and number == 0 and county == 'ADAMS':
+        worker_event.wait(10)
+    if county == 'CLARK' and number == 1:
+        raise ValueError('bad unit')
+    return county, number
+
+
+def load_and_die(county, number):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def finish(county):
+    return county
+
+
+class RecordingMonitor(object):
+
+    def __init__(self, go=None, go_after=None):
+        self.events = []
+        self.go = go
+        self.go_after = go_after
+
+    def downloaded(self, county, size):
+        self.events.append(('downloaded', county, size))
+        if county == self.go_after:
+            self.go.set()
+
+    def dispatched(self, county):
+        self.events.append(('dispatched', county))
+
+    def loaded(self, county, result):
+        self.events.append(('loaded', county, result))
+
+    def finished(self, county, result):
+        self.events.append(('finished', county, result))
+
+    def of(self, kind):
+        return [event[1:] for event in self.events if event[0] == kind]
+
+
+class CountySchedulerTest(unittest.TestCase):
+
+    def scheduler(self, load=load, download_workers=2, load_workers=2, **kwargs):
+        return CountyScheduler(download, prepare, load, finish, download_workers, load_workers, **kwargs)
+
+    def test_every_unit_loads_then_finishes(self):
+        monitor = RecordingMonitor()
+        self.scheduler(monitor=monitor).run(['ADAMS', 'BROWN', 'EMPTY'])
+
+        self.assertCountEqual(monitor.of('downloaded'), [('ADAMS', 10), ('BROWN', 1000), ('EMPTY', 5)])
+        self.assertCountEqual(monitor.of('loaded'), [
+            (county, (county, number)) for county in ('ADAMS', 'BROWN') for number in range(UNITS[county])
+        ])
+        self.assertCountEqual(monitor.of('finished'), [('ADAMS', 'ADAMS'), ('BROWN', 'BROWN'), ('EMPTY', 'EMPTY')])
+        for county in ('ADAMS', 'BROWN'):
+            finished_at = monitor.events.index(('finished', county, county))
+            loaded = [
+                index for index, event in enumerate(monitor.events) if event[0] == 'loaded' and event[1] == county
+            ]
+            self.assertEqual(len(loaded), UNITS[county])
+            self.assertLess(max(loaded), finished_at)
+
+    def test_largest_county_first(self):
+        go = Event()
+        monitor = RecordingMonitor(go, go_after='BROWN')
+        self.scheduler(
+            download_workers=1, load_workers=1, load_initializer=remember_event, load_initargs=(go,), monitor=monitor,
+        ).run(['ADAMS', 'BROWN'])
+
+        # ADAMS downloads first and gets the only worker; by the time its
+        # first unit is done BROWN is waiting, and it's bigger
+        self.assertEqual(
+            [county for county, in monitor.of('dispatched')],
+            ['ADAMS', 'BROWN', 'BROWN', 'BROWN', 'ADAMS', 'ADAMS'],
+        )
+
+    def test_load_error(self):
+        monitor = RecordingMonitor()
+        with self.assertRaisesRegex(ValueError, 'bad unit'):
+            self.scheduler(monitor=monitor).run(['CLARK', 'ADAMS'])
+        self.assertNotIn(('finished', 'CLARK', 'CLARK'), monitor.events)
+
+    def test_download_error(self):
+        with self.assertRaisesRegex(IOError, '404 for MISSING'):
+            self.scheduler().run(['ADAMS', 'MISSING'])
+
+    def test_worker_dies(self):
+        with mock.patch('ohiovoter.scheduler.WORKER_CHECK_INTERVAL', 0.1), \
+                self.assertRaisesRegex(WorkerLost, r'exit code -9'):
+            self.scheduler(load=load_and_die).run(['ADAMS'])
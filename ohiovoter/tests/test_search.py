@@ -0,0 +1,79 @@
+import unittest
+
+from ohiovoter.search import address_key, name_key, search_keys, soundex, split_name
+
+
+class NameKeyTest(unittest.TestCase):
+
+    def test_name_key(self):
+        for value, expected in [
+            ("O'Neil", 'ONEIL'),
+            ('O NEIL', 'ONEIL'),
+            ('oneil', 'ONEIL'),
+            ('Muñoz-García', 'MUNOZGARCIA'),
+            ('', ''),
+        ]:
+            with self.subTest(value=value):
+                self.assertEqual(name_key(value), expected)
+
+
+class SoundexTest(unittest.TestCase):
+
+    def test_soundex(self):
+        for key, expected in [
+            ('HODGES', 'H322'),
+            ('SMITH', 'S530'),
+            ('SMYTHE', 'S530'),
+            ('ROBERT', 'R163'),
+            ('RUPERT', 'R163'),
+            ('ASHCRAFT', 'A261'),
+            ('TYMCZAK', 'T522'),
+            ('PFISTER', 'P236'),
+            ('LEE', 'L000'),
+            ('A', 'A000'),
+            ('', ''),
+        ]:
+            with self.subTest(key=key):
+                self.assertEqual(soundex(key), expected)
+
+
+class AddressKeyTest(unittest.TestCase):
+
+    def test_address_key(self):
+        for value, expected in [
+            ('123 North Main Street, Apt. 4', '123 N MAIN ST'),
+            ('123 N MAIN ST', '123 N MAIN ST'),
+            ('123 N. Main St. #4', '123 N MAIN ST'),
+            ('9 Oak Avenue Unit B', '9 OAK AVE'),
+            ('9 OAK AV', '9 OAK AVE'),
+            ('500 Southwest Boulevard Suite 200', '500 SW BLVD'),
+            ('', ''),
+        ]:
+            with self.subTest(value=value):
+                self.assertEqual(address_key(value), expected)
+
+
+class SplitNameTest(unittest.TestCase):
+
+    def test_split_name(self):
+        for name, expected in [
+            ('HODGES, MATT', ('MATT', 'HODGES')),
+            ('HODGES, MATT ROBERT', ('MATT', 'HODGES')),
+            ('HODGES,', ('', 'HODGES')),
+            ('MATT HODGES', ('MATT', 'HODGES')),
+            ('MATT ROBERT HODGES', ('MATT', 'HODGES')),
+            ('MATT ROBERT HODGES JR', ('MATT', 'HODGES')),
+            ('MATT HODGES III', ('MATT', 'HODGES')),
+            ('HODGES', ('', 'HODGES')),
+        ]:
+            with self.subTest(name=name):
+                self.assertEqual(split_name(name), expected)
+
+
+class SearchKeysTest(unittest.TestCase):
+
+    def test_search_keys(self):
+        self.assertEqual(
+            search_keys("Hodges", "Matt", '123 North Main Street, Apt. 4'),
+            ['HODGES', 'MATT', 'H322', 'M300', '123 N MAIN ST'],
+        )
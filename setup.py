@@ -32,6 +32,10 @@ setup(
     packages=['ohiovoter'],
     zip_safe=False,
     install_requires=REQUIREMENTS,
+    extras_require={
+        'analytics': ['numpy', 'pandas'],
+        'export': ['pyarrow'],
+    },
     include_package_data=True,
     classifiers=[
         'Programming Language :: Python :: 3.5',